@@ -3,4 +3,9 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Development server: set up the database here; deployments run `flask init`
+    from app.cli import init_database
+
+    with app.app_context():
+        init_database()
     app.run(debug=True)
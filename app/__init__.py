@@ -2,16 +2,34 @@ import os
 
 from flask import Flask
 
+from app import dbconfig, fragments, metrics, replicas, slow_queries
 from app.database import db
-from app.routes.auth_routes import auth_bp
-from app.routes.admin_routes import admin_bp
-from app.routes.doctor_routes import doctor_bp
-from app.routes.patient_routes import patient_bp
-from app.routes import home_bp
 from app.utils import format_datetime
 
 
-def create_app():
+def register_blueprints(app):
+    # Imported here so ``import app`` (scripts, workers, models) does not
+    # pull in every view module.
+    from app.routes import home_bp
+    from app.routes.admin_routes import admin_bp
+    from app.routes.api_routes import api_bp
+    from app.routes.auth_routes import auth_bp
+    from app.routes.doctor_routes import doctor_bp
+    from app.routes.patient_routes import patient_bp
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(doctor_bp)
+    app.register_blueprint(patient_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(home_bp)
+
+
+def create_app(test_config=None):
+    """
+    Build the app without touching the database. The schema and the
+    default admin are set up once per database with ``flask init``.
+    """
     app = Flask(__name__)
 
     # Jinja filter
@@ -23,23 +41,86 @@ def create_app():
         basedir, "hospital.db"
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    dbconfig.load(app.config)
     app.config["SECRET_KEY"] = "change-this-secret-key"
+    app.config["DASHBOARD_PAST_LIMIT"] = 20
+    app.config["PAGE_SIZE"] = 25
+    app.config["MAX_PAGE_SIZE"] = 100
+    app.config["SLOT_MINUTES"] = 50
+    app.config["SLOT_HORIZON_DAYS"] = 7
+    app.config["PASSWORD_METHOD"] = None  # werkzeug default (scrypt)
+    app.config["PASSWORD_HASH_POOL"] = "thread"
+    app.config["PASSWORD_HASH_WORKERS"] = 2
+    app.config["SESSION_TIMEOUT_MINUTES"] = 30
+    app.config["LAST_SEEN_REFRESH_SECONDS"] = 60
+    app.config["PRINCIPAL_CACHE_TTL"] = 30
+    app.config["PRINCIPAL_CACHE_SIZE"] = 4096
+    app.config["REFDATA_CACHE_PATH"] = None  # e.g. instance/refdata-cache.sqlite to share across workers
+    app.config["REFDATA_CACHE_TTL"] = 300
+    app.config.setdefault("READ_REPLICAS", [])  # bind keys, see app.replicas
+    app.config["REPLICA_PIN_SECONDS"] = 5
+    app.config["METRICS_ENABLED"] = True
+    app.config["METRICS_SERVER_TIMING"] = False
+    app.config["SLOW_QUERY_MS"] = 100  # None turns the slow-query log off
+    app.config["SLOW_QUERY_LOG"] = None  # default: instance/slow_queries.jsonl
+    app.config["SLOW_QUERY_LOG_BYTES"] = 5 * 1024 * 1024
+    app.config["SLOW_QUERY_LOG_BACKUPS"] = 3
+    app.config["SLOW_QUERY_EXPLAIN"] = True
+    app.config["EXPORT_BATCH_SIZE"] = 2000
+    app.config["FRAGMENT_CACHE_ENABLED"] = True
+    app.config["FRAGMENT_CACHE_SIZE"] = 256
+    app.config["FRAGMENT_CACHE_TTL"] = 600
+    app.config["JINJA_BYTECODE_CACHE"] = True
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = None  # default: instance/jinja_cache
+    app.config["JOB_WORKERS"] = 4
+    app.config["JOB_POOL"] = "thread"  # or "process"
+    app.config["JOB_POLL_SECONDS"] = 1.0
+    app.config["JOB_VISIBILITY_TIMEOUT"] = 300
+    app.config["JOB_MAX_ATTEMPTS"] = 5
+    app.config["JOB_BACKOFF_SECONDS"] = 10
+    app.config["JOB_BACKOFF_MAX"] = 3600
+    app.config["JOB_RETENTION_DAYS"] = 7
+    app.config["EXPORT_DIR"] = None  # default: instance/exports
+    app.config["REMINDER_OFFSETS"] = {"24h": 24 * 60, "1h": 60}  # kind: minutes before the start
+    app.config["REMINDER_BUCKET_MINUTES"] = 5
+    app.config["REMINDER_BATCH_SIZE"] = 500
+    app.config["REMINDER_SEND_TIMEOUT"] = 60
+    app.config["REMINDER_MAX_ATTEMPTS"] = 5
+    app.config["REMINDER_RETENTION_DAYS"] = 30
+    app.config["REMINDER_SENDER"] = None  # dotted path to a sender class; default: app.reminders:DirectorySender
+    app.config["REMINDER_OUTBOX_DIR"] = None  # DirectorySender target, default: instance/reminders
+    app.config["ARCHIVE_AFTER_DAYS"] = 365
+    app.config["ARCHIVE_BATCH_SIZE"] = 500
+    app.config["ARCHIVE_PAUSE_SECONDS"] = 0.05
+
+    if test_config is not None:
+        app.config.update(test_config)
+
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", dbconfig.engine_options(app.config))
 
     # ---------- Extensions ----------
     db.init_app(app)
+    replicas.init_app(app)
+    metrics.init_app(app)
+    slow_queries.init_app(app)
+    fragments.init_app(app)
+
+    # Imported here, like the blueprints: the command module is cheap, and
+    # each command imports the subsystem it runs.
+    from app.cli import register_commands
+    register_commands(app)
+
+    # ORM hooks that keep derived rows in step with every write (counters,
+    # user_identity, reminders, time slots). They must be active in any
+    # process that builds the app, whichever views or commands it uses.
+    from app import counters, identity, reminders, slots  # noqa: F401
 
     # ---------- Blueprints ----------
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(admin_bp)
-    app.register_blueprint(doctor_bp)
-    app.register_blueprint(patient_bp)
-    app.register_blueprint(home_bp)
+    register_blueprints(app)
 
-    # ---------- DB + default admin ----------
+    # Engines are created here but connect lazily on first use
     with app.app_context():
-        from app.models import create_default_admin  # uses same db instance
-
-        db.create_all()
-        create_default_admin()  # uses db.session bound to this app
+        for engine in db.engines.values():
+            dbconfig.install(engine, app.config)
 
     return app
@@ -0,0 +1,163 @@
+"""
+Hot/cold split of appointments.
+
+Finished (completed or cancelled) appointments that started more than
+ARCHIVE_AFTER_DAYS ago are moved, with their treatments, from
+``appointment``/``treatment`` into ``appointment_archive``/
+``treatment_archive``. The hot tables, their indexes and the pages that
+read them then only cover recent and upcoming appointments.
+
+Rows move ARCHIVE_BATCH_SIZE appointments at a time. Each batch is one
+short transaction: copy, delete, commit, then an optional
+ARCHIVE_PAUSE_SECONDS pause. So a booking never waits behind more than
+one batch, and an interrupted run simply continues where it stopped.
+Rows keep their ids.
+
+History readers go through the helpers below, which read both sides:
+merged() for ORM pages, each() for column selects (exports), which
+app.exports streams and merges in index order.
+Archived rows are read-only; only the hot tables can be edited.
+"""
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select
+
+from app.database import begin_write, db, setting
+from app.jobs import task
+from app.models import (
+    Appointment,
+    ArchivedAppointment,
+    ArchivedTreatment,
+    Reminder,
+    StatusEnum,
+    TimeSlot,
+    Treatment,
+)
+
+
+FINISHED = (StatusEnum.completed, StatusEnum.cancelled)
+APPOINTMENT_COLUMNS = (
+    "id", "patient_id", "doctor_id", "appointment_start", "appointment_end",
+    "status", "reason", "created_at", "last_updated_at",
+)
+TREATMENT_COLUMNS = ("id", "appointment_id", "diagnosis", "prescription", "notes", "treatment_date")
+
+
+# ---------- Moving rows ----------
+
+def _candidates(cutoff, batch_size):
+    """``[(appointment_id, treatment_id)]`` for one batch of finished, old appointments."""
+    # SQLite hands out max(rowid) + 1, so moving the newest row would let
+    # its id be reused; the newest appointment and treatment stay put.
+    newest_appointment = db.session.execute(select(func.max(Appointment.id))).scalar() or 0
+    newest_treatment = db.session.execute(select(func.max(Treatment.id))).scalar() or 0
+    return db.session.execute(
+        select(Appointment.id, Treatment.id)
+        .outerjoin(Treatment, Treatment.appointment_id == Appointment.id)
+        .where(
+            Appointment.status.in_(FINISHED),
+            Appointment.appointment_start < cutoff,
+            Appointment.id < newest_appointment,
+            or_(Treatment.id.is_(None), Treatment.id < newest_treatment),
+        )
+        # no ORDER BY: any batch will do, and the (status, start) index
+        # can stop after batch_size rows instead of sorting every match
+        .limit(batch_size)
+    ).all()
+
+
+def _columns(model, names):
+    return [getattr(model, name) for name in names]
+
+
+def archive_batch(cutoff, batch_size):
+    """Move one batch in one transaction. Returns ``(appointments, treatments)`` moved."""
+    # The batch reads its rows and then moves them: on SQLite the write
+    # lock is taken first, or a booking committed in between would fail
+    # the first write with SQLITE_BUSY_SNAPSHOT
+    begin_write()
+    try:
+        return _move(_candidates(cutoff, batch_size))
+    except BaseException:
+        db.session.rollback()
+        raise
+
+
+def _move(rows):
+    if not rows:
+        db.session.rollback()
+        return 0, 0
+    appointment_ids = [row[0] for row in rows]
+    treatment_ids = [row[1] for row in rows if row[1] is not None]
+    now = datetime.utcnow()
+
+    db.session.execute(insert(ArchivedAppointment).from_select(
+        [*APPOINTMENT_COLUMNS, "archived_at"],
+        select(*_columns(Appointment, APPOINTMENT_COLUMNS), literal(now, DateTime))
+        .where(Appointment.id.in_(appointment_ids)),
+    ))
+    if treatment_ids:
+        db.session.execute(insert(ArchivedTreatment).from_select(
+            TREATMENT_COLUMNS,
+            select(*_columns(Treatment, TREATMENT_COLUMNS)).where(Treatment.id.in_(treatment_ids)),
+        ))
+
+    # Core deletes: the ORM hooks (counters, reminders) must not see these
+    # as cancellations; the appointment still exists, only elsewhere.
+    db.session.execute(delete(Reminder).where(Reminder.appointment_id.in_(appointment_ids)))
+    db.session.execute(delete(TimeSlot).where(TimeSlot.appointment_id.in_(appointment_ids)))
+    if treatment_ids:
+        db.session.execute(delete(Treatment).where(Treatment.id.in_(treatment_ids)))
+    db.session.execute(delete(Appointment).where(Appointment.id.in_(appointment_ids)))
+    db.session.commit()
+    return len(appointment_ids), len(treatment_ids)
+
+
+def run(older_than_days=None, batch_size=None, pause=None, now=None):
+    """Archive everything that is due. Returns ``{"appointments": n, "treatments": n, "batches": n}``."""
+    days = older_than_days if older_than_days is not None else setting("ARCHIVE_AFTER_DAYS", 365)
+    batch_size = batch_size or setting("ARCHIVE_BATCH_SIZE", 500)
+    pause = pause if pause is not None else setting("ARCHIVE_PAUSE_SECONDS", 0.05)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+
+    report = {"appointments": 0, "treatments": 0, "batches": 0}
+    while True:
+        appointments, treatments = archive_batch(cutoff, batch_size)
+        if not appointments:
+            return report
+        report["appointments"] += appointments
+        report["treatments"] += treatments
+        report["batches"] += 1
+        if pause:
+            time.sleep(pause)
+
+
+@task("archive.run", every=3600, timeout=3600)
+def archive_job():
+    return run()
+
+
+# ---------- Reading across hot and archive ----------
+
+def merged(key, *queries, limit=None):
+    """
+    Rows of ``queries`` (each already ordered by ``key`` descending) as one
+    list ordered the same way. With ``limit`` each query reads at most
+    ``limit`` rows.
+    """
+    if limit is not None:
+        queries = [query.limit(limit) for query in queries]
+    rows = heapq.merge(*(query.all() for query in queries), key=key, reverse=True)
+    return list(itertools.islice(rows, limit))
+
+
+def each(build):
+    """``build(appointment_model, treatment_model)`` for the hot and for the archive tables."""
+    return [
+        build(Appointment, Treatment),
+        build(ArchivedAppointment, ArchivedTreatment),
+    ]
+
@@ -0,0 +1,150 @@
+"""
+Shared session guard for the admin, doctor and patient blueprints.
+
+The logged-in principal is loaded once per request into ``g.principal``
+and kept in a small per-process TTL/LRU cache across requests, so most
+page views need no user SELECT at all. Updates and deletes of Admin,
+Doctor or Patient rows evict the cached entry when the transaction
+commits; other worker processes catch up within PRINCIPAL_CACHE_TTL.
+
+``last_seen`` is kept in the session as epoch seconds and only rewritten
+once per LAST_SEEN_REFRESH_SECONDS, so most responses carry no Set-Cookie.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import g, redirect, session, url_for
+from sqlalchemy import event, inspect
+
+from app.cache import TTLCache
+from app.database import db, setting
+from app.models import Admin, Doctor, Patient, StatusEnum
+
+
+Principal = namedtuple("Principal", "role id name status")
+
+MODELS = {"admin": Admin, "doctor": Doctor, "patient": Patient}
+BLOCKED = (StatusEnum.inactive, StatusEnum.blacklisted)
+
+_cache = TTLCache()
+
+
+def _load(role, user_id):
+    model = MODELS[role]
+    name_column = model.username if model is Admin else model.name
+    row = (
+        db.session.query(model.id, name_column, model.status)
+        .filter(model.id == user_id)
+        .first()
+    )
+    return Principal(role, row[0], row[1], row[2]) if row else None
+
+
+def current_principal():
+    """The logged-in user as a Principal tuple, or None."""
+    if "principal" in g:
+        return g.principal
+
+    role = session.get("user_role")
+    user_id = session.get("user_id")
+    principal = None
+    if role in MODELS and user_id:
+        _cache.ttl = setting("PRINCIPAL_CACHE_TTL", 30)
+        _cache.maxsize = setting("PRINCIPAL_CACHE_SIZE", 4096)
+        key = (role, user_id)
+        principal = _cache.get(key)
+        if principal is None:
+            principal = _load(role, user_id)
+            if principal is not None:
+                _cache.set(key, principal)
+
+    g.principal = principal
+    return principal
+
+
+def invalidate(role, user_id):
+    _cache.pop((role, user_id))
+
+
+def stats():
+    return {"hits": _cache.hits, "misses": _cache.misses, "size": len(_cache)}
+
+
+def _last_seen():
+    value = session.get("last_seen")
+    if isinstance(value, str):
+        # sessions issued before last_seen became epoch seconds
+        try:
+            return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+        except ValueError:
+            return None
+    return value
+
+
+def touch_session():
+    session["last_seen"] = int(time.time())
+
+
+def authenticate(*roles):
+    """
+    The session's Principal if it has one of ``roles`` (any role when none
+    are given), has not timed out and is not blocked; otherwise None.
+    Expired or blocked sessions are cleared.
+    """
+    if not session.get("user_id") or session.get("user_role") not in (roles or MODELS):
+        return None
+
+    now = int(time.time())
+    last_seen = _last_seen()
+    if last_seen and now - last_seen > setting("SESSION_TIMEOUT_MINUTES", 30) * 60:
+        session.clear()
+        return None
+
+    principal = current_principal()
+    if principal is None or principal.status in BLOCKED:
+        session.clear()
+        return None
+
+    if last_seen is None or now - last_seen >= setting("LAST_SEEN_REFRESH_SECONDS", 60):
+        session["last_seen"] = now
+    return principal
+
+
+def guard(role, name_key=None):
+    """
+    Body of a blueprint before_request: returns a redirect to the login
+    page, or None when the request may proceed.
+    """
+    principal = authenticate(role)
+    if principal is None:
+        return redirect(url_for("auth.login"))
+
+    if name_key and session.get(name_key) != principal.name:
+        session[name_key] = principal.name
+    return None
+
+
+# ---------- Invalidation ----------
+
+def _mark_changed(mapper, connection, target):
+    session_ = inspect(target).session
+    if session_ is not None:
+        role = next(name for name, model in MODELS.items() if isinstance(target, model))
+        session_.info.setdefault("principal_changes", set()).add((role, target.id))
+
+
+for _model in MODELS.values():
+    event.listen(_model, "after_update", _mark_changed)
+    event.listen(_model, "after_delete", _mark_changed)
+
+
+@event.listens_for(db.session, "after_commit")
+def _evict_changed(session_):
+    for role, user_id in session_.info.pop("principal_changes", ()):
+        invalidate(role, user_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_changes(session_):
+    session_.info.pop("principal_changes", None)
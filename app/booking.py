@@ -0,0 +1,106 @@
+"""
+Appointment booking.
+
+Both booking routes go through book_appointment(), which checks for an
+overlapping booked appointment and inserts the new one inside a single
+write transaction, so two concurrent requests cannot both win:
+
+* SQLite: ``BEGIN IMMEDIATE`` takes the database write lock up front.
+* Other backends: the doctor row is locked with ``SELECT ... FOR UPDATE``.
+
+The check and the uq_doctor_booked_start index agree on what is taken:
+booked appointments only. So the index never fires for a booking that
+got past the check; if it does, the IntegrityError is a bug and is left
+to surface rather than reported as a conflict.
+
+Lock timeouts are retried a few times with a short backoff before giving up.
+"""
+import random
+import time
+from datetime import timedelta
+
+from sqlalchemy.exc import OperationalError
+
+from app import slots
+from app.database import begin_write, db
+from app.models import Appointment, Doctor, StatusEnum
+
+
+MAX_ATTEMPTS = 5
+NOT_A_SLOT = "That time is not an open slot in the doctor's schedule."
+
+
+class BookingConflict(Exception):
+    """The doctor is not available at the requested time."""
+
+
+def overlapping(doctor_id, start, end):
+    """Booked appointments of ``doctor_id`` that intersect [start, end)."""
+    return Appointment.query.filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.status == StatusEnum.booked,
+        Appointment.appointment_start < end,
+        Appointment.appointment_end > start,
+    )
+
+
+def _lock_doctor(doctor_id):
+    if db.session.get_bind().dialect.name == "sqlite":
+        return True  # BEGIN IMMEDIATE already serializes writers
+    return db.session.query(Doctor.id).filter(Doctor.id == doctor_id).with_for_update().scalar() is not None
+
+
+def _try_book(patient_id, doctor_id, start, end, reason):
+    begin_write()
+    try:
+        if not _lock_doctor(doctor_id):
+            raise BookingConflict("Doctor not found.")
+
+        # A scheduled doctor's appointment is exactly the slot it takes
+        uses_slots = slots.doctor_uses_slots(doctor_id)
+        if uses_slots:
+            end = slots.slot_end(doctor_id, start)
+            if end is None:
+                raise BookingConflict(NOT_A_SLOT)
+
+        if db.session.query(overlapping(doctor_id, start, end).exists()).scalar():
+            raise BookingConflict("The doctor already has an appointment at this time.")
+
+        appointment = Appointment(
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            appointment_start=start,
+            appointment_end=end,
+            reason=reason,
+            status=StatusEnum.booked,
+        )
+        db.session.add(appointment)
+        db.session.flush()
+
+        if uses_slots and not slots.claim_slot(doctor_id, start, appointment.id):
+            raise BookingConflict(NOT_A_SLOT)
+
+        db.session.commit()
+        return appointment
+    except BaseException:
+        db.session.rollback()
+        raise
+
+
+def book_appointment(patient_id, doctor_id, start, reason, minutes=None):
+    """
+    Book ``doctor_id`` for ``patient_id`` at ``start``; raises BookingConflict.
+
+    The appointment ends with the slot it takes, or ``minutes`` (default
+    SLOT_MINUTES) after ``start`` for a doctor without a schedule.
+    """
+    end = start + timedelta(minutes=minutes or slots.slot_minutes())
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return _try_book(patient_id, doctor_id, start, end, reason)
+        except OperationalError:
+            # database is locked / lock timeout / deadlock: back off and retry
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
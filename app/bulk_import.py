@@ -0,0 +1,379 @@
+"""
+Bulk import of patients, doctors and historical appointments from CSV or
+JSONL.
+
+Input is streamed in chunks. Emails are de-duplicated against a set
+preloaded with one query, passwords are hashed in a process pool and each
+chunk goes in with a single executemany insert. Rows that cannot be
+imported are written to a side file with their line number and reason;
+the rest of the file still goes in.
+
+The process pool is for ``flask import-data``. Admin uploads are saved
+and handed to the ``imports.run`` job, which hashes in the worker's own
+process.
+
+Password hashing dominates the cost. Set IMPORT_PASSWORD_METHOD to a
+cheaper werkzeug method (e.g. ``pbkdf2:sha256:20000``) for very large
+imports. Rows without a password get an unusable hash and need a reset.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import counters, identity, refdata, reminders, slots
+from app.database import db
+from app.models import (
+    Appointment,
+    Department,
+    Doctor,
+    Patient,
+    StatusEnum,
+    Treatment,
+    UserIdentity,
+    UserRole,
+)
+
+
+KINDS = ("patients", "doctors", "appointments")
+UNUSABLE_PASSWORD = "!"
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.error_file = None
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "error_file": self.error_file,
+        }
+
+
+# ---------- Reading ----------
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, row_dict_or_None)``; None marks an unparsable line."""
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def detect_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+# ---------- Field parsing ----------
+
+def _text(row, key, required=False):
+    value = row.get(key)
+    value = str(value).strip() if value is not None else ""
+    if required and not value:
+        raise ValueError(f"missing {key}")
+    return value or None
+
+
+def _int(row, key):
+    value = _text(row, key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number")
+
+
+def _status(row, default):
+    value = (_text(row, "status") or "").lower()
+    if not value:
+        return default
+    if value not in StatusEnum.__members__:
+        raise ValueError(f"unknown status {value!r}")
+    return StatusEnum[value]
+
+
+def _datetime(row, key, required=False):
+    value = _text(row, key, required=required)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} must be an ISO date/time")
+
+
+def _hash(job):
+    password, method = job
+    if not password:
+        return UNUSABLE_PASSWORD
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+# ---------- Row builders ----------
+
+def _patient(row, ctx):
+    email = _text(row, "email", required=True).lower()
+    if email in ctx["emails"]:
+        return None
+    patient = {
+        "name": _text(row, "name", required=True),
+        "email": email,
+        "password": _text(row, "password"),
+        "age": _int(row, "age"),
+        "gender": _text(row, "gender"),
+        "phone": _text(row, "phone"),
+        "address": _text(row, "address"),
+        "notes": _text(row, "notes"),
+        "status": _status(row, StatusEnum.active),
+    }
+    ctx["emails"].add(email)
+    return patient
+
+
+def _doctor(row, ctx):
+    email = _text(row, "email", required=True).lower()
+    if email in ctx["emails"]:
+        return None
+    doctor = {
+        "name": _text(row, "name", required=True),
+        "email": email,
+        "password": _text(row, "password"),
+        "phone": _text(row, "phone"),
+        "bio": _text(row, "bio"),
+        "years_of_experience": _int(row, "years_of_experience"),
+        "status": _status(row, StatusEnum.active),
+    }
+    department = _text(row, "department", required=True)
+    department_id = ctx["departments"].get(department.lower())
+    if department_id is None:
+        new_department = Department(name=department)
+        db.session.add(new_department)
+        db.session.flush()
+        department_id = ctx["departments"][department.lower()] = new_department.id
+    doctor["department_id"] = department_id
+    ctx["emails"].add(email)
+    return doctor
+
+
+def _appointment(row, ctx):
+    patient_id = ctx["patients"].get(_text(row, "patient_email", required=True).lower())
+    if patient_id is None:
+        raise ValueError("unknown patient_email")
+    doctor_id = ctx["doctors"].get(_text(row, "doctor_email", required=True).lower())
+    if doctor_id is None:
+        raise ValueError("unknown doctor_email")
+
+    start = _datetime(row, "appointment_start", required=True)
+    end = _datetime(row, "appointment_end")
+    if end is None:
+        end = start + timedelta(minutes=slots.slot_minutes())
+    if (doctor_id, start) in ctx["seen"]:
+        return None
+    ctx["seen"].add((doctor_id, start))
+
+    treatment = None
+    if _text(row, "diagnosis") or _text(row, "prescription"):
+        treatment = {
+            "diagnosis": _text(row, "diagnosis"),
+            "prescription": _text(row, "prescription"),
+            "notes": _text(row, "treatment_notes"),
+            "treatment_date": _datetime(row, "treatment_date") or end,
+        }
+
+    return {
+        "patient_id": patient_id,
+        "doctor_id": doctor_id,
+        "appointment_start": start,
+        "appointment_end": end,
+        "status": _status(row, StatusEnum.completed),
+        "reason": _text(row, "reason"),
+        "treatment": treatment,
+    }
+
+
+# ---------- Preloading ----------
+
+def _context(kind):
+    # Emails are unique across every account type, not just this one
+    emails = {email for (email,) in db.session.query(UserIdentity.email)} if kind != "appointments" else None
+    if kind == "patients":
+        return {"emails": emails}
+    if kind == "doctors":
+        return {
+            "emails": emails,
+            "departments": {
+                name.lower(): id_ for id_, name in db.session.query(Department.id, Department.name)
+            },
+        }
+    return {
+        "patients": {email.lower(): id_ for id_, email in db.session.query(Patient.id, Patient.email)},
+        "doctors": {email.lower(): id_ for id_, email in db.session.query(Doctor.id, Doctor.email)},
+        "seen": set(),
+    }
+
+
+def _existing_appointments(rows):
+    """(doctor_id, start) pairs from this chunk that are already in the table."""
+    doctor_ids = {row["doctor_id"] for row in rows}
+    starts = [row["appointment_start"] for row in rows]
+    return set(
+        db.session.query(Appointment.doctor_id, Appointment.appointment_start)
+        .filter(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.appointment_start >= min(starts),
+            Appointment.appointment_start <= max(starts),
+        )
+        .all()
+    )
+
+
+# ---------- Writing ----------
+
+def _write_users(model, rows, pool, method):
+    passwords = [(row.pop("password"), method) for row in rows]
+    hashes = pool.map(_hash, passwords, chunksize=64) if pool else map(_hash, passwords)
+    for row, password_hash in zip(rows, hashes):
+        row["password_hash"] = password_hash
+    ids = db.session.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    # Bulk inserts skip the ORM events that maintain the login directory
+    # and the dashboard counters
+    identity.add_many(
+        UserRole.patient if model is Patient else UserRole.doctor,
+        ((user_id, row["email"], row["status"], row["password_hash"]) for user_id, row in zip(ids, rows)),
+    )
+    counters.add(counters.tally("patient" if model is Patient else "doctor", rows))
+    if model is Doctor:
+        counters.add_departments(Counter(row["department_id"] for row in rows))
+        refdata.touch(refdata.DOCTORS)
+    return len(rows)
+
+
+def _write_appointments(rows):
+    existing = _existing_appointments(rows)
+    fresh = [row for row in rows if (row["doctor_id"], row["appointment_start"]) not in existing]
+    if not fresh:
+        return 0
+
+    treatments = [row.pop("treatment") for row in fresh]
+    # RETURNING keeps ids in insert order, so treatments can be matched up
+    ids = db.session.execute(
+        insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+        fresh,
+    ).scalars().all()
+    treatment_rows = [
+        dict(treatment, appointment_id=appointment_id)
+        for appointment_id, treatment in zip(ids, treatments)
+        if treatment
+    ]
+    if treatment_rows:
+        db.session.execute(insert(Treatment), treatment_rows)
+    counters.add(counters.tally("appointment", fresh))
+    reminders.schedule(ids)
+    return len(fresh)
+
+
+def import_stream(kind, stream, fmt="csv", error_path=None, chunk_size=None, workers=None):
+    """
+    Import ``stream`` (a text file object) and return an ImportReport.
+    ``workers=0`` hashes passwords in this process instead of a process
+    pool; use it wherever forking is unsafe (web and job workers).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+
+    config = current_app.config
+    chunk_size = chunk_size or config.get("IMPORT_CHUNK_SIZE", 5000)
+    commit_every = config.get("IMPORT_COMMIT_CHUNKS", 5)
+    method = config.get("IMPORT_PASSWORD_METHOD")
+    build = {"patients": _patient, "doctors": _doctor, "appointments": _appointment}[kind]
+
+    report = ImportReport(kind)
+    ctx = _context(kind)
+    errors = open(error_path, "w", encoding="utf-8") if error_path else None
+    pool = ProcessPoolExecutor(max_workers=workers) if kind != "appointments" and workers != 0 else None
+
+    try:
+        for n, chunk in enumerate(chunked(read_rows(stream, fmt), chunk_size), start=1):
+            rows = []
+            for line_no, raw in chunk:
+                try:
+                    if raw is None:
+                        raise ValueError("unparsable line")
+                    row = build(raw, ctx)
+                except ValueError as exc:
+                    report.failed += 1
+                    if errors:
+                        errors.write(json.dumps({"line": line_no, "error": str(exc), "row": raw}, default=str) + "\n")
+                    continue
+                if row is None:
+                    report.skipped += 1
+                else:
+                    rows.append(row)
+
+            if rows:
+                if kind == "appointments":
+                    written = _write_appointments(rows)
+                    report.skipped += len(rows) - written
+                else:
+                    written = _write_users(Patient if kind == "patients" else Doctor, rows, pool, method)
+                report.inserted += written
+
+            if n % commit_every == 0:
+                db.session.commit()
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        if pool:
+            pool.shutdown()
+        if errors:
+            errors.close()
+
+    if error_path and report.failed:
+        report.error_file = error_path
+    elif error_path and os.path.exists(error_path):
+        os.remove(error_path)
+    return report
+
+
+def import_file(kind, path, error_path=None, **kwargs):
+    with open(path, newline="", encoding="utf-8") as stream:
+        return import_stream(kind, stream, detect_format(path), error_path=error_path, **kwargs)
@@ -0,0 +1,176 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ---------- Versioned cache ----------
+
+class LocalBackend:
+    """Versions and values kept in this process only."""
+
+    shared = False
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, name):
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get(self, name):
+        return None
+
+    def set(self, name, version, value):
+        pass
+
+
+class SQLiteBackend:
+    """
+    Versions and pickled values in a small SQLite file, so every worker
+    process on the host sees the same versions and shares loaded values.
+    """
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                " name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, value BLOB)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    def version(self, name):
+        row = self._connect().execute(
+            "SELECT version FROM cache_entry WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO cache_entry (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1, value = NULL",
+                (name,),
+            )
+
+    def get(self, name):
+        row = self._connect().execute(
+            "SELECT version, value FROM cache_entry WHERE name = ? AND value IS NOT NULL", (name,)
+        ).fetchone()
+        return (row[0], pickle.loads(row[1])) if row else None
+
+    def set(self, name, version, value):
+        # Only store if nobody bumped the version while we were loading
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO cache_entry (name, version, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value "
+                "WHERE cache_entry.version = excluded.version",
+                (name, version, pickle.dumps(value)),
+            )
+
+
+class VersionedCache:
+    """
+    Named values that are reloaded whenever their version is bumped.
+
+    Each process keeps its own copy in a TTLCache. With the local backend
+    a bump only reaches this process, so ``ttl`` bounds how stale other
+    processes can be; with a shared backend versions are checked on every
+    read and the TTL only limits memory.
+    """
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend or LocalBackend()
+        self._local = TTLCache(maxsize=256, ttl=ttl)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(name, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, name, loader):
+        version = self.backend.version(name)
+
+        entry = self._local.get(name)
+        if (entry is None or entry[0] != version) and self.backend.shared:
+            entry = self.backend.get(name)
+            if entry is not None and entry[0] == version:
+                self._local.set(name, entry)
+        if entry is not None and entry[0] == version:
+            self._count(name, "hits")
+            return entry[1]
+
+        self._count(name, "misses")
+        value = loader()
+        self._local.set(name, (version, value))
+        self.backend.set(name, version, value)
+        return value
+
+    def bump(self, *names):
+        for name in names:
+            self.backend.bump(name)
+            self._local.pop(name)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._stats.items()}
@@ -0,0 +1,284 @@
+import json
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database import db
+
+
+# Every subsystem is imported inside the command that uses it, so
+# create_app() (which registers these commands) does not load them all.
+# The choices below are spelled out for the same reason; bulk_import and
+# exports check them again.
+IMPORT_KINDS = ("patients", "doctors", "appointments")
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+# ---------- Schema ----------
+
+def init_database(admin_username="admin", admin_email="admin@example.com", admin_password="admin"):
+    """Bring the schema up to date and make sure the default admin exists."""
+    from app import migrations
+    from app.models import create_default_admin
+
+    applied = migrations.upgrade()
+    create_default_admin(admin_username, admin_email, admin_password)
+    return applied
+
+
+@click.command("init")
+@click.option("--admin-username", default="admin", show_default=True)
+@click.option("--admin-email", default="admin@example.com", show_default=True)
+@click.option("--admin-password", default="admin", show_default=True)
+@with_appcontext
+def init_command(admin_username, admin_email, admin_password):
+    """Create or upgrade the schema and the default admin (run once per deploy)."""
+    applied = init_database(admin_username, admin_email, admin_password)
+    for number, name in applied:
+        click.echo(f"Applied migration {number:04d} {name}")
+    click.echo("Database is ready.")
+
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Apply pending schema migrations to the configured database."""
+    from app import migrations
+
+    applied = migrations.upgrade()
+    if not applied:
+        click.echo("Database is up to date.")
+    for number, name in applied:
+        click.echo(f"Applied migration {number:04d} {name}")
+
+
+@click.command("explain-queries")
+@with_appcontext
+def explain_queries_command():
+    """Check that every dashboard/history query is served by an index."""
+    from app import queries
+
+    now = datetime.utcnow()
+    checks = {
+        "admin.dashboard": queries.admin_upcoming_appointments(now),
+        "doctor.dashboard": queries.doctor_upcoming_appointments(1, now),
+        "doctor.manage_patients": queries.doctor_patients(1),
+        "doctor.patient_history": queries.doctor_patient_treatments(1, 1),
+        "patient.dashboard (upcoming)": queries.patient_upcoming_appointments(1, now),
+        "patient.dashboard (past)": queries.patient_past_appointments(1),
+        "patient.treatments": queries.patient_treatments(1),
+        "patient.dashboard (archived)": queries.archived_patient_appointments(1),
+        "patient.treatments (archived)": queries.archived_patient_treatments(1),
+        "doctor.patient_history (archived)": queries.archived_doctor_patient_treatments(1, 1),
+    }
+
+    failed = False
+    for name, query in checks.items():
+        plan = queries.query_plan(query)
+        scans = queries.full_scans(plan, {"appointment", "treatment", "appointment_archive", "treatment_archive"})
+        click.echo(f"{'FAIL' if scans else 'ok  '} {name}")
+        for line in plan:
+            click.echo(f"       {line}")
+        failed = failed or bool(scans)
+
+    if failed:
+        raise click.ClickException("Some queries do a full table scan.")
+
+
+@click.command("sync-replicas")
+@click.option("--interval", type=float, help="Keep syncing every N seconds.")
+@with_appcontext
+def sync_replicas_command(interval):
+    """Copy the primary SQLite database onto the SQLite read replicas."""
+    from app import replicas
+
+    while True:
+        synced = replicas.sync_sqlite_replicas()
+        click.echo(f"Synced {', '.join(synced) or 'no SQLite replicas'} at {datetime.utcnow():%H:%M:%S}")
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+# ---------- Counters ----------
+
+@click.command("reconcile-counters")
+@with_appcontext
+def reconcile_counters_command():
+    """Recompute the dashboard counters and Department.doctors_count."""
+    from app import counters
+
+    drift = counters.reconcile()
+    db.session.commit()
+    if not drift:
+        click.echo("Counters were already correct.")
+    for name, (stored, actual) in sorted(drift.items()):
+        click.echo(f"{name}: {stored} -> {actual}")
+
+
+# ---------- Slots ----------
+
+@click.command("generate-slots")
+@with_appcontext
+def generate_slots_command():
+    """Materialize TimeSlot rows for the rolling booking horizon."""
+    from app import slots
+
+    inserted, purged = slots.extend_horizon()
+    click.echo(f"Created {inserted} slots, removed {purged} past free slots.")
+
+
+# ---------- Reminders ----------
+
+@click.command("schedule-reminders")
+@with_appcontext
+def schedule_reminders_command():
+    """Write reminders for bookings that came into range to the outbox."""
+    from app import reminders
+
+    for kind, created in reminders.scan().items():
+        click.echo(f"{kind}: {created} reminders scheduled")
+
+
+@click.command("send-reminders")
+@with_appcontext
+def send_reminders_command():
+    """Hand every due reminder in the outbox to the configured sender."""
+    from app import reminders
+
+    report = reminders.drain()
+    click.echo(f"Sent {report['sent']}, failed {report['failed']}, dropped {report['expired']} expired.")
+
+
+# ---------- Archive ----------
+
+@click.command("archive")
+@click.option("--older-than-days", type=int, help="Default: ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, help="Appointments moved per transaction (default: ARCHIVE_BATCH_SIZE).")
+@click.option("--pause", type=float, help="Seconds to wait between batches (default: ARCHIVE_PAUSE_SECONDS).")
+@with_appcontext
+def archive_command(older_than_days, batch_size, pause):
+    """Move old completed/cancelled appointments and their treatments to the archive tables."""
+    from app import archive
+
+    report = archive.run(older_than_days, batch_size, pause)
+    click.echo(
+        f"Archived {report['appointments']} appointments and {report['treatments']} treatments "
+        f"in {report['batches']} batches."
+    )
+
+
+# ---------- Bulk import ----------
+
+@click.command("import-data")
+@click.argument("kind", type=click.Choice(IMPORT_KINDS))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--errors", "error_path", help="Where to write rejected rows (default: PATH.errors.jsonl).")
+@click.option("--chunk-size", type=int, help="Rows per insert batch.")
+@click.option("--workers", type=int, help="Password hashing processes (default: CPU count; 0 hashes in this process).")
+@with_appcontext
+def import_data_command(kind, path, error_path, chunk_size, workers):
+    """Bulk-load patients, doctors or appointments from CSV/JSONL."""
+    from app import bulk_import
+
+    started = datetime.utcnow()
+    report = bulk_import.import_file(
+        kind,
+        path,
+        error_path=error_path or path + ".errors.jsonl",
+        chunk_size=chunk_size,
+        workers=workers,
+    )
+    seconds = (datetime.utcnow() - started).total_seconds()
+    click.echo(
+        f"Imported {report.inserted} {kind} in {seconds:.1f}s "
+        f"({report.skipped} duplicates skipped, {report.failed} rejected)."
+    )
+    if report.error_file:
+        click.echo(f"Rejected rows written to {report.error_file}")
+
+
+# ---------- Export ----------
+
+@click.command("export")
+@click.argument("kind", type=click.Choice(["appointments", "history"]))
+@click.option("--output", "-o", required=True, type=click.Path(dir_okay=False), help="File to write ('-' for stdout).")
+@click.option("--format", "fmt", type=click.Choice(EXPORT_FORMATS), default="csv")
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output.")
+@click.option("--patient-id", type=int, help="history: whose history to export.")
+@click.option("--department-id", type=int)
+@click.option("--doctor-id", type=int)
+@click.option("--start", type=click.DateTime(), help="appointments: first day (inclusive).")
+@click.option("--end", type=click.DateTime(), help="appointments: last day (exclusive).")
+@click.option("--batch-size", type=int, help="Rows fetched per round trip.")
+@with_appcontext
+def export_command(kind, output, fmt, compress, patient_id, department_id, doctor_id, start, end, batch_size):
+    """Stream appointments or a patient's history to CSV/JSONL."""
+    from app import exports
+
+    if kind == "history":
+        if patient_id is None:
+            raise click.UsageError("history needs --patient-id")
+        stmts = exports.patient_history(patient_id, doctor_id=doctor_id)
+    else:
+        stmts = exports.appointment_log(department_id, doctor_id, start, end)
+
+    written = 0
+    with click.open_file(output, "wb") as fh:
+        for chunk in exports.stream(stmts, fmt, compress, batch_size):
+            fh.write(chunk)
+            written += len(chunk)
+    if output != "-":
+        click.echo(f"Wrote {written} bytes to {output}", err=True)
+
+
+# ---------- Background jobs ----------
+
+@click.command("worker")
+@click.option("--concurrency", "-c", type=int, help="Jobs run at once (default: JOB_WORKERS).")
+@click.option("--pool", type=click.Choice(["thread", "process"]), help="Default: JOB_POOL.")
+@click.option("--queue", "-q", "queues", multiple=True, help="Only take jobs from these queues.")
+@click.option("--once", is_flag=True, help="Exit when no job is due instead of polling.")
+@with_appcontext
+def worker_command(concurrency, pool, queues, once):
+    """Run queued background jobs until stopped (SIGTERM/Ctrl-C finish running jobs first)."""
+    from app import jobs
+
+    app = current_app._get_current_object()
+    processed = jobs.run_worker(app, burst=once, concurrency=concurrency, pool=pool, queues=queues)
+    click.echo(f"Processed {processed} jobs.")
+
+
+@click.command("enqueue")
+@click.argument("name")
+@click.option("--payload", default="{}", help="JSON keyword arguments for the task.")
+@click.option("--key", help="Idempotency key; a second job with the same key is not added.")
+@click.option("--delay", type=int, default=0, help="Seconds before the job is due.")
+@with_appcontext
+def enqueue_command(name, payload, key, delay):
+    """Queue a background job by task name."""
+    from app import jobs
+
+    if name not in jobs.registered():
+        raise click.BadParameter(f"choose from {', '.join(sorted(jobs.registered()))}", param_hint="NAME")
+    job_id = jobs.enqueue(name, json.loads(payload), key=key, delay=delay)
+    db.session.commit()
+    click.echo(f"Job #{job_id} queued.")
+
+
+def register_commands(app):
+    app.cli.add_command(init_command)
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(sync_replicas_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(generate_slots_command)
+    app.cli.add_command(schedule_reminders_command)
+    app.cli.add_command(send_reminders_command)
+    app.cli.add_command(archive_command)
+    app.cli.add_command(import_data_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(enqueue_command)
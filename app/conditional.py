@@ -0,0 +1,148 @@
+"""
+Conditional GET support.
+
+Views work out a cheap validator first: a watermark from one aggregate
+query, a row's ``last_updated_at``, or a digest of data that is already
+cached in memory. When the client's If-None-Match still matches, they
+answer 304 Not Modified with no body and never run the page queries.
+
+ETags are strong. They digest everything the representation depends on,
+so two different bodies never share a tag. For pages and listings that
+includes the logged-in principal, the query string and the release (the
+newest template or module mtime), so a deploy never revalidates an old
+page.
+
+Pages that are about to show flashed messages are rendered in full and
+sent without an ETag, so a one-off message is never replayed from cache.
+"""
+import hashlib
+import json
+import os
+
+from flask import g, make_response, request, session
+from sqlalchemy import and_, case, func, select, true
+
+from app import auth
+from app.database import db
+from app.models import Appointment, StatusEnum, Treatment
+
+
+_release = None
+
+
+def etag(*parts):
+    raw = json.dumps(parts, default=str, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def release():
+    """Newest mtime under app/, read once per process."""
+    global _release
+    if _release is None:
+        root = os.path.dirname(os.path.abspath(__file__))
+        _release = max(
+            os.path.getmtime(os.path.join(path, name))
+            for path, _dirs, names in os.walk(root)
+            for name in names
+            if name.endswith((".py", ".html"))
+        )
+    return _release
+
+
+def request_etag(*parts):
+    """etag() scoped to the current principal, path and query string."""
+    principal = auth.current_principal()
+    return etag(
+        release(),
+        principal and (principal.role, principal.id, principal.name),
+        request.path,
+        sorted(request.args.items(multi=True)),
+        *parts,
+    )
+
+
+def tag(response, value):
+    """Attach ``value`` as the ETag and make shared caches keep out."""
+    if not g.get("etag_skipped"):
+        response.set_etag(value)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+
+def not_modified(value):
+    """A 304 response when the client already holds ``value``, else None."""
+    if "_flashes" in session:
+        g.etag_skipped = True
+        return None
+    if not request.if_none_match.contains_weak(value):
+        return None
+    return tag(make_response("", 304), value)
+
+
+def precondition_failed(value):
+    """True when an If-Match header is present and does not match ``value``."""
+    return bool(request.if_match) and not request.if_match.contains(value)
+
+
+# ---------- Watermarks ----------
+# One aggregate row per listing. Any insert, update or delete under the
+# criteria changes at least one of the values.
+
+def appointments_watermark(*criteria):
+    return tuple(
+        db.session.query(
+            func.count(Appointment.id),
+            func.max(Appointment.id),
+            func.max(Appointment.last_updated_at),
+        )
+        .filter(*criteria)
+        .one()
+    )
+
+
+def patient_watermark(patient_id, now):
+    """
+    Everything a patient's own pages show, in one round trip: their
+    appointments, their treatments and how many bookings are still
+    upcoming at ``now`` (which changes as soon as one starts).
+    """
+    appointments = (
+        select(
+            func.count(Appointment.id),
+            func.max(Appointment.id),
+            func.max(Appointment.last_updated_at),
+            func.count(case((and_(
+                Appointment.status == StatusEnum.booked,
+                Appointment.appointment_start >= now,
+            ), 1))),
+        )
+        .where(Appointment.patient_id == patient_id)
+        .subquery()
+    )
+    treatments = (
+        select(
+            func.count(Treatment.id),
+            func.max(Treatment.id),
+            func.max(Treatment.treatment_date),
+        )
+        .join(Appointment, Treatment.appointment_id == Appointment.id)
+        .where(Appointment.patient_id == patient_id)
+        .subquery()
+    )
+    stmt = select(appointments, treatments).select_from(appointments.join(treatments, true()))
+    return tuple(db.session.execute(stmt).one())
+
+
+def treatments_watermark(*criteria):
+    return tuple(
+        db.session.query(
+            func.count(Treatment.id),
+            func.max(Treatment.id),
+            func.max(Treatment.treatment_date),
+            func.max(Appointment.last_updated_at),
+        )
+        .join(Appointment, Treatment.appointment_id == Appointment.id)
+        .filter(*criteria)
+        .one()
+    )
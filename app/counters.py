@@ -0,0 +1,188 @@
+"""
+Maintained row counts.
+
+Inserts, deletes and status changes of Doctor, Patient and Appointment
+adjust the ``counter`` table (``doctor``, ``doctor.active``,
+``appointment.booked``, ...) and ``Department.doctors_count`` in the same
+transaction as the change, so the admin dashboard reads its numbers with
+one primary-key lookup instead of COUNT(*) over each table.
+
+Writes that bypass the ORM (bulk inserts, raw SQL) must call add() /
+add_departments() themselves; ``flask reconcile-counters`` recomputes
+everything from the tables if the two ever drift.
+"""
+from collections import Counter as Tally
+
+from sqlalchemy import event, func, inspect, select, text
+
+from app.database import db, keep_old_value
+from app.models import Appointment, ArchivedAppointment, Counter, Department, Doctor, Patient
+
+
+TRACKED = {Doctor: "doctor", Patient: "patient", Appointment: "appointment"}
+
+_UPSERT = text(
+    "INSERT INTO counter (name, value) VALUES (:name, :delta) "
+    "ON CONFLICT (name) DO UPDATE SET value = counter.value + excluded.value"
+)
+_DEPARTMENT = text(
+    "UPDATE department SET doctors_count = COALESCE(doctors_count, 0) + :delta WHERE id = :id"
+)
+
+
+def key(kind, status=None):
+    return f"{kind}.{status.name}" if status is not None else kind
+
+
+def get(*names):
+    """``{name: value}`` for ``names``; counters that were never written are 0."""
+    values = dict(db.session.query(Counter.name, Counter.value).filter(Counter.name.in_(names)))
+    return {name: values.get(name, 0) for name in names}
+
+
+def add(deltas, connection=None):
+    """Apply ``{counter_name: delta}`` in the current transaction."""
+    params = [{"name": name, "delta": delta} for name, delta in deltas.items() if delta]
+    if params:
+        (connection or db.session).execute(_UPSERT, params)
+
+
+def add_departments(deltas, connection=None):
+    """Apply ``{department_id: delta}`` to Department.doctors_count."""
+    params = [{"id": id_, "delta": delta} for id_, delta in deltas.items() if delta and id_]
+    if params:
+        (connection or db.session).execute(_DEPARTMENT, params)
+
+
+def tally(kind, rows):
+    """Counter deltas for freshly inserted ``rows`` (dicts with a ``status``)."""
+    deltas = Tally({kind: len(rows)})
+    deltas.update(key(kind, row["status"]) for row in rows)
+    return deltas
+
+
+# ---------- Reconciliation ----------
+
+def recount(connection):
+    """Counter values recomputed from the tables."""
+    values = Tally()
+    for model, kind in TRACKED.items():
+        # archived appointments still count towards the totals
+        for table in (model, ArchivedAppointment) if model is Appointment else (model,):
+            for status, count in connection.execute(
+                select(table.status, func.count()).group_by(table.status)
+            ):
+                values[key(kind, status)] += count
+                values[kind] += count
+        values.setdefault(kind, 0)
+    return dict(values)
+
+
+def reconcile(connection=None):
+    """
+    Overwrite every counter and Department.doctors_count with fresh counts.
+    Returns ``{name: (stored, actual)}`` for the counters that had drifted.
+    """
+    connection = connection or db.session.connection()
+    actual = recount(connection)
+    stored = dict(connection.execute(select(Counter.name, Counter.value)).all())
+
+    drift = {
+        name: (stored.get(name, 0), actual.get(name, 0))
+        for name in set(actual) | set(stored)
+        if stored.get(name, 0) != actual.get(name, 0)
+    }
+    connection.execute(Counter.__table__.delete())
+    if actual:
+        connection.execute(
+            Counter.__table__.insert(),
+            [{"name": name, "value": value} for name, value in actual.items()],
+        )
+
+    doctors = (
+        select(func.count(Doctor.id))
+        .where(Doctor.department_id == Department.id)
+        .scalar_subquery()
+    )
+    connection.execute(Department.__table__.update().values(doctors_count=doctors))
+    return drift
+
+
+# ---------- ORM sync ----------
+
+def _committed(target, attr):
+    """The value ``attr`` has in the database (before this flush)."""
+    history = inspect(target).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(target, attr)
+
+
+def _pending(target):
+    info = inspect(target).session.info
+    return (
+        info.setdefault("counter_deltas", Tally()),
+        info.setdefault("department_deltas", Tally()),
+    )
+
+
+def _after_insert(mapper, connection, target):
+    kind = TRACKED[type(target)]
+    counts, departments = _pending(target)
+    counts[kind] += 1
+    counts[key(kind, target.status)] += 1
+    if isinstance(target, Doctor):
+        departments[target.department_id] += 1
+
+
+def _after_update(mapper, connection, target):
+    kind = TRACKED[type(target)]
+    counts, departments = _pending(target)
+    old, new = _committed(target, "status"), target.status
+    if old != new:
+        counts[key(kind, old)] -= 1
+        counts[key(kind, new)] += 1
+    if isinstance(target, Doctor):
+        old, new = _committed(target, "department_id"), target.department_id
+        if old != new:
+            departments[old] -= 1
+            departments[new] += 1
+
+
+def _after_delete(mapper, connection, target):
+    kind = TRACKED[type(target)]
+    counts, departments = _pending(target)
+    counts[kind] -= 1
+    counts[key(kind, _committed(target, "status"))] -= 1
+    if isinstance(target, Doctor):
+        departments[_committed(target, "department_id")] -= 1
+
+
+for _model in TRACKED:
+    event.listen(_model, "after_insert", _after_insert)
+    event.listen(_model, "after_update", _after_update)
+    event.listen(_model, "after_delete", _after_delete)
+    # Load the previous value on assignment so expired rows still report
+    # which bucket they are leaving.
+    event.listen(_model.status, "set", keep_old_value, active_history=True)
+event.listen(Doctor.department_id, "set", keep_old_value, active_history=True)
+
+
+@event.listens_for(db.session, "after_flush")
+def _apply_pending(session, flush_context):
+    counts = session.info.pop("counter_deltas", None)
+    departments = session.info.pop("department_deltas", None)
+    if counts:
+        add(counts, session.connection())
+    if departments:
+        add_departments(departments, session.connection())
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_pending(session):
+    # A flush that failed part-way leaves its deltas behind; they must not
+    # ride along with the next successful commit
+    session.info.pop("counter_deltas", None)
+    session.info.pop("department_deltas", None)
@@ -1,5 +1,66 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import CompoundSelect, Select
 from werkzeug.security import generate_password_hash
 
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to a read replica when one has been
+    chosen for the current request (``info["replica"]``, see app.replicas).
+    Writes, locking reads, raw SQL and flushes always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if (
+            replica
+            and bind is None
+            and not self._flushing
+            and isinstance(clause, (Select, CompoundSelect))
+            and getattr(clause, "_for_update_arg", None) is None
+        ):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Initialize SQLAlchemy db instance (import this in models and app factory)
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+# ---------- Shared helpers ----------
+
+def setting(key, default=None):
+    """App config value, or ``default`` outside an app context (scripts, pool processes)."""
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def insert_ignoring(table, values, index_elements):
+    """INSERT ... ON CONFLICT (index_elements) DO NOTHING for the primary's dialect."""
+    dialect = db.session.get_bind(clause=table.insert()).dialect.name
+    builder = pg_insert if dialect == "postgresql" else sqlite_insert
+    return builder(table).values(values).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def keep_old_value(target, value, oldvalue, initiator):
+    """
+    No-op "set" listener. Registered with ``active_history=True`` it makes
+    the ORM load the previous value on assignment, so after_update hooks
+    can read it from the attribute history even for expired rows.
+    """
+
+
+def begin_write():
+    """
+    Commit whatever the session has open and start a write transaction.
+    On SQLite that is ``BEGIN IMMEDIATE``: the write lock is taken up
+    front, so reads made in the transaction cannot be overtaken by another
+    writer (no SQLITE_BUSY_SNAPSHOT when the first write comes).
+    """
+    db.session.commit()
+    if db.session.get_bind().dialect.name == "sqlite":
+        db.session.execute(text("BEGIN IMMEDIATE"))
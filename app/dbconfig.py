@@ -0,0 +1,94 @@
+"""
+Database engine profile.
+
+The URI and pool settings come from the environment so deployments do not
+have to edit code:
+
+* ``DATABASE_URL``                     – SQLAlchemy URI (default: app/hospital.db)
+* ``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW`` – connection pool size (server databases)
+* ``DB_POOL_TIMEOUT`` / ``DB_POOL_RECYCLE`` – seconds
+* ``DB_TUNING=0``                      – skip the SQLite pragmas below
+* ``DATABASE_REPLICA_URLS``            – comma-separated read replicas (app.replicas)
+
+On SQLite every new connection is switched to WAL (readers no longer wait
+for writers), ``synchronous=NORMAL`` (safe under WAL, far fewer fsyncs), a
+busy timeout, a memory map and a larger page cache. The values are
+SQLITE_* config keys and can be overridden like any other setting.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+SQLITE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+    "SQLITE_CACHE_SIZE_KB": 64 * 1024,
+}
+
+
+def _env_int(env, key, default):
+    value = env.get(key)
+    return int(value) if value not in (None, "") else default
+
+
+def load(config, env=os.environ):
+    """Fill database settings from ``env`` into the Flask ``config``."""
+    if env.get("DATABASE_URL"):
+        config["SQLALCHEMY_DATABASE_URI"] = env["DATABASE_URL"]
+    replicas = [url.strip() for url in env.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    if replicas:
+        config["SQLALCHEMY_BINDS"] = {f"replica{i}": url for i, url in enumerate(replicas, start=1)}
+        config["READ_REPLICAS"] = list(config["SQLALCHEMY_BINDS"])
+    config["DB_TUNING"] = env.get("DB_TUNING", "1").lower() not in ("0", "false", "no")
+    config["DB_POOL_SIZE"] = _env_int(env, "DB_POOL_SIZE", 10)
+    config["DB_MAX_OVERFLOW"] = _env_int(env, "DB_MAX_OVERFLOW", 20)
+    config["DB_POOL_TIMEOUT"] = _env_int(env, "DB_POOL_TIMEOUT", 30)
+    config["DB_POOL_RECYCLE"] = _env_int(env, "DB_POOL_RECYCLE", 1800)
+    for key, default in SQLITE_DEFAULTS.items():
+        config[key] = _env_int(env, key, default) if isinstance(default, int) else env.get(key, default)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured URI."""
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        # SQLAlchemy picks the right pool for files vs. :memory:; only the
+        # driver-level lock timeout matters here.
+        return {"connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+
+def sqlite_pragmas(config):
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+
+
+def install(engine, config):
+    """Apply the per-connection SQLite pragmas to ``engine``."""
+    if engine.dialect.name != "sqlite" or not config["DB_TUNING"]:
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
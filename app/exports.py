@@ -0,0 +1,219 @@
+"""
+Streaming CSV/JSONL exports.
+
+Exports select plain columns (no ORM objects) and fetch them in batches
+of EXPORT_BATCH_SIZE rows with ``yield_per``, which streams results from
+a server-side cursor where the driver supports one. Each batch is
+formatted, optionally gzip-compressed on the fly and handed to the
+caller before the next one is fetched, so memory stays flat no matter
+how many rows are exported.
+
+An export reads the hot and the archive tables with one statement each,
+both ordered by (appointment_start, appointment_id) along an index, and
+merges the two cursors row by row. Nothing has to sort the whole result
+before the first byte goes out.
+"""
+import csv
+import enum
+import heapq
+import io
+import itertools
+import json
+import operator
+import zlib
+from datetime import date, datetime
+
+from flask import Response, abort, current_app, has_app_context, request, stream_with_context
+from sqlalchemy import select
+
+from app import archive
+from app.database import db
+from app.models import Department, Doctor, Patient
+
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+DEFAULT_BATCH_SIZE = 2000
+# every export statement is ordered by these two columns
+_order_key = operator.attrgetter("appointment_start", "appointment_id")
+
+
+# ---------- Statements ----------
+
+def _in_order(stmts):
+    return [
+        stmt.order_by(stmt.selected_columns.appointment_start.asc(), stmt.selected_columns.appointment_id.asc())
+        for stmt in stmts
+    ]
+
+
+def patient_history(patient_id, doctor_id=None):
+    """Every appointment of a patient with its treatment, oldest first (hot and archived statements)."""
+    def build(appointment, treatment):
+        stmt = (
+            select(
+                appointment.id.label("appointment_id"),
+                appointment.appointment_start,
+                appointment.appointment_end,
+                appointment.status,
+                Doctor.name.label("doctor"),
+                Department.name.label("department"),
+                appointment.reason,
+                treatment.diagnosis,
+                treatment.prescription,
+                treatment.notes.label("treatment_notes"),
+                treatment.treatment_date,
+            )
+            .join(Doctor, appointment.doctor_id == Doctor.id)
+            .outerjoin(Department, Doctor.department_id == Department.id)
+            .outerjoin(treatment, treatment.appointment_id == appointment.id)
+            .where(appointment.patient_id == patient_id)
+        )
+        if doctor_id is not None:
+            stmt = stmt.where(appointment.doctor_id == doctor_id)
+        return stmt
+
+    return _in_order(archive.each(build))
+
+
+def appointment_log(department_id=None, doctor_id=None, start=None, end=None):
+    """Appointments in [start, end) (hot and archived statements), optionally for one department or doctor."""
+    def build(appointment, treatment):
+        stmt = (
+            select(
+                appointment.id.label("appointment_id"),
+                appointment.appointment_start,
+                appointment.appointment_end,
+                appointment.status,
+                appointment.patient_id,
+                Patient.name.label("patient"),
+                appointment.doctor_id,
+                Doctor.name.label("doctor"),
+                Department.name.label("department"),
+                appointment.reason,
+                appointment.created_at,
+            )
+            .join(Patient, appointment.patient_id == Patient.id)
+            .join(Doctor, appointment.doctor_id == Doctor.id)
+            .outerjoin(Department, Doctor.department_id == Department.id)
+        )
+        if department_id is not None:
+            stmt = stmt.where(Doctor.department_id == department_id)
+        if doctor_id is not None:
+            stmt = stmt.where(appointment.doctor_id == doctor_id)
+        if start is not None:
+            stmt = stmt.where(appointment.appointment_start >= start)
+        if end is not None:
+            stmt = stmt.where(appointment.appointment_start < end)
+        return stmt
+
+    return _in_order(archive.each(build))
+
+
+# ---------- Streaming ----------
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _batches(stmts, batch_size):
+    """The column names, then lists of up to ``batch_size`` rows of ``stmts`` merged in order."""
+    results = [db.session.execute(stmt, execution_options={"yield_per": batch_size}) for stmt in stmts]
+    try:
+        yield list(results[0].keys())
+        rows = heapq.merge(*results, key=_order_key)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+    finally:
+        for result in results:
+            result.close()
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = next(batches)
+    writer.writerow(header)
+    for rows in batches:
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _jsonl_chunks(batches):
+    header = next(batches)
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(header, (_value(value) for value in row)))) + "\n"
+            for row in rows
+        )
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(stmts, fmt="csv", compress=False, batch_size=None):
+    """Yield the rows of ``stmts`` (see patient_history()) as encoded (and optionally gzipped) bytes."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if batch_size is None:
+        batch_size = current_app.config.get("EXPORT_BATCH_SIZE", DEFAULT_BATCH_SIZE) \
+            if has_app_context() else DEFAULT_BATCH_SIZE
+
+    batches = _batches(stmts, batch_size)
+    text_chunks = _csv_chunks(batches) if fmt == "csv" else _jsonl_chunks(batches)
+    chunks = (chunk.encode("utf-8") for chunk in text_chunks)
+    return _gzip(chunks) if compress else chunks
+
+
+def filename(base, fmt, compress):
+    return f"{base}.{fmt}{'.gz' if compress else ''}"
+
+
+def mimetype(fmt, compress):
+    return "application/gzip" if compress else FORMATS[fmt]
+
+
+# ---------- HTTP ----------
+
+def request_options():
+    """``(format, gzip)`` from ``?format=csv|jsonl&gzip=1``; 400 on a bad format."""
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in FORMATS:
+        abort(400, f"format must be one of {', '.join(FORMATS)}")
+    return fmt, request.args.get("gzip", "").lower() in ("1", "true", "yes")
+
+
+def date_arg(name):
+    value = request.args.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f"{name} must be an ISO date")
+
+
+def response(stmts, base_name):
+    """A streamed download of ``stmts`` in the format the request asked for."""
+    fmt, compress = request_options()
+    return Response(
+        stream_with_context(stream(stmts, fmt, compress)),
+        mimetype=mimetype(fmt, compress),
+        headers={"Content-Disposition": f'attachment; filename="{filename(base_name, fmt, compress)}"'},
+    )
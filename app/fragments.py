@@ -0,0 +1,77 @@
+"""
+Template fragment cache and Jinja bytecode cache.
+
+``{% cache "name", key, ... %}...{% endcache %}`` renders its body once
+per distinct key and reuses the markup afterwards. The viewer's role and
+login state are always part of the key. Reference data is keyed with
+``refdata_version("departments")`` / ``refdata_version("active_doctors")``,
+so an edit to a department or doctor simply moves readers to a new key;
+old entries age out of the per-process LRU (FRAGMENT_CACHE_SIZE entries,
+FRAGMENT_CACHE_TTL seconds).
+
+Only cache fragments that depend on nothing but their key: no form state,
+no per-patient data, no flashed messages.
+
+Compiled templates are kept on disk (JINJA_BYTECODE_CACHE_DIR, default
+``instance/jinja_cache``) so a freshly started worker loads bytecode
+instead of parsing and compiling every template again. Jinja checks the
+source checksum, so edited templates are recompiled automatically.
+"""
+import os
+
+from flask import current_app, session
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from app import refdata
+from app.cache import TTLCache
+
+
+def _cache():
+    cache = current_app.extensions.get("fragment_cache")
+    if cache is None:
+        cache = current_app.extensions["fragment_cache"] = TTLCache(
+            maxsize=current_app.config.get("FRAGMENT_CACHE_SIZE", 256),
+            ttl=current_app.config.get("FRAGMENT_CACHE_TTL", 600),
+        )
+    return cache
+
+
+def stats():
+    cache = _cache()
+    return {"hits": cache.hits, "misses": cache.misses, "size": len(cache)}
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if not current_app.config.get("FRAGMENT_CACHE_ENABLED", True):
+            return caller()
+        key = (session.get("user_role"), bool(session.get("user_id")), *key)
+        cache = _cache()
+        markup = cache.get(key)
+        if markup is None:
+            markup = caller()
+            cache.set(key, markup)
+        return markup
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals["refdata_version"] = refdata.fingerprint
+
+    if app.config.get("JINJA_BYTECODE_CACHE", True):
+        path = app.config.get("JINJA_BYTECODE_CACHE_DIR") or os.path.join(app.instance_path, "jinja_cache")
+        os.makedirs(path, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(path)
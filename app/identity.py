@@ -0,0 +1,108 @@
+"""
+Identity directory used by login.
+
+Every Admin/Doctor/Patient insert, update and delete is mirrored into
+``user_identity`` on the same connection during flush, so the directory
+commits or rolls back with the change that caused it. Bulk inserts that
+bypass the ORM call add_many() themselves.
+"""
+from sqlalchemy import delete, event, insert, update
+
+from app.database import db
+from app.models import Admin, Doctor, Patient, StatusEnum, UserIdentity, UserRole
+
+
+MODELS = {
+    UserRole.admin: Admin,
+    UserRole.doctor: Doctor,
+    UserRole.patient: Patient,
+}
+ROLES = {model: role for role, model in MODELS.items()}
+
+identity_table = UserIdentity.__table__
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def lookup(email):
+    """The UserIdentity for ``email`` (any role), or None."""
+    return UserIdentity.query.filter_by(email=normalize_email(email)).first()
+
+
+def email_taken(email, exclude=None):
+    """
+    True if any account already uses ``email``.
+    ``exclude`` is the (model_instance) being edited, which may keep its own email.
+    """
+    identity = lookup(email)
+    if identity is None:
+        return False
+    if exclude is not None:
+        return not (identity.role == ROLES[type(exclude)] and identity.user_id == exclude.id)
+    return True
+
+
+def load_user(identity):
+    return db.session.get(MODELS[identity.role], identity.user_id)
+
+
+def add_many(role, rows):
+    """rows: iterable of (user_id, email, status, password_hash)."""
+    values = [
+        {
+            "email": normalize_email(email),
+            "role": role,
+            "user_id": user_id,
+            "status": status,
+            "password_hash": password_hash,
+        }
+        for user_id, email, status, password_hash in rows
+    ]
+    if values:
+        db.session.execute(insert(identity_table), values)
+
+
+# ---------- ORM sync ----------
+
+def _after_insert(mapper, connection, target):
+    connection.execute(
+        insert(identity_table).values(
+            email=normalize_email(target.email),
+            role=ROLES[type(target)],
+            user_id=target.id,
+            status=target.status or StatusEnum.active,
+            password_hash=target.password_hash,
+        )
+    )
+
+
+def _after_update(mapper, connection, target):
+    connection.execute(
+        update(identity_table)
+        .where(
+            identity_table.c.role == ROLES[type(target)],
+            identity_table.c.user_id == target.id,
+        )
+        .values(
+            email=normalize_email(target.email),
+            status=target.status,
+            password_hash=target.password_hash,
+        )
+    )
+
+
+def _after_delete(mapper, connection, target):
+    connection.execute(
+        delete(identity_table).where(
+            identity_table.c.role == ROLES[type(target)],
+            identity_table.c.user_id == target.id,
+        )
+    )
+
+
+for _model in MODELS.values():
+    event.listen(_model, "after_insert", _after_insert)
+    event.listen(_model, "after_update", _after_update)
+    event.listen(_model, "after_delete", _after_delete)
@@ -0,0 +1,393 @@
+"""
+Durable background jobs on a database table, no broker needed.
+
+Routes call ``enqueue("name", payload, key=...)`` inside their own
+transaction, so a job exists exactly when the change that asked for it
+was committed. ``flask worker`` claims due jobs and runs the registered
+task functions on a thread or process pool.
+
+* Claiming is one UPDATE ... RETURNING that flips due rows to ``running``
+  and stamps ``locked_until = now + timeout``. Two workers can never get
+  the same row.
+* Visibility timeout: a running job whose lock has expired (the worker
+  died or hung) is due again and is picked up by the next claim.
+* Retries: a failed attempt is re-queued with exponential backoff and
+  jitter (JOB_BACKOFF_SECONDS * 2**(attempt-1), capped at
+  JOB_BACKOFF_MAX). After ``max_attempts`` the job stays ``failed``.
+* Idempotency: ``key`` is unique. Enqueueing an existing key returns the
+  job that is already there instead of adding a second one.
+
+Tasks must tolerate running more than once: a worker can die after the
+work is done but before the job is marked succeeded.
+"""
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from app.database import db, insert_ignoring, setting
+from app.models import Job, JobStatus
+
+
+DEFAULT_TIMEOUT = 300
+_tasks = {}
+
+
+# ---------- Task registry ----------
+
+class Task:
+    def __init__(self, name, func, timeout, max_attempts, queue, every):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.queue = queue
+        self.every = every
+
+
+def task(name, timeout=None, max_attempts=None, queue="default", every=None):
+    """
+    Register ``func(**payload)`` as the task ``name``. With ``every``
+    (seconds), running workers also queue it once per period.
+    """
+    def register(func):
+        _tasks[name] = Task(name, func, timeout, max_attempts, queue, every)
+        return func
+    return register
+
+
+def registered():
+    # Importing the task module registers the built-in tasks
+    from app import tasks  # noqa: F401
+    return _tasks
+
+
+# ---------- Enqueue ----------
+
+def enqueue(name, payload=None, key=None, delay=0, run_at=None, queue=None, max_attempts=None):
+    """
+    Add a job in the current transaction (the caller commits) and return
+    its id. With ``key``, an existing job with that key wins.
+    """
+    spec = registered().get(name)
+    values = {
+        "name": name,
+        "queue": queue or (spec.queue if spec else "default"),
+        "payload": json.dumps(payload or {}, default=str),
+        "idempotency_key": key,
+        "status": JobStatus.queued,
+        "attempts": 0,
+        "max_attempts": max_attempts or (spec and spec.max_attempts) or setting("JOB_MAX_ATTEMPTS", 5),
+        "run_at": run_at or datetime.utcnow() + timedelta(seconds=delay),
+        "created_at": datetime.utcnow(),
+    }
+    if key is None:
+        return db.session.execute(Job.__table__.insert().values(values).returning(Job.id)).scalar()
+
+    db.session.execute(insert_ignoring(Job.__table__, values, ["idempotency_key"]))
+    return db.session.execute(select(Job.id).where(Job.idempotency_key == key)).scalar()
+
+
+# ---------- Claim / finish ----------
+
+def _due(now, queues):
+    lost = and_(Job.status == JobStatus.running, Job.locked_until < now, Job.attempts < Job.max_attempts)
+    waiting = and_(Job.status == JobStatus.queued, Job.run_at <= now)
+    clause = or_(waiting, lost)
+    if queues:
+        clause = and_(clause, Job.queue.in_(queues))
+    return clause
+
+
+def claim(worker_id, limit=1, queues=None):
+    """
+    Mark up to ``limit`` due jobs as running for ``worker_id`` and return
+    them as dicts. Commits.
+    """
+    now = datetime.utcnow()
+    timeout = setting("JOB_VISIBILITY_TIMEOUT", DEFAULT_TIMEOUT)
+    due = _due(now, queues)
+    candidates = select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(limit)
+    rows = db.session.execute(
+        update(Job)
+        # repeating the condition keeps a row another worker took meanwhile out
+        .where(Job.id.in_(candidates.scalar_subquery()), due)
+        .values(
+            status=JobStatus.running,
+            attempts=Job.attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=timeout),
+            started_at=now,
+        )
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+    ).all()
+    db.session.commit()
+
+    claimed = []
+    for row in rows:
+        spec = _tasks.get(row.name)
+        if spec is not None and spec.timeout and spec.timeout != timeout:
+            _extend(row.id, worker_id, spec.timeout)
+        claimed.append(row._asdict())
+    return claimed
+
+
+def _extend(job_id, worker_id, seconds):
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=seconds))
+    )
+    db.session.commit()
+
+
+def _owned(job):
+    # The attempt number fences off a worker whose lock expired meanwhile
+    return and_(
+        Job.id == job["id"],
+        Job.status == JobStatus.running,
+        Job.locked_by == job["worker_id"],
+        Job.attempts == job["attempts"],
+    )
+
+
+def backoff(attempt):
+    base = setting("JOB_BACKOFF_SECONDS", 10)
+    delay = min(base * 2 ** (attempt - 1), setting("JOB_BACKOFF_MAX", 3600))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def complete(job, result):
+    db.session.execute(
+        update(Job)
+        .where(_owned(job))
+        .values(
+            status=JobStatus.succeeded,
+            result=json.dumps(result, default=str) if result is not None else None,
+            locked_until=None,
+            finished_at=datetime.utcnow(),
+        )
+    )
+    db.session.commit()
+
+
+def fail(job, error):
+    now = datetime.utcnow()
+    final = job["attempts"] >= job["max_attempts"]
+    values = {"last_error": error[-4000:], "locked_until": None}
+    if final:
+        values.update(status=JobStatus.failed, finished_at=now)
+    else:
+        values.update(status=JobStatus.queued, run_at=now + timedelta(seconds=backoff(job["attempts"])))
+    db.session.execute(update(Job).where(_owned(job)).values(**values))
+    db.session.commit()
+
+
+def reap():
+    """Give up on lost jobs that have no attempts left. Returns how many."""
+    now = datetime.utcnow()
+    count = db.session.execute(
+        update(Job)
+        .where(Job.status == JobStatus.running, Job.locked_until < now, Job.attempts >= Job.max_attempts)
+        .values(status=JobStatus.failed, last_error="visibility timeout expired", finished_at=now, locked_until=None)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def purge(days=None):
+    """Delete succeeded jobs older than JOB_RETENTION_DAYS. Returns how many."""
+    days = days if days is not None else setting("JOB_RETENTION_DAYS", 7)
+    count = db.session.execute(
+        delete(Job).where(
+            Job.status == JobStatus.succeeded,
+            Job.finished_at < datetime.utcnow() - timedelta(days=days),
+        )
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def retry(job_id):
+    """Put a failed job back in the queue with fresh attempts."""
+    count = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.failed)
+        .values(status=JobStatus.queued, attempts=0, run_at=datetime.utcnow(), finished_at=None)
+    ).rowcount
+    db.session.commit()
+    return bool(count)
+
+
+# ---------- Execution ----------
+
+def execute(job):
+    """Run one claimed job in the current app context and record the outcome."""
+    spec = registered().get(job["name"])
+    try:
+        if spec is None:
+            raise LookupError(f"unknown task {job['name']!r}")
+        result = spec.func(**json.loads(job["payload"] or "{}"))
+    except Exception:
+        db.session.rollback()
+        fail(job, traceback.format_exc())
+        return False
+    complete(job, result)
+    return True
+
+
+def _run_in_app(app, job):
+    with app.app_context():
+        try:
+            return execute(job)
+        finally:
+            db.session.remove()
+
+
+_process_app = None
+
+
+def _run_in_process(job):
+    # Process pools cannot share the parent's app; each child builds its
+    # own from the environment, the same way the CLI does.
+    global _process_app
+    if _process_app is None:
+        from app import create_app
+        _process_app = create_app()
+    return _run_in_app(_process_app, job)
+
+
+class Worker:
+    """Claims due jobs and keeps up to ``concurrency`` of them running."""
+
+    def __init__(self, app, concurrency=None, pool=None, queues=None, poll=None):
+        config = app.config
+        self.app = app
+        self.concurrency = concurrency or config.get("JOB_WORKERS", 4)
+        self.pool = pool or config.get("JOB_POOL", "thread")
+        self.queues = queues or None
+        self.poll = poll if poll is not None else config.get("JOB_POLL_SECONDS", 1.0)
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.periods = {}
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def _enqueue_periodic(self):
+        # The period number in the key means any number of workers queue
+        # each periodic task once per period between them.
+        now = time.time()
+        added = False
+        for spec in _tasks.values():
+            if not spec.every or (self.queues and spec.queue not in self.queues):
+                continue
+            period = int(now // spec.every)
+            if self.periods.get(spec.name) != period:
+                enqueue(spec.name, key=f"{spec.name}@{period}")
+                self.periods[spec.name] = period
+                added = True
+        if added:
+            db.session.commit()
+
+    def _submit(self, executor, job):
+        if self.pool == "process":
+            return executor.submit(_run_in_process, job)
+        return executor.submit(_run_in_app, self.app, job)
+
+    def run(self, burst=False):
+        """Work until stop() (or, with ``burst``, until the queue is empty)."""
+        registered()
+        executor_class = ProcessPoolExecutor if self.pool == "process" else ThreadPoolExecutor
+        running = set()
+        housekeeping = 0.0
+
+        with executor_class(max_workers=self.concurrency) as executor, self.app.app_context():
+            while not self.stopping.is_set():
+                if time.monotonic() - housekeeping > 60:
+                    reap()
+                    purge()
+                    housekeeping = time.monotonic()
+                self._enqueue_periodic()
+
+                free = self.concurrency - len(running)
+                claimed = claim(self.id, free, self.queues) if free else []
+                for job in claimed:
+                    job["worker_id"] = self.id
+                    running.add(self._submit(executor, job))
+
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll)
+                    continue
+                done, running = wait(running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                self.processed += len(done)
+
+            # finish what was started before stopping
+            self.processed += len(wait(running)[0])
+            db.session.remove()
+        return self.processed
+
+
+def run_worker(app, burst=False, **options):
+    worker = Worker(app, **options)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+    return worker.run(burst=burst)
+
+
+# ---------- Admin stats ----------
+
+def stats(now=None):
+    now = now or datetime.utcnow()
+    depth = {status.name: 0 for status in JobStatus}
+    delayed = 0
+    for status, due, count in db.session.execute(
+        select(Job.status, Job.run_at <= now, func.count())
+        .where(Job.status.in_([JobStatus.queued, JobStatus.running, JobStatus.failed]))
+        .group_by(Job.status, Job.run_at <= now)
+    ):
+        depth[status.name] += count
+        if status == JobStatus.queued and not due:
+            delayed += count
+
+    throughput = {}
+    for label, minutes in (("1m", 1), ("5m", 5), ("1h", 60)):
+        since = now - timedelta(minutes=minutes)
+        finished = dict(db.session.execute(
+            select(Job.status, func.count())
+            .where(Job.finished_at >= since)
+            .group_by(Job.status)
+        ).all())
+        done = finished.get(JobStatus.succeeded, 0)
+        throughput[label] = {
+            "succeeded": done,
+            "failed": finished.get(JobStatus.failed, 0),
+            "per_minute": round(done / minutes, 2),
+        }
+
+    return {
+        "queued": depth["queued"] - delayed,
+        "delayed": delayed,
+        "running": depth["running"],
+        "failed": depth["failed"],
+        "throughput": throughput,
+    }
+
+
+def recent(status=None, limit=50):
+    query = Job.query.order_by(Job.id.desc())
+    if status:
+        query = query.filter(Job.status == JobStatus[status])
+    return query.limit(limit).all()
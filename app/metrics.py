@@ -0,0 +1,188 @@
+"""
+Per-request instrumentation.
+
+For every request we record, per endpoint, the total latency, the number
+of SQL statements, the time spent in SQL (``before/after_cursor_execute``)
+and the time spent rendering templates (Flask's template signals) into
+fixed-bucket histograms. /admin/metrics renders them in the Prometheus
+text format; with METRICS_SERVER_TIMING on, each response also carries a
+``Server-Timing`` header so the browser dev tools show the breakdown.
+
+Histograms live in process memory: with several workers each one reports
+its own, which Prometheus sums when scraping them individually.
+"""
+import threading
+import time
+
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+
+from app.database import db
+
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+METRICS = {
+    "hms_request_duration_seconds": ("Request latency", TIME_BUCKETS),
+    "hms_request_sql_statements": ("SQL statements per request", COUNT_BUCKETS),
+    "hms_request_sql_seconds": ("Time spent in SQL per request", TIME_BUCKETS),
+    "hms_request_template_seconds": ("Time spent rendering templates per request", TIME_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, values):
+        """Record ``{metric_name: value}`` for one request with ``labels``."""
+        with self._lock:
+            for name, value in values.items():
+                key = (name, labels)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(METRICS[name][1])
+                histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """The histograms in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(
+                (key, list(h.counts), h.total, h.sum, h.buckets)
+                for key, h in self._histograms.items()
+            )
+        lines = []
+        current = None
+        for (name, labels), counts, total, sum_, buckets in items:
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {METRICS[name][0]}")
+                lines.append(f"# TYPE {name} histogram")
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {total}')
+            lines.append(f"{name}_sum{{{label_text}}} {sum_:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {total}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# ---------- SQL ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or "metrics" not in g:
+        return
+    stats = g.metrics
+    stats["sql_count"] += 1
+    stats["sql_seconds"] += time.perf_counter() - context._metrics_started
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- Templates ----------
+
+def _before_render(sender, template, context, **extra):
+    if "metrics" in g:
+        g.metrics["template_stack"].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if "metrics" in g and g.metrics["template_stack"]:
+        started = g.metrics["template_stack"].pop()
+        if not g.metrics["template_stack"]:  # only count the outermost render
+            g.metrics["template_seconds"] += time.perf_counter() - started
+
+
+# ---------- Request hooks ----------
+
+def _start_request():
+    g.metrics = {
+        "started": time.perf_counter(),
+        "sql_count": 0,
+        "sql_seconds": 0.0,
+        "template_seconds": 0.0,
+        "template_stack": [],
+    }
+
+
+def _add_server_timing(response):
+    stats = g.get("metrics")
+    if stats is not None and current_app.config.get("METRICS_SERVER_TIMING"):
+        duration = time.perf_counter() - stats["started"]
+        response.headers["Server-Timing"] = (
+            f'sql;dur={stats["sql_seconds"] * 1000:.2f};desc="{stats["sql_count"]} queries", '
+            f'tpl;dur={stats["template_seconds"] * 1000:.2f}, '
+            f"total;dur={duration * 1000:.2f}"
+        )
+    return response
+
+
+def _record_request(exc):
+    # teardown runs for failed requests too, so 500s are measured as well
+    stats = g.pop("metrics", None)
+    if stats is None:
+        return
+    endpoint = request.url_rule.endpoint if request.url_rule else "unmatched"
+    registry.observe(
+        (("endpoint", endpoint), ("method", request.method)),
+        {
+            "hms_request_duration_seconds": time.perf_counter() - stats["started"],
+            "hms_request_sql_statements": stats["sql_count"],
+            "hms_request_sql_seconds": stats["sql_seconds"],
+            "hms_request_template_seconds": stats["template_seconds"],
+        },
+    )
+
+
+def init_app(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    app.before_request(_start_request)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_record_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -0,0 +1,94 @@
+"""
+Versioned schema migrations.
+
+The app never touches the schema at startup; ``flask init`` (or
+``flask upgrade-db``) runs upgrade() once per deploy. A brand-new
+database is first given the baseline schema built from the current
+models, and then every migration runs over it. Existing databases only
+run the migrations they have not applied yet.
+
+So every schema change ships here as a numbered migration, new tables
+included. Applied versions are recorded in ``schema_version``. Every
+migration must be safe to run against a database the baseline has just
+built from the current models (``IF NOT EXISTS``, backfills that are
+no-ops on empty tables).
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.database import db
+from app.migrations import (
+    m0001_appointment_indexes,
+    m0002_search_index,
+    m0003_user_identity,
+    m0004_counters,
+    m0005_jobs,
+    m0006_reminders,
+    m0007_archive,
+    m0008_booked_start_unique,
+    m0009_drop_booked_start_index,
+)
+
+
+MIGRATIONS = [
+    (1, "appointment_indexes", m0001_appointment_indexes.upgrade),
+    (2, "search_index", m0002_search_index.upgrade),
+    (3, "user_identity", m0003_user_identity.upgrade),
+    (4, "counters", m0004_counters.upgrade),
+    (5, "jobs", m0005_jobs.upgrade),
+    (6, "reminders", m0006_reminders.upgrade),
+    (7, "archive", m0007_archive.upgrade),
+    (8, "booked_start_unique", m0008_booked_start_unique.upgrade),
+    (9, "drop_booked_start_index", m0009_drop_booked_start_index.upgrade),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR(120) NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    ))
+
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+# Up to this version the app ran create_all() on every boot, so older
+# databases may lack tables for models added since; the baseline
+# (create_all only creates what is missing) fills them in first.
+BASELINE_VERSION = 4
+
+
+def _baseline(conn):
+    """Any missing model tables; the whole schema on a new database."""
+    db.metadata.create_all(conn)
+
+
+def upgrade(engine=None):
+    """Apply every pending migration, each in its own transaction."""
+    engine = engine or db.engine
+    applied = []
+
+    with engine.begin() as conn:
+        version = current_version(conn)
+        if version < BASELINE_VERSION:
+            _baseline(conn)
+            applied.append((0, "baseline"))
+
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": number, "n": name, "t": datetime.utcnow()},
+            )
+        applied.append((number, name))
+
+    return applied
@@ -0,0 +1,25 @@
+"""Composite and partial indexes for the appointment/treatment hot paths."""
+from sqlalchemy import text
+
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_appointment_patient_status_start "
+    "ON appointment (patient_id, status, appointment_start)",
+    "CREATE INDEX IF NOT EXISTS ix_appointment_doctor_status_start "
+    "ON appointment (doctor_id, status, appointment_start)",
+    "CREATE INDEX IF NOT EXISTS ix_appointment_start "
+    "ON appointment (appointment_start)",
+    "CREATE INDEX IF NOT EXISTS ix_appointment_booked_start "
+    "ON appointment (appointment_start) WHERE status = 'booked'",
+    "CREATE INDEX IF NOT EXISTS ix_treatment_appointment_id "
+    "ON treatment (appointment_id)",
+    "CREATE INDEX IF NOT EXISTS ix_treatment_treatment_date "
+    "ON treatment (treatment_date)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("ANALYZE"))
@@ -0,0 +1,71 @@
+"""FTS5 search index over patients and doctors, kept in sync by triggers."""
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5("
+    "name, email, phone, prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5("
+    "name, email, phone, department, bio, prefix='2 3')",
+
+    # ---------- patient ----------
+    """CREATE TRIGGER IF NOT EXISTS patient_fts_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_fts (rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, new.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_fts_au AFTER UPDATE OF name, email, phone ON patient BEGIN
+        UPDATE patient_fts SET name = new.name, email = new.email, phone = new.phone
+        WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_fts_ad AFTER DELETE ON patient BEGIN
+        DELETE FROM patient_fts WHERE rowid = old.id;
+    END""",
+
+    # ---------- doctor ----------
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_ai AFTER INSERT ON doctor BEGIN
+        INSERT INTO doctor_fts (rowid, name, email, phone, department, bio)
+        VALUES (
+            new.id, new.name, new.email, new.phone,
+            (SELECT name FROM department WHERE id = new.department_id), new.bio
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_au
+    AFTER UPDATE OF name, email, phone, bio, department_id ON doctor BEGIN
+        UPDATE doctor_fts SET
+            name = new.name, email = new.email, phone = new.phone, bio = new.bio,
+            department = (SELECT name FROM department WHERE id = new.department_id)
+        WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_ad AFTER DELETE ON doctor BEGIN
+        DELETE FROM doctor_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS department_fts_au AFTER UPDATE OF name ON department BEGIN
+        UPDATE doctor_fts SET department = new.name
+        WHERE rowid IN (SELECT id FROM doctor WHERE department_id = new.id);
+    END""",
+
+    # ---------- backfill ----------
+    "DELETE FROM patient_fts",
+    "INSERT INTO patient_fts (rowid, name, email, phone) "
+    "SELECT id, name, email, phone FROM patient",
+    "DELETE FROM doctor_fts",
+    "INSERT INTO doctor_fts (rowid, name, email, phone, department, bio) "
+    "SELECT doctor.id, doctor.name, doctor.email, doctor.phone, department.name, doctor.bio "
+    "FROM doctor LEFT JOIN department ON department.id = doctor.department_id",
+]
+
+
+def upgrade(conn):
+    # Other backends keep using the LIKE search in app.search
+    if conn.dialect.name != "sqlite":
+        return
+
+    try:
+        conn.execute(text(STATEMENTS[0]))
+    except OperationalError:
+        # SQLite built without FTS5
+        return
+
+    for statement in STATEMENTS[1:]:
+        conn.execute(text(statement))
@@ -0,0 +1,19 @@
+"""Backfill the user_identity login directory from the three user tables."""
+from sqlalchemy import text
+
+
+# Earlier tables win on duplicate emails (the order the old login probed).
+# The table names double as the stored UserRole names.
+SOURCES = ("admin", "doctor", "patient")
+
+
+def upgrade(conn):
+    # The baseline has already created the table from the model.
+    # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join clause.
+    for table in SOURCES:
+        conn.execute(text(
+            "INSERT INTO user_identity (email, role, user_id, status, password_hash) "
+            f"SELECT LOWER(TRIM(email)), '{table}', id, status, password_hash FROM {table} "
+            "WHERE true "
+            "ON CONFLICT DO NOTHING"
+        ))
@@ -0,0 +1,6 @@
+"""Fill the counter table and Department.doctors_count from existing rows."""
+from app import counters
+
+
+def upgrade(conn):
+    counters.reconcile(conn)
@@ -0,0 +1,7 @@
+"""Background job table used by app.jobs and ``flask worker``."""
+from app.models import Job
+
+
+def upgrade(conn):
+    # checkfirst: a new database already has it from the baseline
+    Job.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,13 @@
+"""Reminder outbox, scheduler watermarks and the (status, start) index it scans."""
+from sqlalchemy import text
+
+from app.models import Reminder, ReminderScan
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_appointment_status_start "
+        "ON appointment (status, appointment_start)"
+    ))
+    Reminder.__table__.create(conn, checkfirst=True)
+    ReminderScan.__table__.create(conn, checkfirst=True)
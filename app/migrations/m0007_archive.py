@@ -0,0 +1,7 @@
+"""Archive tables for finished appointments and their treatments."""
+from app.models import ArchivedAppointment, ArchivedTreatment
+
+
+def upgrade(conn):
+    ArchivedAppointment.__table__.create(conn, checkfirst=True)
+    ArchivedTreatment.__table__.create(conn, checkfirst=True)
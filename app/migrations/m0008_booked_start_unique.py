@@ -0,0 +1,53 @@
+"""
+One booked appointment per doctor and start time.
+
+uq_doctor_appointment_start covered every status, so a cancelled
+appointment kept its start time taken for good. It is replaced by the
+partial unique index uq_doctor_booked_start, the same "booked only" rule
+that app.booking checks.
+"""
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+
+from app.models import Appointment
+
+
+INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_doctor_booked_start "
+    "ON appointment (doctor_id, appointment_start) WHERE status = 'booked'"
+)
+
+
+def _sqlite_has_old_constraint(conn):
+    sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'appointment'"
+    )).scalar()
+    return "uq_doctor_appointment_start" in (sql or "")
+
+
+def _rebuild_sqlite(conn):
+    # SQLite cannot drop a table constraint, so the table is rebuilt from
+    # the current model: create, copy, drop, rename, then the indexes.
+    # Foreign keys are not enforced on these connections (app.dbconfig),
+    # so dropping the old table leaves treatment, time_slot and reminder
+    # rows alone, and they point at the new table once it is renamed.
+    table = Appointment.__table__
+    create = str(CreateTable(table).compile(conn)).replace(
+        "CREATE TABLE appointment ", "CREATE TABLE appointment_new ", 1
+    )
+    columns = ", ".join(column.name for column in table.columns)
+    conn.execute(text(create))
+    conn.execute(text(f"INSERT INTO appointment_new ({columns}) SELECT {columns} FROM appointment"))
+    conn.execute(text("DROP TABLE appointment"))
+    conn.execute(text("ALTER TABLE appointment_new RENAME TO appointment"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def upgrade(conn):
+    if conn.dialect.name == "sqlite":
+        if _sqlite_has_old_constraint(conn):
+            _rebuild_sqlite(conn)
+    else:
+        conn.execute(text("ALTER TABLE appointment DROP CONSTRAINT IF EXISTS uq_doctor_appointment_start"))
+    conn.execute(text(INDEX))
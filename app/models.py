@@ -1,8 +1,9 @@
 from datetime import datetime, date, time
 import enum
+import json
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Enum, UniqueConstraint
+from sqlalchemy import Enum, Index, UniqueConstraint, text
 from app.database import db
 from app.utils import hash_password
 
@@ -24,6 +25,21 @@ class UserRole(enum.Enum):
     patient = "Patient"
 
 
+class JobStatus(enum.Enum):
+    queued = "Queued"
+    running = "Running"
+    succeeded = "Succeeded"
+    failed = "Failed"
+
+
+class ReminderStatus(enum.Enum):
+    pending = "Pending"
+    sending = "Sending"
+    sent = "Sent"
+    retracted = "Retracted"
+    failed = "Failed"
+
+
 # ---------- Department / Specialization ----------
 
 class Department(db.Model):
@@ -134,6 +150,47 @@ class Patient(db.Model):
         return f"<Patient {self.name}>"
 
 
+# ---------- Login directory ----------
+
+class UserIdentity(db.Model):
+    """
+    One row per login email across Admin, Doctor and Patient, so login is a
+    single indexed lookup and an email can only belong to one account.
+    Maintained by ORM events in app/identity.py.
+    """
+    __tablename__ = "user_identity"
+
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)  # normalized
+    role = db.Column(Enum(UserRole), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(Enum(StatusEnum), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("role", "user_id", name="uq_identity_role_user"),
+    )
+
+    def __repr__(self):
+        return f"<UserIdentity {self.email} {self.role.value}={self.user_id}>"
+
+
+# ---------- Maintained counters ----------
+
+class Counter(db.Model):
+    """
+    Running row counts (``doctor``, ``appointment.booked``, ...) kept up to
+    date by app.counters so dashboards do not have to COUNT(*) big tables.
+    """
+    __tablename__ = "counter"
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Counter {self.name}={self.value}>"
+
+
 # ---------- Doctor availability (next 7 days, recurring) ----------
 
 class DoctorSchedule(db.Model):
@@ -238,11 +295,23 @@ class Appointment(db.Model):
     )
 
     __table_args__ = (
-        UniqueConstraint(
+        # Only a booked appointment holds the doctor's start time; a
+        # cancelled one leaves it free to book again (see app.booking)
+        Index(
+            "uq_doctor_booked_start",
             "doctor_id",
             "appointment_start",
-            name="uq_doctor_appointment_start",
+            unique=True,
+            sqlite_where=text("status = 'booked'"),
+            postgresql_where=text("status = 'booked'"),
         ),
+        # Dashboard hot paths: filter on owner + status, order by start time
+        Index("ix_appointment_patient_status_start", "patient_id", "status", "appointment_start"),
+        Index("ix_appointment_doctor_status_start", "doctor_id", "status", "appointment_start"),
+        Index("ix_appointment_start", "appointment_start"),
+        # reminder scheduler (booked appointments in the next time bucket)
+        # and archiving (finished appointments before the cutoff)
+        Index("ix_appointment_status_start", "status", "appointment_start"),
     )
 
     def __repr__(self):
@@ -283,13 +352,13 @@ class Treatment(db.Model):
     __tablename__ = "treatment"
 
     id = db.Column(db.Integer, primary_key=True)
-    appointment_id = db.Column(db.Integer, db.ForeignKey("appointment.id"), nullable=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey("appointment.id"), nullable=False, index=True)
 
     diagnosis = db.Column(db.Text, nullable=True)
     prescription = db.Column(db.Text, nullable=True)
     notes = db.Column(db.Text, nullable=True)
 
-    treatment_date = db.Column(db.DateTime, default=datetime.utcnow)
+    treatment_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     appointment = db.relationship("Appointment", back_populates="treatment")
 
@@ -297,6 +366,165 @@ class Treatment(db.Model):
         return f"<Treatment {self.id} appt={self.appointment_id}>"
 
 
+# ---------- Archive ----------
+# Finished appointments older than ARCHIVE_AFTER_DAYS, with their
+# treatments, are moved here by app/archive.py so the hot tables stay
+# small. Rows keep their original ids and attribute names, so templates
+# and exports can show either kind. Archived rows are read-only.
+
+class ArchivedAppointment(db.Model):
+    __tablename__ = "appointment_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    patient_id = db.Column(db.Integer, db.ForeignKey("patient.id"), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctor.id"), nullable=False)
+
+    appointment_start = db.Column(db.DateTime, nullable=False)
+    appointment_end = db.Column(db.DateTime, nullable=False)
+
+    status = db.Column(Enum(StatusEnum), nullable=False)
+
+    reason = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    last_updated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    patient = db.relationship("Patient")
+    doctor = db.relationship("Doctor")
+    treatment = db.relationship("ArchivedTreatment", back_populates="appointment", uselist=False)
+
+    __table_args__ = (
+        # patient history, newest first
+        Index("ix_appointment_archive_patient_start", "patient_id", "appointment_start"),
+        # a doctor's patients and their history with that doctor
+        Index("ix_appointment_archive_doctor_patient", "doctor_id", "patient_id"),
+        # appointment log exports by date range
+        Index("ix_appointment_archive_start", "appointment_start"),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedAppointment {self.id} doc={self.doctor_id} pat={self.patient_id}>"
+
+
+class ArchivedTreatment(db.Model):
+    __tablename__ = "treatment_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_id = db.Column(
+        db.Integer, db.ForeignKey("appointment_archive.id"), nullable=False, index=True
+    )
+
+    diagnosis = db.Column(db.Text, nullable=True)
+    prescription = db.Column(db.Text, nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+
+    treatment_date = db.Column(db.DateTime, nullable=True, index=True)
+
+    appointment = db.relationship("ArchivedAppointment", back_populates="treatment")
+
+    def __repr__(self):
+        return f"<ArchivedTreatment {self.id} appt={self.appointment_id}>"
+
+
+# ---------- Background jobs ----------
+
+class Job(db.Model):
+    """
+    One unit of background work for ``flask worker`` (see app/jobs.py).
+    A running job whose ``locked_until`` has passed is considered lost and
+    is handed to another worker.
+    """
+    __tablename__ = "job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default="default")
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)
+
+    status = db.Column(Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+
+    result = db.Column(db.Text, nullable=True)  # JSON
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # claim: next due job per queue; admin: depth per status
+        Index("ix_job_status_queue_run_at", "status", "queue", "run_at"),
+        # throughput over the last minutes/hours
+        Index("ix_job_finished_at", "finished_at"),
+    )
+
+    @property
+    def result_data(self):
+        return json.loads(self.result) if self.result else None
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} {self.status.name}>"
+
+
+# ---------- Appointment reminders ----------
+
+class Reminder(db.Model):
+    """
+    Outbox row for one reminder message (see app/reminders.py). Written in
+    batches by the scheduler, drained by the sender; rows for a cancelled
+    or moved appointment are retracted while still pending.
+    """
+    __tablename__ = "reminder"
+
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey("appointment.id"), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # "24h", "1h"
+    # the start time the message talks about; a reschedule gets new rows
+    appointment_start = db.Column(db.DateTime, nullable=False)
+    send_at = db.Column(db.DateTime, nullable=False)
+
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(Enum(ReminderStatus), default=ReminderStatus.pending, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # rescans of the same bucket insert nothing; also the retract lookup
+        UniqueConstraint(
+            "appointment_id", "kind", "appointment_start",
+            name="uq_reminder_appointment_kind_start",
+        ),
+        # drain: due pending messages in send order
+        Index("ix_reminder_status_send_at", "status", "send_at"),
+    )
+
+    def __repr__(self):
+        return f"<Reminder {self.id} {self.kind} appt={self.appointment_id} {self.status.name}>"
+
+
+class ReminderScan(db.Model):
+    """How far ahead the scheduler has scanned appointments, per reminder kind."""
+    __tablename__ = "reminder_scan"
+
+    kind = db.Column(db.String(10), primary_key=True)
+    scanned_until = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ReminderScan {self.kind} {self.scanned_until}>"
+
+
 # ---------- Utility: programmatic admin creation ----------
 
 def create_default_admin(username: str = "admin", email: str = "admin@example.com", password_hash: str = "admin"):
@@ -0,0 +1,206 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class Page:
+    """One page of a keyset-paginated listing."""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+# ---------- Cursors ----------
+
+def _encode_value(value):
+    # datetime keys (e.g. appointment_start) travel as {"dt": iso}
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the key values stored in ``cursor``, or None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            return None
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _after(keys, values):
+    """(k1, k2, ...) > (v1, v2, ...), spelled out so every backend can use an index."""
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, key > values[i]))
+    return or_(*clauses)
+
+
+def _before(keys, values):
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, key < values[i]))
+    return or_(*clauses)
+
+
+# ---------- Paginate ----------
+
+def paginate(query, keys, after=None, before=None, per_page=None):
+    """
+    Keyset pagination over ``keys`` (ascending, last key must be unique).
+    Only ``per_page + 1`` rows are read, however deep the page is.
+    """
+    per_page = per_page or current_app.config["PAGE_SIZE"]
+    after_values = decode_cursor(after)
+    before_values = decode_cursor(before)
+    if after_values is not None and len(after_values) != len(keys):
+        after_values = None
+    if before_values is not None and len(before_values) != len(keys):
+        before_values = None
+
+    query = query.order_by(None).add_columns(*keys)
+
+    if before_values is not None and after_values is None:
+        rows = (
+            query.filter(_before(keys, before_values))
+            .order_by(*(key.desc() for key in keys))
+            .limit(per_page + 1)
+            .all()
+        )
+        more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_prev, has_next = more, True
+    else:
+        if after_values is not None:
+            query = query.filter(_after(keys, after_values))
+        rows = query.order_by(*keys).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after_values is not None
+
+    n = len(keys)
+    items = [row[0] for row in rows]
+    next_cursor = encode_cursor(rows[-1][-n:]) if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0][-n:]) if rows and has_prev else None
+    return Page(items, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def paginate_sequence(items, key, after=None, before=None, per_page=None):
+    """
+    paginate() for an in-memory sequence already sorted by ``key(item)``
+    (a tuple whose last value is unique), such as cached reference data.
+    """
+    per_page = per_page or current_app.config["PAGE_SIZE"]
+    after_values = decode_cursor(after)
+    before_values = decode_cursor(before)
+
+    try:
+        if before_values is not None and after_values is None:
+            end = bisect_left(items, tuple(before_values), key=key)
+            start = max(0, end - per_page)
+        else:
+            start = bisect_right(items, tuple(after_values), key=key) if after_values is not None else 0
+            end = start + per_page
+    except TypeError:
+        # cursor values of the wrong shape or type for this listing
+        start, end = 0, per_page
+
+    rows = list(items[start:end])
+    next_cursor = encode_cursor(key(rows[-1])) if rows and end < len(items) else None
+    prev_cursor = encode_cursor(key(rows[0])) if rows and start > 0 else None
+    return Page(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def paginate_merged(queries, key, after=None, before=None, per_page=None):
+    """
+    paginate() over several queries as one listing, e.g. the hot and the
+    archive table. ``queries`` are ``(query, keys)`` pairs with matching
+    keys and ``key(item)`` gives an item's key values. Each query still
+    reads only ``per_page + 1`` rows.
+    """
+    per_page = per_page or current_app.config["PAGE_SIZE"]
+    pages = [paginate(query, keys, after, before, per_page) for query, keys in queries]
+    items = sorted((item for page in pages for item in page), key=key)
+
+    width = len(queries[0][1])
+    after_values = decode_cursor(after)
+    before_values = decode_cursor(before)
+    after_values = after_values if after_values is not None and len(after_values) == width else None
+    before_values = before_values if before_values is not None and len(before_values) == width else None
+
+    if before_values is not None and after_values is None:
+        more = len(items) > per_page or any(page.has_prev for page in pages)
+        items = items[-per_page:]
+        has_prev, has_next = more, True
+    else:
+        more = len(items) > per_page or any(page.has_next for page in pages)
+        items = items[:per_page]
+        has_prev, has_next = after_values is not None, more
+
+    next_cursor = encode_cursor(key(items[-1])) if items and has_next else None
+    prev_cursor = encode_cursor(key(items[0])) if items and has_prev else None
+    return Page(items, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def _request_window():
+    per_page = request.args.get("per_page", type=int) or current_app.config["PAGE_SIZE"]
+    return {
+        "after": request.args.get("after"),
+        "before": request.args.get("before"),
+        "per_page": max(1, min(per_page, current_app.config["MAX_PAGE_SIZE"])),
+    }
+
+
+def paginate_request(query, keys):
+    """paginate() driven by the ``after``/``before``/``per_page`` query args."""
+    return paginate(query, keys, **_request_window())
+
+
+def paginate_sequence_request(items, key):
+    return paginate_sequence(items, key, **_request_window())
+
+
+def paginate_merged_request(queries, key):
+    return paginate_merged(queries, key, **_request_window())
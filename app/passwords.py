@@ -0,0 +1,75 @@
+"""
+Password hashing backend.
+
+Hashing is deliberately slow, so it runs on a small bounded pool instead of
+on every request thread at once: at most PASSWORD_HASH_WORKERS hashes run
+concurrently and the rest queue, leaving the other cores free for normal
+page views. hashlib's scrypt/pbkdf2 release the GIL, so the default thread
+pool really does run in parallel; set PASSWORD_HASH_POOL = "process" to
+use processes instead.
+
+PASSWORD_METHOD is any werkzeug method string (``scrypt:16384:8:1``,
+``pbkdf2:sha256:600000``...). Hashes made with other parameters are
+flagged by needs_rehash() and upgraded on the next successful login.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.database import setting
+
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+_pools = {}
+_prefixes = {}
+_lock = threading.Lock()
+
+
+def _method():
+    return setting("PASSWORD_METHOD")
+
+
+def _pool():
+    kind = setting("PASSWORD_HASH_POOL", "thread")
+    workers = setting("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS)
+    key = (kind, workers)
+    pool = _pools.get(key)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None:
+                executor = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+                pool = _pools[key] = executor(max_workers=workers)
+    return pool
+
+
+def _generate(password, method):
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+# ---------- Public API ----------
+
+def hash_password(password):
+    return _pool().submit(_generate, password, _method()).result()
+
+
+def verify_password(hashed_password, password):
+    return _pool().submit(check_password_hash, hashed_password, password).result()
+
+
+def current_prefix():
+    """The ``method:params`` prefix new hashes get, e.g. ``scrypt:32768:8:1``."""
+    method = _method()
+    prefix = _prefixes.get(method)
+    if prefix is None:
+        prefix = _prefixes[method] = _generate("", method).split("$", 1)[0]
+    return prefix
+
+
+def needs_rehash(hashed_password):
+    return hashed_password.split("$", 1)[0] != current_prefix()
@@ -0,0 +1,247 @@
+from datetime import datetime
+
+from sqlalchemy import select, text, union
+from sqlalchemy.orm import contains_eager, joinedload
+
+from app import archive
+from app.database import db
+from app.models import (
+    Appointment,
+    ArchivedAppointment,
+    ArchivedTreatment,
+    Doctor,
+    Patient,
+    StatusEnum,
+    Treatment,
+)
+
+
+# ---------- Loader options per view ----------
+# Every relationship the templates walk is loaded up front so a list page
+# costs a fixed number of statements no matter how many rows it shows.
+
+DOCTOR_WITH_DEPARTMENT = (
+    joinedload(Doctor.department),
+)
+
+APPOINTMENT_FULL = (
+    joinedload(Appointment.patient),
+    joinedload(Appointment.doctor).joinedload(Doctor.department),
+)
+
+APPOINTMENT_WITH_DOCTOR = (
+    joinedload(Appointment.doctor).joinedload(Doctor.department),
+)
+
+APPOINTMENT_WITH_PATIENT = (
+    joinedload(Appointment.patient),
+)
+
+APPOINTMENT_HISTORY = (
+    joinedload(Appointment.doctor),
+    joinedload(Appointment.treatment),
+)
+
+ARCHIVED_HISTORY = (
+    joinedload(ArchivedAppointment.doctor),
+    joinedload(ArchivedAppointment.treatment),
+)
+
+
+# ---------- Admin ----------
+
+def admin_upcoming_appointments(now, limit=10):
+    return (
+        Appointment.query
+        .options(*APPOINTMENT_FULL)
+        .filter(Appointment.appointment_start >= now)
+        .order_by(Appointment.appointment_start.asc())
+        .limit(limit)
+    )
+
+
+def doctors_with_department():
+    return Doctor.query.options(*DOCTOR_WITH_DEPARTMENT)
+
+
+def active_doctors():
+    return doctors_with_department().filter(Doctor.status == StatusEnum.active)
+
+
+# ---------- Doctor ----------
+
+def doctor_upcoming_appointments(doctor_id, now):
+    return (
+        Appointment.query
+        .options(*APPOINTMENT_WITH_PATIENT)
+        .filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.status == StatusEnum.booked,
+            Appointment.appointment_start >= now,
+        )
+        .order_by(Appointment.appointment_start.asc())
+    )
+
+
+def doctor_patient_treatments(doctor_id, patient_id):
+    return (
+        Treatment.query
+        .join(Appointment)
+        .options(contains_eager(Treatment.appointment))
+        .filter(
+            Appointment.patient_id == patient_id,
+            Appointment.doctor_id == doctor_id,
+        )
+        .order_by(Treatment.treatment_date.desc())
+    )
+
+
+def doctor_patients(doctor_id):
+    # Patients whose visits are all archived are still this doctor's patients
+    seen = union(
+        select(Appointment.patient_id).where(Appointment.doctor_id == doctor_id),
+        select(ArchivedAppointment.patient_id).where(ArchivedAppointment.doctor_id == doctor_id),
+    )
+    return (
+        Patient.query
+        .filter(Patient.id.in_(seen))
+        .order_by(Patient.name.asc())
+    )
+
+
+# ---------- Patient ----------
+
+def patient_upcoming_appointments(patient_id, now):
+    return (
+        Appointment.query
+        .options(*APPOINTMENT_WITH_DOCTOR)
+        .filter(
+            Appointment.patient_id == patient_id,
+            Appointment.status == StatusEnum.booked,
+            Appointment.appointment_start >= now,
+        )
+        .order_by(Appointment.appointment_start.asc())
+    )
+
+
+def patient_past_appointments(patient_id):
+    return (
+        Appointment.query
+        .options(*APPOINTMENT_HISTORY)
+        .filter(
+            Appointment.patient_id == patient_id,
+            Appointment.status.in_([StatusEnum.completed, StatusEnum.cancelled]),
+        )
+        .order_by(Appointment.appointment_start.desc())
+    )
+
+
+def patient_treatments(patient_id):
+    # Treatments are linked via Appointment -> Patient
+    return (
+        Treatment.query
+        .join(Appointment)
+        .options(
+            contains_eager(Treatment.appointment).joinedload(Appointment.doctor)
+        )
+        .filter(Appointment.patient_id == patient_id)
+        .order_by(Treatment.treatment_date.desc())
+    )
+
+
+# ---------- Archive ----------
+# Same shapes as the hot queries above, over appointment_archive /
+# treatment_archive.
+
+def archived_doctor_patient_treatments(doctor_id, patient_id):
+    return (
+        ArchivedTreatment.query
+        .join(ArchivedAppointment)
+        .options(contains_eager(ArchivedTreatment.appointment))
+        .filter(
+            ArchivedAppointment.patient_id == patient_id,
+            ArchivedAppointment.doctor_id == doctor_id,
+        )
+        .order_by(ArchivedTreatment.treatment_date.desc())
+    )
+
+
+def archived_patient_appointments(patient_id):
+    return (
+        ArchivedAppointment.query
+        .options(*ARCHIVED_HISTORY)
+        .filter(ArchivedAppointment.patient_id == patient_id)
+        .order_by(ArchivedAppointment.appointment_start.desc())
+    )
+
+
+def archived_patient_treatments(patient_id):
+    return (
+        ArchivedTreatment.query
+        .join(ArchivedAppointment)
+        .options(
+            contains_eager(ArchivedTreatment.appointment).joinedload(ArchivedAppointment.doctor)
+        )
+        .filter(ArchivedAppointment.patient_id == patient_id)
+        .order_by(ArchivedTreatment.treatment_date.desc())
+    )
+
+
+# ---------- History (hot + archive) ----------
+
+def _by_start(appointment):
+    return appointment.appointment_start
+
+
+def _by_date(treatment):
+    # NULL dates sort last, as they do in the queries
+    return treatment.treatment_date or datetime.min
+
+
+def patient_history(patient_id, limit=None):
+    """Finished appointments, newest first, from both tables."""
+    return archive.merged(
+        _by_start,
+        patient_past_appointments(patient_id),
+        archived_patient_appointments(patient_id),
+        limit=limit,
+    )
+
+
+def patient_treatment_history(patient_id):
+    return archive.merged(
+        _by_date,
+        patient_treatments(patient_id),
+        archived_patient_treatments(patient_id),
+    )
+
+
+def doctor_patient_treatment_history(doctor_id, patient_id):
+    return archive.merged(
+        _by_date,
+        doctor_patient_treatments(doctor_id, patient_id),
+        archived_doctor_patient_treatments(doctor_id, patient_id),
+    )
+
+
+# ---------- Query plans ----------
+
+def query_plan(query):
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for an ORM query (SQLite)."""
+    statement = query.statement if hasattr(query, "statement") else query
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan, tables=None):
+    """Plan lines that walk one of ``tables`` (default: any table) without using an index."""
+    scans = []
+    for line in plan:
+        words = line.split()
+        if words[:1] != ["SCAN"] or "USING" in words:
+            continue
+        name = words[2] if words[1] == "TABLE" else words[1]
+        if tables is None or name in tables:
+            scans.append(line)
+    return scans
@@ -0,0 +1,114 @@
+"""
+Cached reference data: the department list and the active doctor
+directory.
+
+Both change a few times a week but are rendered on most pages, so they
+are held as lightweight tuples in a VersionedCache. Inserts, updates and
+deletes of Department/Doctor rows bump the versions once the transaction
+commits. Set REFDATA_CACHE_PATH to a file to share versions and values
+between worker processes; otherwise each process converges within
+REFDATA_CACHE_TTL seconds of a change made elsewhere.
+"""
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from app import conditional
+from app.cache import SQLiteBackend, VersionedCache
+from app.database import db
+from app.models import Department, Doctor, StatusEnum
+
+
+DepartmentRow = namedtuple("DepartmentRow", "id name description")
+DoctorRow = namedtuple("DoctorRow", "id name department_id department_name")
+
+DEPARTMENTS = "departments"
+DOCTORS = "active_doctors"
+
+_fingerprints = {}
+
+
+def _cache():
+    cache = current_app.extensions.get("refdata_cache")
+    if cache is None:
+        path = current_app.config.get("REFDATA_CACHE_PATH")
+        cache = current_app.extensions["refdata_cache"] = VersionedCache(
+            SQLiteBackend(path) if path else None,
+            ttl=current_app.config.get("REFDATA_CACHE_TTL", 300),
+        )
+    return cache
+
+
+def _load_departments():
+    rows = (
+        db.session.query(Department.id, Department.name, Department.description)
+        .order_by(Department.name.asc())
+    )
+    return tuple(DepartmentRow(*row) for row in rows)
+
+
+def _load_doctors():
+    rows = (
+        db.session.query(Doctor.id, Doctor.name, Doctor.department_id, Department.name)
+        .outerjoin(Department, Doctor.department_id == Department.id)
+        .filter(Doctor.status == StatusEnum.active)
+        .order_by(Doctor.name.asc(), Doctor.id.asc())
+    )
+    return tuple(DoctorRow(*row) for row in rows)
+
+
+# ---------- Public API ----------
+
+def departments():
+    return _cache().get(DEPARTMENTS, _load_departments)
+
+
+def active_doctors():
+    return _cache().get(DOCTORS, _load_doctors)
+
+
+def fingerprint(name):
+    """Digest of the cached value of ``name``; only recomputed after a reload."""
+    value = {DEPARTMENTS: departments, DOCTORS: active_doctors}[name]()
+    memo = _fingerprints.get(name)
+    if memo is None or memo[0] is not value:
+        memo = _fingerprints[name] = (value, conditional.etag(value))
+    return memo[1]
+
+
+def stats():
+    return _cache().stats()
+
+
+def touch(*names, session=None):
+    """Mark ``names`` stale once the current transaction commits."""
+    (session or db.session).info.setdefault("refdata_changes", set()).update(names)
+
+
+# ---------- Invalidation ----------
+
+def _department_changed(mapper, connection, target):
+    # Doctor rows carry the department name
+    touch(DEPARTMENTS, DOCTORS, session=inspect(target).session)
+
+
+def _doctor_changed(mapper, connection, target):
+    touch(DOCTORS, session=inspect(target).session)
+
+
+for _name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Department, _name, _department_changed)
+    event.listen(Doctor, _name, _doctor_changed)
+
+
+@event.listens_for(db.session, "after_commit")
+def _bump_changed(session):
+    names = session.info.pop("refdata_changes", None)
+    if names:
+        _cache().bump(*names)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("refdata_changes", None)
@@ -0,0 +1,398 @@
+"""
+Appointment reminders through an outbox table.
+
+Scheduler (``reminders.scan`` job, every minute, or ``flask
+schedule-reminders``): for each kind in REMINDER_OFFSETS (24h and 1h
+before the start) it remembers in ``reminder_scan`` how far ahead it has
+looked. Each run reads only the booked appointments that have come into
+range since the last one, i.e. ``[scanned_until, now + offset + bucket)``,
+through the ``(status, appointment_start)`` index, and writes one
+``reminder`` row per appointment in batches of REMINDER_BATCH_SIZE. The
+unique (appointment, kind, start) key makes a rescan after a crash insert
+nothing.
+
+Bookings, cancellations and reschedules are handled when they are
+flushed, so nobody waits for the next scan:
+
+* a booking that starts inside an already-scanned range gets its rows
+  right away;
+* a cancelled, completed or moved appointment has its pending rows marked
+  ``retracted`` (one indexed UPDATE per appointment), and a moved one
+  gets new rows for the new time.
+
+Sender (``reminders.drain`` job, or ``flask send-reminders``): claims due
+rows (``pending`` -> ``sending`` with a lock that expires after
+REMINDER_SEND_TIMEOUT), hands each to the REMINDER_SENDER and marks it
+``sent``. A drainer that dies mid-batch leaves rows in ``sending``; once
+the lock expires they are claimed and handed over again. Every message
+carries a stable ``message_id`` and senders must ignore one they have
+already delivered, which turns that redelivery into exactly-once.
+DirectorySender, the default, does this by file name.
+
+Writes that bypass the ORM (bulk imports) call schedule() themselves.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, event, func, inspect, or_, select, update
+from werkzeug.utils import import_string
+
+from app.database import db, insert_ignoring, setting
+from app.jobs import backoff, task
+from app.models import Appointment, Doctor, Patient, Reminder, ReminderScan, ReminderStatus, StatusEnum
+
+
+DEFAULT_OFFSETS = {"24h": 24 * 60, "1h": 60}  # minutes before the start
+
+
+def offsets():
+    """``{kind: timedelta}``, longest first."""
+    minutes = setting("REMINDER_OFFSETS") or DEFAULT_OFFSETS
+    return dict(sorted(
+        ((kind, timedelta(minutes=value)) for kind, value in minutes.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    ))
+
+
+def bucket():
+    return timedelta(minutes=setting("REMINDER_BUCKET_MINUTES", 5))
+
+
+# ---------- Messages ----------
+
+def _candidates():
+    return (
+        select(
+            Appointment.id,
+            Appointment.appointment_start,
+            Patient.name.label("patient_name"),
+            Patient.email,
+            Doctor.name.label("doctor_name"),
+        )
+        .join(Patient, Appointment.patient_id == Patient.id)
+        .join(Doctor, Appointment.doctor_id == Doctor.id)
+        .where(Appointment.status == StatusEnum.booked)
+    )
+
+
+def _superseded(start, offset, now, kinds):
+    # A reminder that is already late is skipped when a later one is due
+    # as well, so a last-minute booking gets one message, not two.
+    return any(
+        other < offset and start - other <= now
+        for other in kinds.values()
+    )
+
+
+def _message(row, kind, now, kinds):
+    """The outbox row for a ``kind`` reminder; ``kinds`` is offsets(), read once by the caller."""
+    start = row.appointment_start
+    offset = kinds[kind]
+    if start <= now or _superseded(start, offset, now, kinds):
+        return None
+    when = start.strftime("%A %d %B %Y at %H:%M")
+    return {
+        "appointment_id": row.id,
+        "kind": kind,
+        "appointment_start": start,
+        "send_at": start - offset,
+        "recipient": row.email,
+        "subject": f"Reminder: your appointment with {row.doctor_name} on {start:%d %b %Y}",
+        "body": (
+            f"Hello {row.patient_name},\n\n"
+            f"This is a reminder of your appointment with {row.doctor_name} "
+            f"on {when} (UTC).\n\n"
+            "If you cannot make it, please cancel it from your dashboard."
+        ),
+        "status": ReminderStatus.pending,
+        "attempts": 0,
+        "created_at": now,
+    }
+
+
+def _insert(messages):
+    """Insert outbox rows, skipping ones that already exist. Returns how many."""
+    if not messages:
+        return 0
+    return db.session.execute(
+        insert_ignoring(Reminder.__table__, messages, ["appointment_id", "kind", "appointment_start"])
+    ).rowcount
+
+
+# ---------- Scheduler ----------
+
+def _scan_window(kind, kinds, start, end, now, batch_size):
+    """Write ``kind`` reminders for bookings starting in [start, end), one batch per commit."""
+    created = 0
+    after = None
+    while True:
+        stmt = (
+            _candidates()
+            .where(Appointment.appointment_start >= start, Appointment.appointment_start < end)
+            .order_by(Appointment.appointment_start, Appointment.id)
+            .limit(batch_size)
+        )
+        if after is not None:
+            stmt = stmt.where(or_(
+                Appointment.appointment_start > after[0],
+                and_(Appointment.appointment_start == after[0], Appointment.id > after[1]),
+            ))
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            return created
+        created += _insert([m for m in (_message(row, kind, now, kinds) for row in rows) if m])
+        db.session.commit()
+        after = (rows[-1].appointment_start, rows[-1].id)
+
+
+def scan(now=None):
+    """Schedule reminders for the appointments that came into range. Returns ``{kind: created}``."""
+    now = now or datetime.utcnow()
+    batch_size = setting("REMINDER_BATCH_SIZE", 500)
+    created = {}
+    kinds = offsets()
+    for kind, offset in kinds.items():
+        state = db.session.get(ReminderScan, kind)
+        start = max(state.scanned_until, now) if state else now
+        end = now + offset + bucket()
+        created[kind] = _scan_window(kind, kinds, start, end, now, batch_size) if end > start else 0
+        if state is None:
+            db.session.add(ReminderScan(kind=kind, scanned_until=end))
+        else:
+            state.scanned_until = max(state.scanned_until, end)
+        db.session.commit()
+    return created
+
+
+def schedule(appointment_ids, now=None):
+    """
+    Reminders for these appointments that the scanner has already passed
+    over. Runs in the caller's transaction; returns how many were added.
+    """
+    if not appointment_ids:
+        return 0
+    now = now or datetime.utcnow()
+    kinds = offsets()
+    # Two buckets: a scan that started just before this booking committed
+    # may have read the table without it.
+    reach = bucket() * 2
+    rows = db.session.execute(
+        _candidates().where(
+            Appointment.id.in_(appointment_ids),
+            Appointment.appointment_start > now,
+            Appointment.appointment_start < now + max(kinds.values()) + reach,
+        )
+    ).all()
+    messages = []
+    for row in rows:
+        for kind, offset in kinds.items():
+            if row.appointment_start < now + offset + reach:
+                messages.append(_message(row, kind, now, kinds))
+    return _insert([message for message in messages if message])
+
+
+def retract(appointment_id, keep_start=None):
+    """Retract the pending reminders of an appointment (except ones for ``keep_start``)."""
+    criteria = [Reminder.appointment_id == appointment_id, Reminder.status == ReminderStatus.pending]
+    if keep_start is not None:
+        criteria.append(Reminder.appointment_start != keep_start)
+    return db.session.execute(
+        update(Reminder).where(*criteria).values(status=ReminderStatus.retracted)
+    ).rowcount
+
+
+# ---------- Sender ----------
+
+class DirectorySender:
+    """
+    Delivers each message as ``<message_id>.json`` in a local directory
+    (REMINDER_OUTBOX_DIR, default ``instance/reminders``), for a mail relay
+    or SMS gateway to pick up. Files are written under a temporary name and
+    renamed, and a message_id that is already there is not written again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or setting("REMINDER_OUTBOX_DIR") or os.path.join(current_app.instance_path, "reminders")
+        os.makedirs(self.path, exist_ok=True)
+
+    def send(self, message):
+        path = os.path.join(self.path, f"{message['message_id']}.json")
+        if os.path.exists(path):
+            return
+        partial = path + ".part"
+        with open(partial, "w") as fh:
+            json.dump(message, fh, default=str)
+        os.replace(partial, path)
+
+
+def sender():
+    factory = setting("REMINDER_SENDER") or DirectorySender
+    if isinstance(factory, str):
+        factory = import_string(factory)
+    return factory()
+
+
+def _claim(now, limit):
+    timeout = timedelta(seconds=setting("REMINDER_SEND_TIMEOUT", 60))
+    due = or_(
+        and_(Reminder.status == ReminderStatus.pending, Reminder.send_at <= now),
+        and_(Reminder.status == ReminderStatus.sending, Reminder.locked_until < now),
+    )
+    candidates = select(Reminder.id).where(due).order_by(Reminder.send_at).limit(limit)
+    rows = db.session.execute(
+        update(Reminder)
+        .where(Reminder.id.in_(candidates.scalar_subquery()), due)
+        .values(status=ReminderStatus.sending, attempts=Reminder.attempts + 1, locked_until=now + timeout)
+        .returning(
+            Reminder.id, Reminder.kind, Reminder.appointment_id, Reminder.appointment_start,
+            Reminder.recipient, Reminder.subject, Reminder.body, Reminder.attempts,
+        )
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def _expire(now):
+    # Nobody wants a reminder for an appointment that has already started
+    return db.session.execute(
+        update(Reminder)
+        .where(
+            Reminder.status.in_([ReminderStatus.pending, ReminderStatus.sending]),
+            Reminder.send_at <= now,
+            Reminder.appointment_start <= now,
+        )
+        .values(status=ReminderStatus.retracted, last_error="appointment already started", locked_until=None)
+    ).rowcount
+
+
+def drain(now=None):
+    """Send every due reminder. Returns ``{"sent": n, "failed": n, "expired": n}``."""
+    now = now or datetime.utcnow()
+    batch_size = setting("REMINDER_BATCH_SIZE", 500)
+    max_attempts = setting("REMINDER_MAX_ATTEMPTS", 5)
+    outbox = sender()
+    report = {"sent": 0, "failed": 0, "expired": _expire(now)}
+    db.session.commit()
+
+    while True:
+        rows = _claim(now, batch_size)
+        if not rows:
+            break
+        sent = []
+        for row in rows:
+            message = dict(row._asdict(), message_id=f"reminder-{row.id}")
+            try:
+                outbox.send(message)
+            except Exception as exc:
+                report["failed"] += 1
+                values = {"last_error": repr(exc)[-2000:], "locked_until": None}
+                if row.attempts >= max_attempts:
+                    values["status"] = ReminderStatus.failed
+                else:
+                    values.update(
+                        status=ReminderStatus.pending,
+                        send_at=now + timedelta(seconds=backoff(row.attempts)),
+                    )
+                db.session.execute(
+                    update(Reminder)
+                    .where(Reminder.id == row.id, Reminder.status == ReminderStatus.sending)
+                    .values(**values)
+                )
+            else:
+                sent.append(row.id)
+        if sent:
+            db.session.execute(
+                update(Reminder)
+                .where(Reminder.id.in_(sent), Reminder.status == ReminderStatus.sending)
+                .values(status=ReminderStatus.sent, sent_at=datetime.utcnow(), locked_until=None)
+            )
+        report["sent"] += len(sent)
+        db.session.commit()
+    return report
+
+
+def purge(days=None):
+    """Delete sent and retracted reminders older than REMINDER_RETENTION_DAYS."""
+    days = days if days is not None else setting("REMINDER_RETENTION_DAYS", 30)
+    return db.session.execute(
+        delete(Reminder).where(
+            Reminder.status.in_([ReminderStatus.sent, ReminderStatus.retracted]),
+            Reminder.send_at < datetime.utcnow() - timedelta(days=days),
+        )
+    ).rowcount
+
+
+def stats():
+    return {
+        status.name: count
+        for status, count in db.session.execute(
+            select(Reminder.status, func.count()).group_by(Reminder.status)
+        )
+    }
+
+
+# ---------- Jobs ----------
+
+@task("reminders.scan", every=60, timeout=600)
+def scan_job():
+    return scan()
+
+
+@task("reminders.drain", every=60, timeout=600)
+def drain_job():
+    report = drain()
+    report["purged"] = purge()
+    db.session.commit()
+    return report
+
+
+# ---------- ORM sync ----------
+
+def _changes(target):
+    return inspect(target).session.info.setdefault("reminder_changes", {})
+
+
+def _after_insert(mapper, connection, target):
+    if target.status == StatusEnum.booked:
+        _changes(target)[target.id] = None
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.appointment_start.history.has_changes():
+        _changes(target)[target.id] = target.status, target.appointment_start
+
+
+def _before_delete(mapper, connection, target):
+    connection.execute(delete(Reminder).where(Reminder.appointment_id == target.id))
+
+
+event.listen(Appointment, "after_insert", _after_insert)
+event.listen(Appointment, "after_update", _after_update)
+event.listen(Appointment, "before_delete", _before_delete)
+
+
+@event.listens_for(db.session, "after_flush")
+def _apply_changes(session, flush_context):
+    changes = session.info.pop("reminder_changes", None)
+    if not changes:
+        return
+    for appointment_id, current in changes.items():
+        if current is None:
+            continue
+        status, start = current
+        retract(appointment_id, keep_start=start if status == StatusEnum.booked else None)
+    booked = [
+        appointment_id
+        for appointment_id, current in changes.items()
+        if current is None or current[0] == StatusEnum.booked
+    ]
+    schedule(booked)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("reminder_changes", None)
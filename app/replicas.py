@@ -0,0 +1,91 @@
+"""
+Read-replica routing.
+
+Replicas are extra SQLALCHEMY_BINDS listed in READ_REPLICAS (built from
+``DATABASE_REPLICA_URLS``, comma separated). For GET/HEAD requests one
+replica is picked and RoutingSession sends plain SELECTs there; everything
+else stays on the primary. Once the request flushes a write, the rest of
+it reads from the primary too.
+
+Read-your-writes: after any other request method (a form POST) the
+browser session is pinned to the primary for REPLICA_PIN_SECONDS, so the
+page it is redirected to never shows data from before its own change.
+
+For SQLite, ``flask sync-replicas`` copies the primary file onto each
+replica with the online backup API; run it from cron or with --interval.
+"""
+import random
+import sqlite3
+import time
+
+from flask import current_app, request, session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app.database import db
+
+
+READ_METHODS = ("GET", "HEAD")
+
+
+def replica_keys():
+    return current_app.config.get("READ_REPLICAS") or []
+
+
+def _choose_replica():
+    keys = replica_keys()
+    if not keys or request.method not in READ_METHODS:
+        return
+    if session.get("primary_until", 0) > time.time():
+        return
+    db.session.info["replica"] = random.choice(keys)
+
+
+def _pin_after_write(response):
+    if replica_keys() and request.method not in READ_METHODS and response.status_code < 500:
+        session["primary_until"] = int(time.time()) + current_app.config.get("REPLICA_PIN_SECONDS", 5)
+    return response
+
+
+@event.listens_for(db.session, "after_flush")
+def _stick_to_primary(session_, flush_context):
+    session_.info.pop("replica", None)
+
+
+def init_app(app):
+    app.before_request(_choose_replica)
+    app.after_request(_pin_after_write)
+
+
+# ---------- SQLite replica sync ----------
+
+def _sqlite_path(uri):
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return None
+    return url.database
+
+
+def sync_sqlite_replicas():
+    """Copy the primary SQLite file onto every SQLite replica. Returns the synced keys."""
+    config = current_app.config
+    source_path = _sqlite_path(config["SQLALCHEMY_DATABASE_URI"])
+    if source_path is None:
+        return []
+
+    synced = []
+    source = sqlite3.connect(source_path)
+    try:
+        for key in replica_keys():
+            target_path = _sqlite_path(config["SQLALCHEMY_BINDS"][key])
+            if target_path is None:
+                continue
+            target = sqlite3.connect(target_path, timeout=config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            synced.append(key)
+    finally:
+        source.close()
+    return synced
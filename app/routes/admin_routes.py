@@ -1,8 +1,12 @@
-from datetime import datetime, timedelta
-from flask import Blueprint,render_template, request, redirect, url_for,flash,session
+import os
+from datetime import datetime
+from flask import Blueprint,render_template, request, redirect, url_for,flash,session, current_app, jsonify, Response, abort, send_from_directory
+from werkzeug.utils import secure_filename
 from app.utils import hash_password           
 from app.database import db
-from app.models import Admin,Doctor,Patient,Appointment,Department, StatusEnum
+from app.models import Admin,Doctor,Patient,Department, StatusEnum, Job, JobStatus
+from app import auth, booking, bulk_import, counters, exports, fragments, identity, jobs, metrics, queries, refdata, reminders, search, slow_queries, tasks
+from app.pagination import paginate_request
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -22,50 +26,22 @@ def require_admin():
 
 @admin_bp.before_request
 def before_request():
-    # auth
-    user_id = session.get("user_id")
-    if not user_id:
-        return redirect(url_for("auth.login"))
-
-    last_seen = session.get("last_seen")
-    now = datetime.utcnow()
-    SESSION_TIMEOUT = timedelta(minutes=30)
-
-    if last_seen:
-        last_seen_dt = datetime.strptime(last_seen, "%Y-%m-%d %H:%M:%S")
-        if now - last_seen_dt > SESSION_TIMEOUT:
-            session.clear()
-            return redirect(url_for("auth.login"))
-
-    user = Admin.query.get(user_id)
-    if not user:
-        session.clear()
-        return redirect(url_for("auth.login"))
-
-    session["last_seen"] = now.strftime("%Y-%m-%d %H:%M:%S")
+    return auth.guard("admin")
 
 
 # ---------- Dashboard ----------
 
 @admin_bp.route("/dashboard")
 def dashboard():
-    doctors_count = Doctor.query.count()
-    patients_count = Patient.query.count()
-    appointments_count = Appointment.query.count()
-
-    upcoming_appointments = (
-        Appointment.query
-        .filter(Appointment.appointment_start >= datetime.utcnow())
-        .order_by(Appointment.appointment_start.asc())
-        .limit(10)
-        .all()
-    )
+    counts = counters.get("doctor", "patient", "appointment")
+
+    upcoming_appointments = queries.admin_upcoming_appointments(datetime.utcnow()).all()
 
     return render_template(
         "admin/dashboard.html",
-        doctors_count=doctors_count,
-        patients_count=patients_count,
-        appointments_count=appointments_count,
+        doctors_count=counts["doctor"],
+        patients_count=counts["patient"],
+        appointments_count=counts["appointment"],
         upcoming_appointments=upcoming_appointments,
     )
 
@@ -77,23 +53,21 @@ def search_doctors():
     query = request.args.get("query", "").strip()
     department_id = request.args.get("department_id", "").strip()
 
-    doctors_query = Doctor.query
-
-    if query:
-        like = f"%{query}%"
-        doctors_query = doctors_query.filter(
-            (Doctor.name.ilike(like)) | (Doctor.email.ilike(like))
-        )
+    doctors_query = queries.doctors_with_department()
 
     if department_id:
         doctors_query = doctors_query.filter(Doctor.department_id == int(department_id))
 
-    all_doctors = doctors_query.order_by(Doctor.name.asc()).all()
-    departments = Department.query.order_by(Department.name.asc()).all()
+    keys = (Doctor.name, Doctor.id)
+    if query:
+        doctors_query, keys = search.search_doctors(doctors_query, query)
+
+    page = paginate_request(doctors_query, keys)
+    departments = refdata.departments()
 
     return render_template(
         "admin/manage_doctors.html",
-        doctors=all_doctors,
+        doctors=page,
         departments=departments,
         selected_department=department_id,
         query=query,
@@ -102,7 +76,7 @@ def search_doctors():
 
 @admin_bp.route("/doctor/add", methods=["GET", "POST"])
 def add_doctor():
-    departments = Department.query.order_by(Department.name.asc()).all()
+    departments = refdata.departments()
 
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -118,9 +92,8 @@ def add_doctor():
             flash("Please fill in all required fields.", "warning")
             return render_template("admin/add_doctor.html", departments=departments)
 
-        existing = Doctor.query.filter_by(email=email).first()
-        if existing:
-            flash("A doctor with that email already exists.", "danger")
+        if identity.email_taken(email):
+            flash("An account with that email already exists.", "danger")
             return render_template("admin/add_doctor.html", departments=departments)
 
         try:
@@ -156,7 +129,7 @@ def add_doctor():
 @admin_bp.route("/doctor/edit/<int:doctor_id>", methods=["GET", "POST"])
 def edit_doctor(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
-    departments = Department.query.order_by(Department.name.asc()).all()
+    departments = refdata.departments()
 
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -173,11 +146,8 @@ def edit_doctor(doctor_id):
                 "admin/edit_doctor.html", doctor=doctor, departments=departments
             )
 
-        existing = Doctor.query.filter(
-            Doctor.email == email, Doctor.id != doctor.id
-        ).first()
-        if existing:
-            flash("Another doctor with that email already exists.", "danger")
+        if identity.email_taken(email, exclude=doctor):
+            flash("Another account with that email already exists.", "danger")
             return render_template(
                 "admin/edit_doctor.html", doctor=doctor, departments=departments
             )
@@ -245,9 +215,8 @@ def add_patient():
             flash("Age must be a valid number.", "warning")
             return render_template("admin/add_patient.html")
 
-        existing = Patient.query.filter_by(email=email).first()
-        if existing:
-            flash("A patient with that email already exists.", "danger")
+        if identity.email_taken(email):
+            flash("An account with that email already exists.", "danger")
             return render_template("admin/add_patient.html")
 
         try:
@@ -278,10 +247,15 @@ def edit_patient(patient_id):
     patient = Patient.query.get_or_404(patient_id)
 
     if request.method == "POST":
+        email = request.form.get("email", "").strip()
+        if identity.email_taken(email, exclude=patient):
+            flash("Another account with that email already exists.", "danger")
+            return render_template("admin/edit_patient.html", patient=patient)
+
         patient.name = request.form.get("name", "").strip()
         age = request.form.get("age", "").strip()
         patient.gender = request.form.get("gender", "").strip()
-        patient.email = request.form.get("email", "").strip()
+        patient.email = email
         patient.phone = request.form.get("phone", "").strip()
         status_str = request.form.get("status", "").strip().lower()
 
@@ -316,86 +290,74 @@ def delete_patient(patient_id):
 
 @admin_bp.route("/patient/search", methods=["GET", "POST"])
 def search_patients():
-    patients = []
-    if request.method == "POST":
-        search_term = request.form.get("query", "").strip()
-        if search_term:
-            like = f"%{search_term}%"
-            patients = Patient.query.filter(
-                (Patient.name.ilike(like))
-                | (Patient.email.ilike(like))
-                | (Patient.phone.ilike(like))
-            ).all()
-            if not patients:
-                flash("No patients found matching the search criteria.", "info")
-        else:
-            flash("Please enter a search term.", "warning")
-
-    if not patients:
-        patients = Patient.query.order_by(Patient.name.asc()).all()
+    patients = None
+    search_term = request.values.get("query", "").strip()
+    if search_term:
+        patients = paginate_request(*search.search_patients(search_term))
+        if not patients and not patients.has_prev:
+            flash("No patients found matching the search criteria.", "info")
+            patients = None
+            search_term = ""
+    elif request.method == "POST":
+        flash("Please enter a search term.", "warning")
+
+    if patients is None:
+        patients = paginate_request(Patient.query, (Patient.name, Patient.id))
 
-    return render_template("admin/search_patient.html", patients=patients)
+    return render_template(
+        "admin/search_patient.html", patients=patients, query=search_term
+    )
 
 
 # ---------- Appointment management ----------
 
+def _book_appointment_page(selected=None):
+    # The patient picker shows one keyset page of active patients, narrowed
+    # by the same search as the patient list, never the whole table.
+    term = request.values.get("patient_query", "").strip()
+    query, keys = search.search_patients(term) if term else (Patient.query, (Patient.name, Patient.id))
+    patients = paginate_request(query.filter(Patient.status == StatusEnum.active), keys)
+    return render_template(
+        "admin/book_appointment.html",
+        patients=patients,
+        patient_query=term,
+        selected=selected,
+        doctors=refdata.active_doctors(),
+    )
+
+
 @admin_bp.route("/appointment/add", methods=["GET", "POST"])
 def add_appointment():
-    patients = Patient.query.filter(Patient.status == StatusEnum.active).all()
-    doctors = Doctor.query.filter(Doctor.status == StatusEnum.active).all()
-
     if request.method == "POST":
-        patient_id = request.form.get("patient_id")
+        patient_id = request.form.get("patient_id", type=int)
         doctor_id = request.form.get("doctor_id")
         appointment_dt_str = request.form.get("appointment_date")  # 'YYYY-MM-DDTHH:MM'
         reason = request.form.get("reason", "").strip()
+        selected = db.session.get(Patient, patient_id) if patient_id else None
 
-        if not (patient_id and doctor_id and appointment_dt_str and reason):
+        if not (selected and doctor_id and appointment_dt_str and reason):
             flash("Please fill in all fields.", "warning")
-            return render_template(
-                "admin/book_appointment.html", patients=patients, doctors=doctors
-            )
+            return _book_appointment_page(selected)
 
         try:
             appointment_start = datetime.fromisoformat(appointment_dt_str)
         except ValueError:
             flash("Invalid date/time format.", "danger")
-            return render_template(
-                "admin/book_appointment.html", patients=patients, doctors=doctors
-            )
-
-        # default duration: 50 minutes
-        from datetime import timedelta as _td
-        appointment_end = appointment_start + _td(minutes=50)
+            return _book_appointment_page(selected)
 
-        # Prevent double booking for the same doctor at the same start time
-        conflict = Appointment.query.filter_by(
-            doctor_id=int(doctor_id),
-            appointment_start=appointment_start,
-        ).first()
-        if conflict:
-            flash("The doctor already has an appointment at this date and time.", "danger")
-            return render_template(
-                "admin/book_appointment.html", patients=patients, doctors=doctors
+        # Overlap check + insert in one write transaction (app.booking)
+        try:
+            booking.book_appointment(
+                selected.id, int(doctor_id), appointment_start, reason
             )
+        except booking.BookingConflict as exc:
+            flash(str(exc), "danger")
+            return _book_appointment_page(selected)
 
-        new_appointment = Appointment(
-            patient_id=int(patient_id),
-            doctor_id=int(doctor_id),
-            appointment_start=appointment_start,
-            appointment_end=appointment_end,
-            reason=reason,
-            status=StatusEnum.booked,
-        )
-
-        db.session.add(new_appointment)
-        db.session.commit()
         flash("Appointment created successfully.", "success")
         return redirect(url_for("admin.dashboard"))
 
-    return render_template(
-        "admin/book_appointment.html", patients=patients, doctors=doctors
-    )
+    return _book_appointment_page()
 
 @admin_bp.route("/add_department", methods=["GET", "POST"])
 def add_department():
@@ -436,11 +398,11 @@ def search_departments():
             Department.name.ilike(like)
         )
 
-    all_departments = departments_query.order_by(Department.name.asc()).all()
+    page = paginate_request(departments_query, (Department.name, Department.id))
 
     return render_template(
         "admin/manage_departments.html",
-        departments=all_departments,
+        departments=page,
         query=query,
     )
 
@@ -479,3 +441,160 @@ def delete_department(department_id):
     db.session.commit()
     flash("Department deleted successfully.", "success")
     return redirect(url_for("admin.dashboard"))
+
+
+# ---------- Bulk import ----------
+
+@admin_bp.route("/import", methods=["GET", "POST"])
+def import_data():
+    if request.method == "POST":
+        kind = request.form.get("kind", "").strip()
+        upload = request.files.get("file")
+
+        if kind not in bulk_import.KINDS or not upload or not upload.filename:
+            flash("Choose what to import and a CSV/JSONL file.", "warning")
+            return render_template("admin/import.html", kinds=bulk_import.KINDS)
+
+        # The import runs on a job worker: no process pool forked from the
+        # web server, and the request returns as soon as the file is saved
+        name = f"{kind}-{datetime.utcnow():%Y%m%d%H%M%S}-{secure_filename(upload.filename)}"
+        upload.save(os.path.join(tasks.import_dir(), name))
+        job_id = jobs.enqueue("imports.run", {"kind": kind, "name": name})
+        db.session.commit()
+
+        flash(f"Import queued (job #{job_id}); the result shows up under Background Jobs.", "success")
+        return redirect(url_for("admin.jobs_overview"))
+
+    return render_template("admin/import.html", kinds=bulk_import.KINDS)
+
+
+# ---------- Exports ----------
+
+@admin_bp.route("/export/appointments")
+def export_appointments():
+    """Appointment log, optionally for one department/doctor and a date range."""
+    stmts = exports.appointment_log(
+        department_id=request.args.get("department_id", type=int),
+        doctor_id=request.args.get("doctor_id", type=int),
+        start=exports.date_arg("start"),
+        end=exports.date_arg("end"),
+    )
+    return exports.response(stmts, f"appointments-{datetime.utcnow():%Y%m%d}")
+
+
+@admin_bp.route("/export/patient/<int:patient_id>/history")
+def export_patient_history(patient_id):
+    Patient.query.get_or_404(patient_id)
+    return exports.response(exports.patient_history(patient_id), f"patient-{patient_id}-history")
+
+
+# ---------- Background jobs ----------
+
+# Buttons on the jobs page; the key format decides how often each can run
+MAINTENANCE_JOBS = {
+    "slots.extend_horizon": ("Extend slot horizon", "%Y-%m-%d"),
+    "counters.reconcile": ("Reconcile counters", "%Y-%m-%dT%H:%M"),
+    "archive.run": ("Archive old appointments", "%Y-%m-%dT%H"),
+}
+
+
+@admin_bp.route("/jobs")
+def jobs_overview():
+    """Queue depth, throughput and the latest jobs."""
+    status = request.args.get("status")
+    if status not in (None, "", *(s.name for s in JobStatus)):
+        status = None
+    return render_template(
+        "admin/jobs.html",
+        stats=jobs.stats(),
+        reminder_stats=reminders.stats(),
+        recent=jobs.recent(status or None),
+        status=status,
+        statuses=[s.name for s in JobStatus],
+        maintenance=MAINTENANCE_JOBS,
+    )
+
+
+@admin_bp.route("/jobs/enqueue/<name>", methods=["POST"])
+def enqueue_job(name):
+    if name not in MAINTENANCE_JOBS:
+        abort(404)
+    label, period = MAINTENANCE_JOBS[name]
+    job_id = jobs.enqueue(name, key=f"{name}:{datetime.utcnow():{period}}")
+    db.session.commit()
+    flash(f"{label} queued (job #{job_id}).", "success")
+    return redirect(url_for("admin.jobs_overview"))
+
+
+@admin_bp.route("/jobs/export", methods=["POST"])
+def enqueue_export():
+    """Build an appointment export in the background instead of streaming it."""
+    fmt = request.form.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        flash("Unknown export format.", "danger")
+        return redirect(url_for("admin.dashboard"))
+    compress = bool(request.form.get("gzip"))
+    payload = {
+        "fmt": fmt,
+        "compress": compress,
+        "start": request.form.get("start") or None,
+        "end": request.form.get("end") or None,
+    }
+    now = datetime.utcnow()
+    payload["name"] = exports.filename(f"appointments-{now:%Y%m%d%H%M%S}", fmt, compress)
+    # the same request twice in one minute (a double submit) is one job
+    key = "exports.appointments:{start}:{end}:{fmt}:{compress}:".format(**payload) + f"{now:%Y%m%d%H%M}"
+    job_id = jobs.enqueue("exports.appointments", payload, key=key)
+    db.session.commit()
+    flash(f"Export queued (job #{job_id}); download it from Background Jobs when it is done.", "success")
+    return redirect(url_for("admin.jobs_overview"))
+
+
+@admin_bp.route("/jobs/<int:job_id>/retry", methods=["POST"])
+def retry_job(job_id):
+    if jobs.retry(job_id):
+        flash(f"Job #{job_id} queued again.", "success")
+    else:
+        flash(f"Job #{job_id} has not failed.", "warning")
+    return redirect(url_for("admin.jobs_overview", status=request.args.get("status")))
+
+
+@admin_bp.route("/jobs/<int:job_id>/download")
+def download_job_result(job_id):
+    job = Job.query.get_or_404(job_id)
+    result = job.result_data or {}
+    if job.status != JobStatus.succeeded or "file" not in result:
+        abort(404)
+    return send_from_directory(tasks.export_dir(), result["file"], as_attachment=True)
+
+
+# ---------- Cache stats / metrics / slow queries ----------
+
+@admin_bp.route("/cache-stats")
+def cache_stats():
+    """Hit/miss counts of this worker's caches."""
+    return jsonify({
+        "refdata": refdata.stats(),
+        "principals": auth.stats(),
+        "fragments": fragments.stats(),
+    })
+
+
+@admin_bp.route("/metrics")
+def metrics_endpoint():
+    """Request/SQL/template histograms in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@admin_bp.route("/slow-queries")
+def slow_queries_report():
+    """Slow statements from the slow-query log, grouped by fingerprint."""
+    enabled = current_app.config.get("SLOW_QUERY_MS") is not None
+    groups = slow_queries.aggregate(slow_queries.read_entries()) if enabled else []
+    return render_template(
+        "admin/slow_queries.html",
+        groups=groups,
+        enabled=enabled,
+        threshold=current_app.config.get("SLOW_QUERY_MS"),
+        log_path=slow_queries.log_path(),
+    )
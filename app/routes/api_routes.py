@@ -0,0 +1,422 @@
+from datetime import date, datetime
+
+from flask import Blueprint, jsonify, request, session, url_for
+from sqlalchemy.orm import Bundle
+
+from app.models import Appointment, ArchivedAppointment, ArchivedTreatment, Patient, StatusEnum, Treatment
+from app.database import db
+from app import auth, booking, conditional, identity, refdata, slots
+from app.pagination import paginate_merged_request, paginate_sequence_request
+from app.passwords import needs_rehash
+from app.utils import hash_password, verify_password
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+# ---------- Compact column sets ----------
+# Listings select these bundles instead of whole ORM objects, so a page
+# reads only the columns the JSON needs. History reads both the hot and
+# the archive tables, which share column names.
+
+def appointment_bundle(appointment):
+    return Bundle(
+        "appointment",
+        appointment.id,
+        appointment.patient_id,
+        appointment.doctor_id,
+        appointment.appointment_start,
+        appointment.appointment_end,
+        appointment.status,
+        appointment.reason,
+        appointment.last_updated_at,
+    )
+
+
+def treatment_bundle(appointment, treatment):
+    return Bundle(
+        "treatment",
+        treatment.id,
+        treatment.appointment_id,
+        appointment.doctor_id,
+        appointment.appointment_start,
+        treatment.diagnosis,
+        treatment.prescription,
+        treatment.notes,
+        treatment.treatment_date,
+    )
+
+
+APPOINTMENT = appointment_bundle(Appointment)
+ARCHIVED_APPOINTMENT = appointment_bundle(ArchivedAppointment)
+TREATMENT = treatment_bundle(Appointment, Treatment)
+ARCHIVED_TREATMENT = treatment_bundle(ArchivedAppointment, ArchivedTreatment)
+
+
+PROFILE = Bundle(
+    "patient",
+    Patient.id,
+    Patient.name,
+    Patient.email,
+    Patient.phone,
+    Patient.age,
+    Patient.gender,
+    Patient.address,
+)
+
+
+# ---------- Serializers ----------
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def department_json(row):
+    return {"id": row.id, "name": row.name, "description": row.description}
+
+
+def doctor_json(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "department_id": row.department_id,
+        "department": row.department_name,
+    }
+
+
+def appointment_json(row):
+    return {
+        "id": row.id,
+        "patient_id": row.patient_id,
+        "doctor_id": row.doctor_id,
+        "start": _iso(row.appointment_start),
+        "end": _iso(row.appointment_end),
+        "status": row.status.name,
+        "reason": row.reason,
+        "updated_at": _iso(row.last_updated_at),
+    }
+
+
+def treatment_json(row):
+    return {
+        "id": row.id,
+        "appointment_id": row.appointment_id,
+        "doctor_id": row.doctor_id,
+        "appointment_start": _iso(row.appointment_start),
+        "diagnosis": row.diagnosis,
+        "prescription": row.prescription,
+        "notes": row.notes,
+        "date": _iso(row.treatment_date),
+    }
+
+
+def profile_json(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "email": row.email,
+        "phone": row.phone,
+        "age": row.age,
+        "gender": row.gender,
+        "address": row.address,
+    }
+
+
+def page_json(page, serialize):
+    return {
+        "items": [serialize(row) for row in page],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor,
+    }
+
+
+# ---------- Helpers ----------
+
+def error(status, message):
+    return jsonify(error=message), status
+
+
+def _listing(queries, key, serialize, watermark):
+    """
+    Cursor-paginated JSON page over ``(query, keys)`` pairs (hot and
+    archive), or 304 when ``watermark`` has not moved. Archived rows never
+    change, so the hot table's watermark covers both.
+    """
+    tag = conditional.request_etag(watermark)
+    unchanged = conditional.not_modified(tag)
+    if unchanged is not None:
+        return unchanged
+    page = paginate_merged_request(queries, key)
+    return conditional.tag(jsonify(page_json(page, serialize)), tag)
+
+
+def _cached_listing(rows, key, serialize):
+    # Reference data is already in memory, so the page itself is the validator
+    page = page_json(paginate_sequence_request(rows, key), serialize)
+    tag = conditional.request_etag(page)
+    return conditional.not_modified(tag) or conditional.tag(jsonify(page), tag)
+
+
+def _appointment_scope(principal, appointment=Appointment):
+    if principal.role == "patient":
+        return [appointment.patient_id == principal.id]
+    if principal.role == "doctor":
+        return [appointment.doctor_id == principal.id]
+    return []
+
+
+def _appointment_row(appointment_id):
+    return (
+        db.session.query(APPOINTMENT)
+        .filter(Appointment.id == appointment_id)
+        .scalar()
+    )
+
+
+def _archived_appointment_row(appointment_id):
+    return (
+        db.session.query(ARCHIVED_APPOINTMENT)
+        .filter(ArchivedAppointment.id == appointment_id)
+        .scalar()
+    )
+
+
+def _appointment_etag(row):
+    return conditional.etag("appointment", row.id, row.last_updated_at)
+
+
+def _appointment_response(row, status=200):
+    response = jsonify(appointment_json(row))
+    response.status_code = status
+    return conditional.tag(response, _appointment_etag(row))
+
+
+def _visible(principal, row):
+    return principal.role == "admin" or principal.id == (
+        row.patient_id if principal.role == "patient" else row.doctor_id
+    )
+
+
+# ---------- Session guard ----------
+
+@api_bp.before_request
+def before_request():
+    if request.endpoint == "api.login":
+        return None
+    if auth.authenticate() is None:
+        return error(401, "Authentication required.")
+    return None
+
+
+# ---------- Session ----------
+
+@api_bp.route("/session", methods=["POST"])
+def login():
+    data = request.get_json(silent=True) or {}
+    email = str(data.get("email", "")).strip()
+    password = str(data.get("password", ""))
+    if not (email and password):
+        return error(400, "email and password are required.")
+
+    account = identity.lookup(email)
+    if not account or not verify_password(account.password_hash, password):
+        return error(401, "Invalid credentials.")
+    if account.status in auth.BLOCKED:
+        return error(403, "Your account is not active.")
+
+    if needs_rehash(account.password_hash):
+        user = identity.load_user(account)
+        user.password_hash = hash_password(password)
+        db.session.commit()
+
+    session.clear()
+    session["user_id"] = account.user_id
+    session["user_role"] = account.role.name
+    auth.touch_session()
+    return jsonify(role=account.role.name, id=account.user_id)
+
+
+@api_bp.route("/session", methods=["DELETE"])
+def logout():
+    session.clear()
+    return "", 204
+
+
+# ---------- Reference data ----------
+
+@api_bp.route("/departments")
+def list_departments():
+    return _cached_listing(refdata.departments(), lambda row: (row.name, row.id), department_json)
+
+
+@api_bp.route("/doctors")
+def list_doctors():
+    doctors = refdata.active_doctors()
+    department_id = request.args.get("department_id", type=int)
+    if department_id is not None:
+        doctors = [row for row in doctors if row.department_id == department_id]
+    return _cached_listing(doctors, lambda row: (row.name, row.id), doctor_json)
+
+
+@api_bp.route("/doctors/<int:doctor_id>/slots")
+def doctor_slots(doctor_id):
+    try:
+        day = date.fromisoformat(request.args.get("date", ""))
+    except ValueError:
+        return error(400, "date must be YYYY-MM-DD.")
+
+    items = [{"start": _iso(slot.start), "end": _iso(slot.end)} for slot in slots.free_slots(doctor_id, day)]
+    tag = conditional.request_etag(items)
+    return conditional.not_modified(tag) or conditional.tag(jsonify(items=items), tag)
+
+
+# ---------- Appointments ----------
+
+@api_bp.route("/appointments")
+def list_appointments():
+    principal = auth.current_principal()
+
+    status = request.args.get("status", "").strip().lower()
+    if status and status not in ("booked", "completed", "cancelled"):
+        return error(400, "Unknown status.")
+    start = None
+    if request.args.get("from"):
+        try:
+            start = datetime.fromisoformat(request.args["from"])
+        except ValueError:
+            return error(400, "from must be an ISO date/time.")
+
+    def criteria(appointment):
+        found = _appointment_scope(principal, appointment)
+        if status:
+            found.append(appointment.status == StatusEnum[status])
+        for arg in ("doctor_id", "patient_id"):
+            value = request.args.get(arg, type=int)
+            if value is not None:
+                found.append(getattr(appointment, arg) == value)
+        if start is not None:
+            found.append(appointment.appointment_start >= start)
+        return found
+
+    return _listing(
+        [
+            (db.session.query(bundle).filter(*criteria(model)), (model.appointment_start, model.id))
+            for bundle, model in ((APPOINTMENT, Appointment), (ARCHIVED_APPOINTMENT, ArchivedAppointment))
+        ],
+        lambda row: (row.appointment_start, row.id),
+        appointment_json,
+        conditional.appointments_watermark(*criteria(Appointment)),
+    )
+
+
+@api_bp.route("/appointments/<int:appointment_id>")
+def get_appointment(appointment_id):
+    row = _appointment_row(appointment_id) or _archived_appointment_row(appointment_id)
+    if row is None or not _visible(auth.current_principal(), row):
+        return error(404, "Appointment not found.")
+    return conditional.not_modified(_appointment_etag(row)) or _appointment_response(row)
+
+
+@api_bp.route("/appointments", methods=["POST"])
+def create_appointment():
+    principal = auth.current_principal()
+    data = request.get_json(silent=True) or {}
+
+    if principal.role == "patient":
+        patient_id = principal.id
+    elif principal.role == "admin":
+        patient_id = data.get("patient_id")
+        if not isinstance(patient_id, int) or db.session.get(Patient, patient_id) is None:
+            return error(400, "A valid patient_id is required.")
+    else:
+        return error(403, "Doctors cannot book appointments.")
+
+    doctor_id = data.get("doctor_id")
+    reason = str(data.get("reason") or "").strip()
+    if not (isinstance(doctor_id, int) and data.get("start") and reason):
+        return error(400, "doctor_id, start and reason are required.")
+    if doctor_id not in {row.id for row in refdata.active_doctors()}:
+        return error(400, "Unknown doctor.")
+
+    try:
+        start = datetime.fromisoformat(str(data["start"]))
+    except ValueError:
+        return error(400, "start must be an ISO date/time.")
+    if start <= datetime.utcnow():
+        return error(400, "Appointment time must be in the future.")
+
+    try:
+        appointment = booking.book_appointment(patient_id, doctor_id, start, reason)
+    except booking.BookingConflict as exc:
+        return error(409, str(exc))
+
+    response = _appointment_response(_appointment_row(appointment.id), status=201)
+    response.headers["Location"] = url_for("api.get_appointment", appointment_id=appointment.id)
+    return response
+
+
+@api_bp.route("/appointments/<int:appointment_id>/cancel", methods=["POST"])
+def cancel_appointment(appointment_id):
+    principal = auth.current_principal()
+    appointment = db.session.get(Appointment, appointment_id)
+    if appointment is None or not _visible(principal, appointment):
+        return error(404, "Appointment not found.")
+    if conditional.precondition_failed(_appointment_etag(appointment)):
+        return error(412, "The appointment has changed since it was read.")
+    if appointment.status != StatusEnum.booked:
+        return error(409, "Only booked appointments can be cancelled.")
+
+    appointment.status = StatusEnum.cancelled
+    slots.release_slot(appointment.id)
+    db.session.commit()
+    return _appointment_response(_appointment_row(appointment.id))
+
+
+# ---------- Treatments ----------
+
+@api_bp.route("/treatments")
+def list_treatments():
+    principal = auth.current_principal()
+    if principal.role == "patient":
+        patient_id = principal.id
+    else:
+        patient_id = request.args.get("patient_id", type=int)
+        if patient_id is None:
+            return error(400, "patient_id is required.")
+
+    def criteria(appointment):
+        found = [appointment.patient_id == patient_id]
+        if principal.role == "doctor":
+            found.append(appointment.doctor_id == principal.id)
+        return found
+
+    return _listing(
+        [
+            (
+                db.session.query(bundle)
+                .join(appointment, treatment.appointment_id == appointment.id)
+                .filter(*criteria(appointment)),
+                (treatment.id,),
+            )
+            for bundle, appointment, treatment in (
+                (TREATMENT, Appointment, Treatment),
+                (ARCHIVED_TREATMENT, ArchivedAppointment, ArchivedTreatment),
+            )
+        ],
+        lambda row: (row.id,),
+        treatment_json,
+        conditional.treatments_watermark(*criteria(Appointment)),
+    )
+
+
+# ---------- Patient profile ----------
+
+@api_bp.route("/profile")
+def profile():
+    principal = auth.current_principal()
+    if principal.role != "patient":
+        return error(403, "Only patients have a profile.")
+
+    row = db.session.query(PROFILE).filter(Patient.id == principal.id).scalar()
+    body = profile_json(row)
+    tag = conditional.etag("patient", body)
+    return conditional.not_modified(tag) or conditional.tag(jsonify(body), tag)
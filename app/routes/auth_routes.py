@@ -1,9 +1,9 @@
-import datetime
-
 from flask import Blueprint,render_template,redirect,url_for,flash,request, session
 
-from app.models import Admin, Doctor, Patient, StatusEnum
+from app import auth, identity
+from app.models import Patient, StatusEnum
 from app.utils import verify_password, hash_password
+from app.passwords import needs_rehash
 from app.database import db
 
 auth_bp = Blueprint("auth", __name__)
@@ -11,12 +11,10 @@ auth_bp = Blueprint("auth", __name__)
 
 # ---------- Helpers ----------
 
-def set_user_session(user, role: str):
-    session["user_id"] = user.id
+def set_user_session(user_id, role: str):
+    session["user_id"] = user_id
     session["user_role"] = role  # "admin", "doctor", "patient"
-    session["last_seen"] = datetime.datetime.utcnow().strftime(
-        "%Y-%m-%d %H:%M:%S"
-    )
+    auth.touch_session()
 
 
 # ---------- Login ----------
@@ -31,37 +29,29 @@ def login():
             flash("Please enter both email and password.", "warning")
             return render_template("auth/login.html")
 
-        user = None
-        role = None
-
-        user = Admin.query.filter_by(email=email).first()
-        if user:
-            role = "admin"
-        else:
-            # Try Doctor
-            user = Doctor.query.filter_by(email=email).first()
-            if user:
-                role = "doctor"
-            else:
-                # Try Patient
-                user = Patient.query.filter_by(email=email).first()
-                if user:
-                    role = "patient"
-
-        if not user:
+        # One indexed lookup across admins, doctors and patients
+        account = identity.lookup(email)
+        if not account:
             flash("Invalid credentials.", "danger")
             return render_template("auth/login.html")
 
-        if hasattr(user, "status") and user.status in (StatusEnum.inactive, StatusEnum.blacklisted):
+        if account.status in (StatusEnum.inactive, StatusEnum.blacklisted):
             flash("Your account is not active. Please contact admin.", "danger")
             return render_template("auth/login.html")
 
-        stored_hash = getattr(user, "password_hash", None)
+        stored_hash = account.password_hash
         if not stored_hash or not verify_password(stored_hash, password):
             flash("Invalid credentials.", "danger")
             return render_template("auth/login.html")
 
-        set_user_session(user, role)
+        # Upgrade hashes made with old cost parameters while we have the password
+        if needs_rehash(stored_hash):
+            user = identity.load_user(account)
+            user.password_hash = hash_password(password)
+            db.session.commit()
+
+        role = account.role.name
+        set_user_session(account.user_id, role)
         flash("Logged in successfully.", "success")
 
         if role == "admin":
@@ -119,8 +109,7 @@ def register():
             flash("Age must be a valid number.", "warning")
             return render_template("auth/register.html")
 
-        existing_user = Patient.query.filter_by(email=email).first()
-        if existing_user:
+        if identity.email_taken(email):
             flash("Email already registered.", "danger")
             return render_template("auth/register.html")
 
@@ -1,37 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from flask import Blueprint,render_template,request,redirect,url_for,flash,session
 
-from app.models import Appointment, Doctor, Patient, Treatment, StatusEnum
+from app.models import Appointment, Patient, Treatment, StatusEnum
 from app.database import db
+from app import auth, exports, queries, slots
+from app.pagination import paginate_request
 
 doctor_bp = Blueprint("doctor", __name__, url_prefix="/doctor")
 
 
 @doctor_bp.before_request
 def before_request():
-    doctor_id = session.get("user_id")
-    last_seen = session.get("last_seen")
-
-    if not doctor_id or session.get("user_role") != "doctor":
-        return redirect(url_for("auth.login"))
-
-    now = datetime.utcnow()
-    SESSION_TIMEOUT = timedelta(minutes=30)
-
-    if last_seen:
-        last_seen_dt = datetime.strptime(last_seen, "%Y-%m-%d %H:%M:%S")
-        if now - last_seen_dt > SESSION_TIMEOUT:
-            session.clear()
-            return redirect(url_for("auth.login"))
-
-    doctor = Doctor.query.get(doctor_id)
-    if not doctor:
-        session.clear()
-        return redirect(url_for("auth.login"))
-
-    session["doctor_name"] = doctor.name
-    session["last_seen"] = now.strftime("%Y-%m-%d %H:%M:%S")
+    return auth.guard("doctor", name_key="doctor_name")
 
 
 # ---------- Dashboard ----------
@@ -41,16 +22,7 @@ def dashboard():
     doctor_id = session.get("user_id")
     now = datetime.utcnow()
 
-    upcoming_appointments = (
-        Appointment.query
-        .filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == StatusEnum.booked,
-            Appointment.appointment_start >= now,
-        )
-        .order_by(Appointment.appointment_start.asc())
-        .all()
-    )
+    upcoming_appointments = queries.doctor_upcoming_appointments(doctor_id, now).all()
 
     return render_template(
         "doctor/dashboard.html",
@@ -85,6 +57,8 @@ def update_appointment_status(appointment_id):
         return redirect(url_for("doctor.dashboard"))
 
     appointment.status = StatusEnum[new_status]
+    if appointment.status == StatusEnum.cancelled:
+        slots.release_slot(appointment.id)
     db.session.commit()
     flash("Appointment status updated.", "success")
     return redirect(url_for("doctor.dashboard"))
@@ -150,14 +124,7 @@ def add_treatment(appointment_id):
 def manage_patients():
     doctor_id = session.get("user_id")
 
-    patients = (
-        Patient.query
-        .join(Appointment)
-        .filter(Appointment.doctor_id == doctor_id)
-        .distinct()
-        .order_by(Patient.name.asc())
-        .all()
-    )
+    patients = paginate_request(queries.doctor_patients(doctor_id), (Patient.name, Patient.id))
 
     return render_template("doctor/patients.html", patients=patients)
 
@@ -168,16 +135,7 @@ def manage_patients():
 def patient_history(patient_id):
     doctor_id = session.get("user_id")
 
-    treatments = (
-        Treatment.query
-        .join(Appointment)
-        .filter(
-            Appointment.patient_id == patient_id,
-            Appointment.doctor_id == doctor_id,
-        )
-        .order_by(Treatment.treatment_date.desc())
-        .all()
-    )
+    treatments = queries.doctor_patient_treatment_history(doctor_id, patient_id)
 
     patient = Patient.query.get_or_404(patient_id)
 
@@ -186,3 +144,10 @@ def patient_history(patient_id):
         treatments=treatments,
         patient=patient,
     )
+
+
+@doctor_bp.route("/patient/<int:patient_id>/history/export")
+def export_patient_history(patient_id):
+    Patient.query.get_or_404(patient_id)
+    stmts = exports.patient_history(patient_id, doctor_id=session.get("user_id"))
+    return exports.response(stmts, f"patient-{patient_id}-history")
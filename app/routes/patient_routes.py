@@ -1,9 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from flask import Blueprint,render_template,request,redirect,url_for,flash,session
+from flask import Blueprint,render_template,request,redirect,url_for,flash,session,make_response,current_app
 
-from app.models import Doctor,Appointment,Patient,Treatment,Department,StatusEnum
+from app.models import Doctor,Patient
 from app.database import db
+from app import auth, booking, conditional, exports, identity, queries, refdata, search
+from app.pagination import paginate_request
 
 patient_bp = Blueprint("patient", __name__, url_prefix="/patient")
 
@@ -12,28 +14,19 @@ patient_bp = Blueprint("patient", __name__, url_prefix="/patient")
 
 @patient_bp.before_request
 def before_request():
-    user_id = session.get("user_id")
-    last_seen = session.get("last_seen")
+    return auth.guard("patient", name_key="patient_name")
 
-    if not user_id or session.get("user_role") != "patient":
-        return redirect(url_for("auth.login"))
 
-    now = datetime.utcnow()
-    SESSION_TIMEOUT = timedelta(minutes=30)
-
-    if last_seen:
-        last_seen_dt = datetime.strptime(last_seen, "%Y-%m-%d %H:%M:%S")
-        if now - last_seen_dt > SESSION_TIMEOUT:
-            session.clear()
-            return redirect(url_for("auth.login"))
-
-    patient = Patient.query.get(user_id)
-    if not patient:
-        session.clear()
-        return redirect(url_for("auth.login"))
+# ---------- Conditional GET ----------
 
-    session["patient_name"] = patient.name
-    session["last_seen"] = now.strftime("%Y-%m-%d %H:%M:%S")
+def _page_etag(patient_id, now):
+    # One aggregate query; the department/doctor digests come from the
+    # reference data cache.
+    return conditional.request_etag(
+        conditional.patient_watermark(patient_id, now),
+        refdata.fingerprint(refdata.DEPARTMENTS),
+        refdata.fingerprint(refdata.DOCTORS),
+    )
 
 
 # ---------- Dashboard ----------
@@ -43,37 +36,26 @@ def dashboard():
     patient_id = session.get("user_id")
     now = datetime.utcnow()
 
-    upcoming_appointments = (
-        Appointment.query
-        .filter(
-            Appointment.patient_id == patient_id,
-            Appointment.status == StatusEnum.booked,
-            Appointment.appointment_start >= now,
-        )
-        .order_by(Appointment.appointment_start.asc())
-        .all()
-    )
+    tag = _page_etag(patient_id, now)
+    unchanged = conditional.not_modified(tag)
+    if unchanged is not None:
+        return unchanged
 
-    past_appointments = (
-        Appointment.query
-        .filter(
-            Appointment.patient_id == patient_id,
-            Appointment.status.in_([StatusEnum.completed, StatusEnum.cancelled]),
-        )
-        .order_by(Appointment.appointment_start.desc())
-        .all()
-    )
+    upcoming_appointments = queries.patient_upcoming_appointments(patient_id, now).all()
+    # the latest few only; the full history is on the treatments page and in the export
+    past_appointments = queries.patient_history(patient_id, limit=current_app.config["DASHBOARD_PAST_LIMIT"])
 
     # Departments for dashboard listing
-    departments = Department.query.order_by(Department.name.asc()).all()
+    departments = refdata.departments()
 
-    return render_template(
+    response = make_response(render_template(
         "patient/dashboard.html",
         upcoming_appointments=upcoming_appointments,
         past_appointments=past_appointments,
         departments=departments,
         patient_name=session.get("patient_name"),
-    )
+    ))
+    return conditional.tag(response, tag)
 
 
 # ---------- Search doctors (name/specialization/department) ----------
@@ -83,16 +65,18 @@ def list_doctors():
     dept_id = request.args.get("department_id", "").strip()
     q = request.args.get("q", "").strip()
 
-    doctors_query = Doctor.query.filter(Doctor.status == StatusEnum.active)
+    doctors_query = queries.active_doctors()
 
     if dept_id:
         doctors_query = doctors_query.filter(Doctor.department_id == int(dept_id))
+    keys = (Doctor.name, Doctor.id)
     if q:
-        like = f"%{q}%"
-        doctors_query = doctors_query.filter(Doctor.name.ilike(like))
+        doctors_query, keys = search.search_doctors(
+            doctors_query, q, fields=("name", "department", "bio")
+        )
 
-    doctors = doctors_query.order_by(Doctor.name.asc()).all()
-    departments = Department.query.order_by(Department.name.asc()).all()
+    doctors = paginate_request(doctors_query, keys)
+    departments = refdata.departments()
 
     return render_template(
         "patient/doctors.html",
@@ -108,7 +92,7 @@ def list_doctors():
 @patient_bp.route("/book-appointment", methods=["GET", "POST"])
 def book_appointment():
     patient = Patient.query.get(session.get("user_id"))
-    doctors = Doctor.query.filter(Doctor.status == StatusEnum.active).all()
+    doctors = refdata.active_doctors()
 
     if request.method == "POST":
         doctor_id = request.form.get("doctor_id")
@@ -141,34 +125,19 @@ def book_appointment():
                 patient=patient,
             )
 
-        # default duration: 50 minutes
-        from datetime import timedelta as _td
-        appointment_end = appointment_start + _td(minutes=50)
-
-        # Check for doctor double-booking
-        conflict = Appointment.query.filter_by(
-            doctor_id=int(doctor_id),
-            appointment_start=appointment_start,
-        ).first()
-        if conflict:
-            flash("The doctor already has an appointment at this time.", "danger")
+        # Overlap check + insert in one write transaction (app.booking)
+        try:
+            booking.book_appointment(
+                patient.id, int(doctor_id), appointment_start, reason
+            )
+        except booking.BookingConflict as exc:
+            flash(str(exc), "danger")
             return render_template(
                 "admin/book_appointment.html",
                 doctors=doctors,
                 patient=patient,
             )
 
-        new_appointment = Appointment(
-            patient_id=patient.id,
-            doctor_id=int(doctor_id),
-            appointment_start=appointment_start,
-            appointment_end=appointment_end,
-            reason=reason,
-            status=StatusEnum.booked,
-        )
-
-        db.session.add(new_appointment)
-        db.session.commit()
         flash("Appointment booked successfully.", "success")
         return redirect(url_for("patient.dashboard"))
 
@@ -194,12 +163,9 @@ def profile():
             flash("Name, email and phone are required.", "warning")
             return render_template("patient/profile.html", patient=patient)
 
-        # email uniqueness check
-        existing = Patient.query.filter(
-            Patient.email == email, Patient.id != patient.id
-        ).first()
-        if existing:
-            flash("Another patient with that email already exists.", "danger")
+        # email uniqueness check (across all account types)
+        if identity.email_taken(email, exclude=patient):
+            flash("Another account with that email already exists.", "danger")
             return render_template("patient/profile.html", patient=patient)
 
         patient.name = name
@@ -227,13 +193,18 @@ def profile():
 def treatments():
     patient_id = session.get("user_id")
 
-    # Treatments are linked via Appointment -> Patient
-    treatments = (
-        Treatment.query
-        .join(Appointment)
-        .filter(Appointment.patient_id == patient_id)
-        .order_by(Treatment.treatment_date.desc())
-        .all()
-    )
+    tag = _page_etag(patient_id, datetime.utcnow())
+    unchanged = conditional.not_modified(tag)
+    if unchanged is not None:
+        return unchanged
+
+    treatments = queries.patient_treatment_history(patient_id)
+
+    response = make_response(render_template("patient/treatments.html", treatments=treatments))
+    return conditional.tag(response, tag)
+
 
-    return render_template("patient/treatments.html", treatments=treatments)
+@patient_bp.route("/treatments/export")
+def export_treatments():
+    stmts = exports.patient_history(session.get("user_id"))
+    return exports.response(stmts, "my-history")
@@ -0,0 +1,98 @@
+import re
+
+from sqlalchemy import inspect, literal_column, or_
+from sqlalchemy.sql import column, table
+
+from app.database import db
+from app.models import Department, Doctor, Patient
+
+
+# FTS5 tables created by migration 0002 (SQLite only)
+patient_fts = table("patient_fts", column("rowid"), column("rank"))
+doctor_fts = table("doctor_fts", column("rowid"), column("rank"))
+
+_fts_ready = set()
+
+
+def fts_available():
+    """True when the bound database has the FTS5 search tables."""
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fts_ready:
+        # Only a yes is remembered: `flask init` or `flask upgrade-db` may
+        # create the tables while this process is running.
+        if engine.dialect.name != "sqlite" or not inspect(engine).has_table("patient_fts"):
+            return False
+        _fts_ready.add(key)
+    return True
+
+
+def match_expression(term):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    'jo smi' -> '"jo"* "smi"*'
+    """
+    tokens = re.findall(r"\w+", term.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _fts_filter(fts, match):
+    return literal_column(fts.name).op("MATCH")(match)
+
+
+# ---------- Patients ----------
+
+def search_patients(term):
+    """
+    Patients matching name/email/phone.
+    Returns ``(query, sort_keys)``; results rank best match first.
+    """
+    match = match_expression(term)
+    if match and fts_available():
+        query = (
+            Patient.query
+            .join(patient_fts, patient_fts.c.rowid == Patient.id)
+            .filter(_fts_filter(patient_fts, match))
+        )
+        return query, (patient_fts.c.rank, Patient.id)
+
+    like = f"%{term}%"
+    query = Patient.query.filter(
+        (Patient.name.ilike(like))
+        | (Patient.email.ilike(like))
+        | (Patient.phone.ilike(like))
+    )
+    return query, (Patient.name, Patient.id)
+
+
+# ---------- Doctors ----------
+
+def search_doctors(query, term, fields=("name", "email", "phone", "department", "bio")):
+    """
+    Narrow an existing Doctor query to rows matching ``term``.
+    ``fields`` limits which indexed columns are searched.
+    Returns ``(query, sort_keys)`` like search_patients.
+    """
+    match = match_expression(term)
+    if match and fts_available():
+        if len(fields) < 5:
+            match = "{" + " ".join(fields) + "} : (" + match + ")"
+        query = (
+            query
+            .join(doctor_fts, doctor_fts.c.rowid == Doctor.id)
+            .filter(_fts_filter(doctor_fts, match))
+        )
+        return query, (doctor_fts.c.rank, Doctor.id)
+
+    like = f"%{term}%"
+    columns = {
+        "name": Doctor.name,
+        "email": Doctor.email,
+        "phone": Doctor.phone,
+        "bio": Doctor.bio,
+        "department": Department.name,
+    }
+    if "department" in fields:
+        query = query.outerjoin(Department, Department.id == Doctor.department_id)
+    query = query.filter(or_(*(columns[field].ilike(like) for field in fields)))
+    return query, (Doctor.name, Doctor.id)
@@ -0,0 +1,263 @@
+"""
+Materialized booking slots.
+
+Weekly DoctorSchedule blocks minus DoctorTimeOff windows are expanded into
+TimeSlot rows for a rolling horizon (SLOT_HORIZON_DAYS). Changes to a
+schedule or time-off only regenerate the affected doctor/days, and booking
+claims a slot with one conditional UPDATE.
+
+Weekdays follow ``date.weekday()``: Monday is 0, Sunday is 6.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert, inspect, select, update
+
+from app.database import db, keep_old_value, setting
+from app.models import Doctor, DoctorSchedule, DoctorTimeOff, TimeSlot
+
+
+DEFAULT_SLOT_MINUTES = 50
+DEFAULT_HORIZON_DAYS = 7
+
+
+def slot_minutes():
+    return setting("SLOT_MINUTES", DEFAULT_SLOT_MINUTES)
+
+
+def horizon_days():
+    return setting("SLOT_HORIZON_DAYS", DEFAULT_HORIZON_DAYS)
+
+
+def horizon(today=None):
+    today = today or datetime.utcnow().date()
+    return [today + timedelta(days=i) for i in range(horizon_days())]
+
+
+# ---------- Expansion ----------
+
+def expand_day(day, schedules, time_offs, minutes=None):
+    """
+    (start, end) pairs for one doctor on ``day``.
+    ``schedules``/``time_offs`` are that doctor's rows; other days are ignored.
+    """
+    length = timedelta(minutes=minutes or slot_minutes())
+
+    blocked = []
+    for off in time_offs:
+        if off.date != day:
+            continue
+        if off.start_time is None or off.end_time is None:
+            return []  # whole day off
+        blocked.append((
+            datetime.combine(day, off.start_time),
+            datetime.combine(day, off.end_time),
+        ))
+
+    slots = []
+    for block in schedules:
+        if block.weekday != day.weekday():
+            continue
+        start = datetime.combine(day, block.start_time)
+        block_end = datetime.combine(day, block.end_time)
+        taken = 0
+        while start + length <= block_end:
+            if block.max_patients is not None and taken >= block.max_patients:
+                break
+            end = start + length
+            if not any(start < off_end and off_start < end for off_start, off_end in blocked):
+                slots.append((start, end))
+                taken += 1
+            start = end
+
+    return sorted(set(slots))
+
+
+# ---------- Regeneration ----------
+
+def regenerate(doctor_id, days):
+    """
+    Bring the free slots of ``doctor_id`` on ``days`` in line with the
+    schedule. Claimed slots are never touched. Runs in the caller's
+    transaction; returns (inserted, deleted).
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0, 0
+
+    schedules = DoctorSchedule.query.filter_by(doctor_id=doctor_id).all()
+    time_offs = (
+        DoctorTimeOff.query
+        .filter(
+            DoctorTimeOff.doctor_id == doctor_id,
+            DoctorTimeOff.date >= days[0],
+            DoctorTimeOff.date <= days[-1],
+        )
+        .all()
+    )
+
+    window_start = datetime.combine(days[0], datetime.min.time())
+    window_end = datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+    existing = {
+        row.start: row
+        for row in db.session.query(TimeSlot.id, TimeSlot.start, TimeSlot.appointment_id)
+        .filter(
+            TimeSlot.doctor_id == doctor_id,
+            TimeSlot.start >= window_start,
+            TimeSlot.start < window_end,
+        )
+    }
+
+    now = datetime.utcnow()
+    wanted = {}
+    for day in days:
+        wanted.update(
+            (start, end) for start, end in expand_day(day, schedules, time_offs)
+            if start > now
+        )
+
+    stale = [
+        row.id for start, row in existing.items()
+        if start.date() in days and start not in wanted and row.appointment_id is None
+    ]
+    fresh = [
+        {"doctor_id": doctor_id, "start": start, "end": end}
+        for start, end in sorted(wanted.items())
+        if start not in existing
+    ]
+
+    if stale:
+        db.session.execute(delete(TimeSlot).where(TimeSlot.id.in_(stale)))
+    if fresh:
+        db.session.execute(insert(TimeSlot), fresh)
+    return len(fresh), len(stale)
+
+
+def extend_horizon(today=None):
+    """
+    Roll the horizon forward for every doctor and drop past free slots.
+    Workers run it daily as the ``slots.extend_horizon`` job; ``flask
+    generate-slots`` does the same by hand.
+    """
+    days = horizon(today)
+    inserted = 0
+    doctor_ids = [row.id for row in db.session.query(Doctor.id)]
+    for doctor_id in doctor_ids:
+        inserted += regenerate(doctor_id, days)[0]
+
+    purged = db.session.execute(
+        delete(TimeSlot).where(
+            TimeSlot.start < datetime.combine(days[0], datetime.min.time()),
+            TimeSlot.appointment_id.is_(None),
+        )
+    ).rowcount
+    db.session.commit()
+    return inserted, purged
+
+
+# ---------- Booking ----------
+
+def doctor_uses_slots(doctor_id):
+    """Doctors with a weekly schedule can only be booked into their slots."""
+    return db.session.query(
+        DoctorSchedule.query.filter_by(doctor_id=doctor_id).exists()
+    ).scalar()
+
+
+def slot_end(doctor_id, start):
+    """End of the free slot starting at ``start``, or None if there is none."""
+    return db.session.execute(
+        select(TimeSlot.end).where(
+            TimeSlot.doctor_id == doctor_id,
+            TimeSlot.start == start,
+            TimeSlot.appointment_id.is_(None),
+        )
+    ).scalar()
+
+
+def claim_slot(doctor_id, start, appointment_id):
+    """Atomically take the free slot starting at ``start``. False if it is gone."""
+    result = db.session.execute(
+        update(TimeSlot)
+        .where(
+            TimeSlot.doctor_id == doctor_id,
+            TimeSlot.start == start,
+            TimeSlot.appointment_id.is_(None),
+        )
+        .values(appointment_id=appointment_id)
+    )
+    return result.rowcount == 1
+
+
+def release_slot(appointment_id):
+    db.session.execute(
+        update(TimeSlot)
+        .where(TimeSlot.appointment_id == appointment_id)
+        .values(appointment_id=None)
+    )
+
+
+def free_slots(doctor_id, day):
+    return (
+        TimeSlot.query
+        .filter(
+            TimeSlot.doctor_id == doctor_id,
+            TimeSlot.start >= datetime.combine(day, datetime.min.time()),
+            TimeSlot.start < datetime.combine(day + timedelta(days=1), datetime.min.time()),
+            TimeSlot.appointment_id.is_(None),
+        )
+        .order_by(TimeSlot.start.asc())
+        .all()
+    )
+
+
+# ---------- Incremental sync on schedule / time-off changes ----------
+
+def _history_values(target, key):
+    history = inspect(target).attrs[key].history
+    values = set(history.added) | set(history.deleted) | set(history.unchanged)
+    values.add(getattr(target, key))
+    return {value for value in values if value is not None}
+
+
+def _affected_days(target):
+    days = set(horizon())
+    if isinstance(target, DoctorSchedule):
+        weekdays = _history_values(target, "weekday")
+        return {day for day in days if day.weekday() in weekdays}
+    return days & _history_values(target, "date")
+
+
+def _mark_changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is None:
+        return
+    pending = session.info.setdefault("slot_changes", {})
+    for doctor_id in _history_values(target, "doctor_id"):
+        pending.setdefault(doctor_id, set()).update(_affected_days(target))
+
+
+for _model in (DoctorSchedule, DoctorTimeOff):
+    for _name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _name, _mark_changed)
+
+# Load the previous value on assignment so a moved block also clears the
+# day it moved away from.
+for _attr in (
+    DoctorSchedule.doctor_id,
+    DoctorSchedule.weekday,
+    DoctorTimeOff.doctor_id,
+    DoctorTimeOff.date,
+):
+    event.listen(_attr, "set", keep_old_value, active_history=True)
+
+
+@event.listens_for(db.session, "before_commit")
+def _regenerate_changed(session):
+    # before_commit runs ahead of the final flush; flush so the mapper
+    # events above have seen every pending change.
+    session.flush()
+    pending = session.info.pop("slot_changes", None)
+    if not pending:
+        return
+    for doctor_id, days in pending.items():
+        regenerate(doctor_id, days)
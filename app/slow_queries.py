@@ -0,0 +1,194 @@
+"""
+Slow-query log.
+
+Every statement slower than SLOW_QUERY_MS is written as one JSON line to
+a rotating file (SLOW_QUERY_LOG, default ``instance/slow_queries.jsonl``)
+with its normalized SQL and fingerprint, the shape of its parameters, the
+route or CLI command that issued it and, the first time a fingerprint is
+seen in this process, its query plan (``EXPLAIN QUERY PLAN`` on SQLite,
+``EXPLAIN`` elsewhere). /admin/slow-queries aggregates the file by
+fingerprint.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+
+from app.database import db
+from app.queries import full_scans
+
+
+logger = logging.getLogger("hms.slow_queries")
+
+_explained = set()
+_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\?|%\(\w+\)s|%s|:\w+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement):
+    """SQL with literals and placeholders as ``?`` and IN lists collapsed."""
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def parameter_shape(parameters, executemany):
+    """Types of the bound parameters, never their values."""
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "each": parameter_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in (parameters or ())]
+
+
+def _origin():
+    if has_request_context():
+        return {
+            "endpoint": request.endpoint or "unmatched",
+            "blueprint": request.blueprint,
+            "method": request.method,
+        }
+    return {"endpoint": "cli", "blueprint": None, "method": None}
+
+
+def _explain(conn, statement, parameters):
+    # Straight on the DBAPI cursor so it does not re-enter these events
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception as exc:  # the plan is a nice-to-have; never fail the query
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        cursor.close()
+
+
+# ---------- Engine events ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._slow_started) * 1000
+    threshold = current_app.config.get("SLOW_QUERY_MS")
+    if threshold is None or elapsed_ms < threshold:
+        return
+
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    entry = {
+        "at": datetime.utcnow().isoformat(timespec="seconds"),
+        "ms": round(elapsed_ms, 2),
+        "fingerprint": key,
+        "sql": normalized,
+        "params": parameter_shape(parameters, executemany),
+        **_origin(),
+    }
+
+    with _lock:
+        first = key not in _explained
+        _explained.add(key)
+    if first and not executemany and current_app.config.get("SLOW_QUERY_EXPLAIN", True) \
+            and normalized.upper().startswith(("SELECT", "WITH")):
+        entry["plan"] = _explain(conn, statement, parameters)
+
+    logger.warning(json.dumps(entry, default=str))
+
+
+# ---------- Reading the log ----------
+
+def log_path(app=None):
+    app = app or current_app
+    return app.config.get("SLOW_QUERY_LOG") or os.path.join(app.instance_path, "slow_queries.jsonl")
+
+
+def read_entries(path=None):
+    """Entries from the log and its rotated backups, oldest file first."""
+    path = path or log_path()
+    backups = current_app.config.get("SLOW_QUERY_LOG_BACKUPS", 3)
+    for name in [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def aggregate(entries):
+    """One row per fingerprint, slowest total time first."""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry["fingerprint"])
+        if group is None:
+            group = groups[entry["fingerprint"]] = {
+                "fingerprint": entry["fingerprint"],
+                "sql": entry["sql"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "endpoints": {},
+                "plan": None,
+                "last_seen": None,
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["ms"]
+        group["max_ms"] = max(group["max_ms"], entry["ms"])
+        group["endpoints"][entry["endpoint"]] = group["endpoints"].get(entry["endpoint"], 0) + 1
+        group["last_seen"] = entry["at"]
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+
+    rows = sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)
+    for group in rows:
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 2)
+        group["total_ms"] = round(group["total_ms"], 2)
+        group["scans"] = full_scans(group["plan"] or [])
+    return rows
+
+
+def init_app(app):
+    if app.config.get("SLOW_QUERY_MS") is None:
+        return
+    path = log_path(app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not any(getattr(handler, "baseFilename", None) == os.path.abspath(path) for handler in logger.handlers):
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=app.config.get("SLOW_QUERY_LOG_BYTES", 5 * 1024 * 1024),
+            backupCount=app.config.get("SLOW_QUERY_LOG_BACKUPS", 3),
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,81 @@
+"""
+Built-in background tasks. Each one is safe to run again after a crash.
+"""
+import os
+from datetime import datetime
+
+from flask import current_app
+
+from app import bulk_import, counters, exports, slots
+from app import archive, reminders  # noqa: F401  (register their own periodic tasks)
+from app.database import db
+from app.jobs import task
+
+
+def export_dir():
+    path = current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def import_dir():
+    path = os.path.join(current_app.instance_path, "imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# Daily, at the start of each UTC day, so the horizon keeps moving with
+# nothing but a running worker
+@task("slots.extend_horizon", timeout=1800, every=24 * 3600)
+def extend_slot_horizon():
+    inserted, purged = slots.extend_horizon()
+    return {"inserted": inserted, "purged": purged}
+
+
+@task("counters.reconcile", timeout=600)
+def reconcile_counters():
+    drift = counters.reconcile()
+    db.session.commit()
+    return {name: list(values) for name, values in drift.items()}
+
+
+@task("exports.appointments", timeout=3600, max_attempts=3)
+def export_appointments(name, fmt="csv", compress=True, department_id=None, doctor_id=None, start=None, end=None):
+    """Write the appointment log to EXPORT_DIR/<name> and return the file name."""
+    stmts = exports.appointment_log(
+        department_id,
+        doctor_id,
+        start and datetime.fromisoformat(start),
+        end and datetime.fromisoformat(end),
+    )
+
+    path = os.path.join(export_dir(), name)
+    partial = path + ".part"
+    written = 0
+    with open(partial, "wb") as fh:
+        for chunk in exports.stream(stmts, fmt, compress):
+            fh.write(chunk)
+            written += len(chunk)
+    # a retried job simply replaces the file; readers never see half of one
+    os.replace(partial, path)
+    return {"file": name, "bytes": written}
+
+
+@task("imports.run", timeout=3600, max_attempts=3)
+def run_import(kind, name):
+    """Import the uploaded file import_dir()/<name>, then delete it."""
+    path = os.path.join(import_dir(), name)
+    if not os.path.exists(path):
+        # an earlier attempt finished and removed it
+        return {"kind": kind, "already_done": True}
+    # Rows that went in before a crash are skipped as duplicates on retry
+    with open(path, newline="", encoding="utf-8") as stream:
+        report = bulk_import.import_stream(
+            kind,
+            stream,
+            bulk_import.detect_format(name),
+            error_path=path + ".errors.jsonl",
+            workers=0,
+        )
+    os.remove(path)
+    return report.as_dict()
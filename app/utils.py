@@ -1,11 +1,13 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+from app import passwords
+
 def hash_password(password):
-    return generate_password_hash(password)
+    # Runs on the bounded hashing pool (see app/passwords.py)
+    return passwords.hash_password(password)
 
 def verify_password(hashed_password, password):
-    return check_password_hash(hashed_password, password)
+    return passwords.verify_password(hashed_password, password)
 
 def format_datetime(value, format='%Y-%m-%d %H:%M'):
     """
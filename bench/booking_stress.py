@@ -0,0 +1,116 @@
+"""
+Concurrent booking stress run.
+
+Many threads book random 10-minute-aligned start times for a handful of
+doctors inside a narrow window, so most requests overlap each other.
+Reports bookings/sec and fails if any two booked appointments of the same
+doctor overlap.
+
+    python bench/booking_stress.py --threads 16 --attempts 200
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from common import create_bench_app, temp_database_uri, write_results  # puts the repo root on sys.path
+
+from app.booking import BookingConflict, book_appointment
+from app.database import db
+from app.models import Department, Doctor, Patient
+
+
+def seed(doctors, patients):
+    dept = Department(name="Bench")
+    db.session.add(dept)
+    db.session.flush()
+    for i in range(doctors):
+        db.session.add(Doctor(name=f"Doctor {i}", email=f"doc{i}@bench", password_hash="x", department_id=dept.id))
+    for i in range(patients):
+        db.session.add(Patient(name=f"Patient {i}", email=f"pat{i}@bench", password_hash="x"))
+    db.session.commit()
+    return [d.id for d in Doctor.query], [p.id for p in Patient.query]
+
+
+def worker(app, doctor_ids, patient_ids, attempts, base, stats, lock):
+    rng = random.Random()
+    booked = conflicts = errors = 0
+    with app.app_context():
+        for _ in range(attempts):
+            start = base + timedelta(minutes=10 * rng.randrange(0, 6 * 8))
+            try:
+                book_appointment(rng.choice(patient_ids), rng.choice(doctor_ids), start, "stress")
+                booked += 1
+            except BookingConflict:
+                conflicts += 1
+            except Exception:
+                errors += 1
+        db.session.remove()
+    with lock:
+        stats["booked"] += booked
+        stats["conflicts"] += conflicts
+        stats["errors"] += errors
+
+
+def overlaps():
+    return db.session.execute(text(
+        "SELECT COUNT(*) FROM appointment a JOIN appointment b"
+        " ON a.doctor_id = b.doctor_id AND a.id < b.id"
+        " AND a.status = 'booked' AND b.status = 'booked'"
+        " AND a.appointment_start < b.appointment_end"
+        " AND b.appointment_start < a.appointment_end"
+    )).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="bookings tried per thread")
+    parser.add_argument("--doctors", type=int, default=4)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    app = create_bench_app({"SQLALCHEMY_DATABASE_URI": temp_database_uri()})
+
+    with app.app_context():
+        doctor_ids, patient_ids = seed(args.doctors, args.patients)
+
+    base = datetime.utcnow().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    stats = {"booked": 0, "conflicts": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(app, doctor_ids, patient_ids, args.attempts, base, stats, lock))
+        for _ in range(args.threads)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        stats["overlapping_pairs"] = overlaps()
+
+    total = args.threads * args.attempts
+    stats.update({
+        "threads": args.threads,
+        "attempts": total,
+        "seconds": round(elapsed, 3),
+        "attempts_per_sec": round(total / elapsed, 1),
+        "bookings_per_sec": round(stats["booked"] / elapsed, 1),
+    })
+    write_results(stats, args.json)
+
+    if stats["overlapping_pairs"] or stats["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Importing this module puts the repository root on ``sys.path`` so the
+scripts can be run directly (``python bench/<script>.py``).
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    """``pct`` percentile of ``values`` (seconds) in milliseconds."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+def latency_summary(latencies):
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def create_bench_app(config=None):
+    """create_app() with the database initialised, as ``flask init`` would."""
+    from app import create_app
+    from app.cli import init_database
+
+    app = create_app(config)
+    with app.app_context():
+        init_database()
+    return app
+
+
+def sqlite_uri(path):
+    return "sqlite:///" + os.path.abspath(path)
+
+
+def temp_database_uri(prefix="hms-bench-"):
+    return sqlite_uri(os.path.join(tempfile.mkdtemp(prefix=prefix), "bench.db"))
+
+
+def session_cookie(app, user_id, role):
+    """A signed Flask session cookie value for a logged-in ``role``."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return serializer.dumps({"user_id": user_id, "user_role": role, "last_seen": int(time.time())})
+
+
+def write_results(results, path=None):
+    print(json.dumps(results, indent=2))
+    if path:
+        with open(path, "w") as fh:
+            json.dump(results, fh, indent=2)
@@ -0,0 +1,153 @@
+"""
+Mixed read/write throughput with and without the SQLite engine profile.
+
+Reader threads load the patient dashboard while writer threads book
+appointments, first against a database opened with SQLite defaults and
+then against one using the WAL/pragma profile from app.dbconfig. Reports
+operations/sec, reader latency percentiles and errors for both runs.
+
+    python bench/db_profile_bench.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app, percentile, temp_database_uri, write_results  # puts the repo root on sys.path
+
+from app.booking import BookingConflict, book_appointment
+from app.database import db
+from app.models import Appointment, Department, Doctor, Patient, StatusEnum
+
+
+def seed(doctors, patients, history):
+    dept = Department(name="Bench")
+    db.session.add(dept)
+    db.session.flush()
+    db.session.add_all(
+        Doctor(name=f"Doctor {i}", email=f"doc{i}@bench", password_hash="x", department_id=dept.id)
+        for i in range(doctors)
+    )
+    db.session.add_all(
+        Patient(name=f"Patient {i}", email=f"pat{i}@bench", password_hash="x")
+        for i in range(patients)
+    )
+    db.session.flush()
+    doctor_ids = [d.id for d in Doctor.query]
+    patient_ids = [p.id for p in Patient.query]
+
+    start = datetime.utcnow() - timedelta(days=365)
+    db.session.add_all(
+        Appointment(
+            patient_id=random.choice(patient_ids),
+            doctor_id=doctor_ids[i % len(doctor_ids)],
+            appointment_start=start + timedelta(hours=i),
+            appointment_end=start + timedelta(hours=i, minutes=50),
+            status=StatusEnum.completed,
+        )
+        for i in range(history)
+    )
+    db.session.commit()
+    return doctor_ids, patient_ids
+
+
+def reader(app, stop, patient_ids, latencies, stats, lock):
+    client = app.test_client()
+    reads = errors = 0
+    while not stop.is_set():
+        with client.session_transaction() as session:
+            session["user_id"] = random.choice(patient_ids)
+            session["user_role"] = "patient"
+        started = time.perf_counter()
+        response = client.get("/patient/dashboard")
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 200:
+            reads += 1
+        else:
+            errors += 1
+    with lock:
+        stats["reads"] += reads
+        stats["errors"] += errors
+
+
+def writer(app, stop, doctor_ids, patient_ids, stats, lock):
+    rng = random.Random()
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    writes = errors = 0
+    with app.app_context():
+        while not stop.is_set():
+            start = base + timedelta(minutes=10 * rng.randrange(0, 6 * 24 * 30))
+            try:
+                book_appointment(rng.choice(patient_ids), rng.choice(doctor_ids), start, "bench")
+                writes += 1
+            except BookingConflict:
+                writes += 1
+            except Exception:
+                errors += 1
+        db.session.remove()
+    with lock:
+        stats["writes"] += writes
+        stats["errors"] += errors
+
+
+def run(tuned, args):
+    config = {"SQLALCHEMY_DATABASE_URI": temp_database_uri(), "DB_TUNING": tuned}
+    if not tuned:
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = {}
+    app = create_bench_app(config)
+    app.config["TESTING"] = True
+
+    with app.app_context():
+        doctor_ids, patient_ids = seed(args.doctors, args.patients, args.history)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    threads = [
+        threading.Thread(target=reader, args=(app, stop, patient_ids, latencies, stats, lock))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=writer, args=(app, stop, doctor_ids, patient_ids, stats, lock))
+        for _ in range(args.writers)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats.update({
+        "profile": "tuned" if tuned else "sqlite defaults",
+        "seconds": round(elapsed, 2),
+        "reads_per_sec": round(stats["reads"] / elapsed, 1),
+        "writes_per_sec": round(stats["writes"] / elapsed, 1),
+        "read_p50_ms": percentile(latencies, 50),
+        "read_p95_ms": percentile(latencies, 95),
+        "read_p99_ms": percentile(latencies, 99),
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--history", type=int, default=20000, help="past appointments to seed")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {"baseline": run(False, args), "tuned": run(True, args)}
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Synthetic hospital data generator.
+
+Builds a fresh database with departments, doctors with weekly schedules,
+patients, appointments with a realistic status mix and treatments for
+completed visits. Rows go in with chunked Core executemany inserts inside
+one transaction per chunk; ORM events are bypassed, so the login
+directory is written directly and the counters are reconciled at the end.
+
+    python bench/generate_data.py --db /tmp/hms-1m.db                  # 1M patients, 10M appointments
+    python bench/generate_data.py --db /tmp/hms-small.db --scale 0.001
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, time as clock, timedelta
+
+from sqlalchemy import text
+
+from common import create_bench_app, sqlite_uri, write_results  # puts the repo root on sys.path
+
+from app import counters, slots
+from app.bulk_import import chunked
+from app.database import db
+from app.models import (
+    Appointment,
+    Department,
+    Doctor,
+    DoctorSchedule,
+    Patient,
+    StatusEnum,
+    Treatment,
+    UserIdentity,
+    UserRole,
+)
+from app.utils import hash_password
+
+
+DEPARTMENTS = [
+    "Cardiology", "Dermatology", "Endocrinology", "Gastroenterology", "General Medicine",
+    "Gynecology", "Hematology", "Nephrology", "Neurology", "Oncology", "Ophthalmology",
+    "Orthopedics", "Pediatrics", "Psychiatry", "Pulmonology", "Radiology", "Rheumatology",
+    "Surgery", "Urology", "ENT",
+]
+FIRST = ["Aarav", "Maya", "Liam", "Zara", "Noah", "Ava", "Ravi", "Sofia", "Omar", "Lena",
+         "Kenji", "Priya", "Ethan", "Nora", "Mateo", "Isla", "Arjun", "Chloe", "Yusuf", "Mila"]
+LAST = ["Sharma", "Smith", "Garcia", "Chen", "Okafor", "Müller", "Rossi", "Khan", "Silva",
+        "Novak", "Tanaka", "Patel", "Brown", "Haddad", "Kowalski", "Nguyen", "Ivanova", "Berg"]
+DIAGNOSES = ["Hypertension", "Type 2 diabetes", "Migraine", "Seasonal allergy", "Back pain",
+             "Upper respiratory infection", "Anxiety", "Eczema", "Asthma", "Gastritis"]
+PRESCRIPTIONS = ["Rest and fluids", "Ibuprofen 400mg", "Metformin 500mg", "Cetirizine 10mg",
+                 "Physiotherapy", "Amlodipine 5mg", "Salbutamol inhaler", "Omeprazole 20mg"]
+REASONS = ["Checkup", "Follow-up", "Consultation", "Test results", "New symptoms", None]
+
+# (weekday, start, end) blocks every doctor works; appointments are laid out on them
+WEEK = [(day, clock(9), clock(13)) for day in range(5)] + [(day, clock(14), clock(17)) for day in range(5)]
+SLOTS_PER_DAY = 7  # hourly visits inside the blocks above
+SLOT_HOURS = [9, 10, 11, 12, 14, 15, 16]
+
+
+def insert_chunks(table, rows, chunk_size):
+    """Insert the ``rows`` generator in chunks; returns the row count."""
+    total = 0
+    for chunk in chunked(rows, chunk_size):
+        with db.engine.begin() as conn:
+            conn.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
+
+
+def pick_status(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+# ---------- Row generators ----------
+
+def doctor_rows(rng, count, departments, password_hash):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}",
+            "email": f"doctor{i}@bench.test",
+            "password_hash": password_hash,
+            "phone": f"+1555{i:07d}",
+            "department_id": rng.randint(1, departments),
+            "bio": f"{rng.randint(2, 30)} years in practice.",
+            "years_of_experience": rng.randint(2, 30),
+            "status": pick_status(rng, {StatusEnum.active: 95, StatusEnum.inactive: 5}),
+            "role": UserRole.doctor,
+            "created_at": datetime.utcnow(),
+        }
+
+
+def schedule_rows(doctors):
+    for doctor_id in range(1, doctors + 1):
+        for weekday, start, end in WEEK:
+            yield {"doctor_id": doctor_id, "weekday": weekday, "start_time": start, "end_time": end}
+
+
+def patient_rows(rng, count, password_hash):
+    genders = ["female", "male", "other"]
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+            "email": f"patient{i}@bench.test",
+            "password_hash": password_hash,
+            "age": rng.randint(1, 95),
+            "gender": rng.choice(genders),
+            "phone": f"+1444{i:07d}",
+            "address": f"{rng.randint(1, 999)} Main Street",
+            "status": pick_status(
+                rng, {StatusEnum.active: 97, StatusEnum.inactive: 2, StatusEnum.blacklisted: 1}
+            ),
+            "role": UserRole.patient,
+            "created_at": datetime.utcnow(),
+        }
+
+
+def first_visit_week(count, doctors, future_share):
+    """Monday of the first visit week, so ``future_share`` of the visits are upcoming."""
+    per_doctor_days = max(1, -(-count // doctors) // SLOTS_PER_DAY)
+    # weekdays only: 5 working days per 7 calendar days
+    calendar_days = per_doctor_days * 7 // 5 + 1
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    first = today - timedelta(days=int(calendar_days * (1 - future_share)))
+    return first - timedelta(days=first.weekday())
+
+
+def visit_start(first_monday, index):
+    """Start of the ``index``-th visit of a doctor, weekdays only."""
+    day, slot = divmod(index, SLOTS_PER_DAY)
+    weeks, weekday = divmod(day, 5)
+    return first_monday + timedelta(days=weeks * 7 + weekday, hours=SLOT_HOURS[slot])
+
+
+def appointment_rows(rng, count, doctors, patients, first_monday):
+    """Yield ``(appointment, treatment_or_None)``; completed visits get a treatment."""
+    now = datetime.utcnow()
+    past = {StatusEnum.completed: 85, StatusEnum.cancelled: 12, StatusEnum.booked: 3}
+    upcoming = {StatusEnum.booked: 92, StatusEnum.cancelled: 8}
+    for i in range(count):
+        start = visit_start(first_monday, i // doctors)
+        end = start + timedelta(minutes=50)
+        status = pick_status(rng, past if start < now else upcoming)
+        appointment = {
+            "id": i + 1,
+            "patient_id": rng.randint(1, patients),
+            "doctor_id": i % doctors + 1,
+            "appointment_start": start,
+            "appointment_end": end,
+            "status": status,
+            "reason": rng.choice(REASONS),
+            "created_at": start - timedelta(days=rng.randint(1, 30)),
+            "last_updated_at": start,
+        }
+        treatment = None
+        if status is StatusEnum.completed:
+            treatment = {
+                "appointment_id": i + 1,
+                "diagnosis": rng.choice(DIAGNOSES),
+                "prescription": rng.choice(PRESCRIPTIONS),
+                "notes": None,
+                "treatment_date": end,
+            }
+        yield appointment, treatment
+
+
+def insert_appointments(pairs, chunk_size):
+    """Insert appointments and their treatments chunk by chunk."""
+    appointments = treatments = 0
+    for chunk in chunked(pairs, chunk_size):
+        treatment_rows = [treatment for _, treatment in chunk if treatment]
+        with db.engine.begin() as conn:
+            conn.execute(Appointment.__table__.insert(), [appointment for appointment, _ in chunk])
+            if treatment_rows:
+                conn.execute(Treatment.__table__.insert(), treatment_rows)
+        appointments += len(chunk)
+        treatments += len(treatment_rows)
+    return appointments, treatments
+
+
+# ---------- Driver ----------
+
+def generate(app, doctors, patients, appointments, departments=len(DEPARTMENTS),
+             chunk_size=50000, seed=1, password="secret", future_share=0.1):
+    """Fill the (empty) database of ``app``; returns per-table timings."""
+    rng = random.Random(seed)
+    timings = {}
+
+    def step(name, func):
+        started = time.perf_counter()
+        rows = func()
+        timings[name] = {"rows": rows, "seconds": round(time.perf_counter() - started, 2)}
+
+    with app.app_context():
+        password_hash = hash_password(password)
+        departments = min(departments, len(DEPARTMENTS))
+
+        step("department", lambda: insert_chunks(
+            Department.__table__,
+            ({"id": i, "name": name, "description": f"{name} department", "doctors_count": 0}
+             for i, name in enumerate(DEPARTMENTS[:departments], start=1)),
+            chunk_size,
+        ))
+        step("doctor", lambda: insert_chunks(
+            Doctor.__table__, doctor_rows(rng, doctors, departments, password_hash), chunk_size
+        ))
+        step("doctor_schedule", lambda: insert_chunks(
+            DoctorSchedule.__table__, schedule_rows(doctors), chunk_size
+        ))
+        step("patient", lambda: insert_chunks(
+            Patient.__table__, patient_rows(rng, patients, password_hash), chunk_size
+        ))
+
+        def identities():
+            with db.engine.begin() as conn:
+                for role, table in ((UserRole.doctor, "doctor"), (UserRole.patient, "patient")):
+                    conn.execute(text(
+                        "INSERT INTO user_identity (email, role, user_id, status, password_hash) "
+                        f"SELECT LOWER(email), '{role.name}', id, status, password_hash FROM {table}"
+                    ))
+            return db.session.query(UserIdentity).count()
+        step("user_identity", identities)
+
+        first_monday = first_visit_week(appointments, doctors, future_share)
+        step("appointment+treatment", lambda: insert_appointments(
+            appointment_rows(rng, appointments, doctors, patients, first_monday), chunk_size
+        ))
+
+        def finish():
+            counters.reconcile()
+            db.session.commit()
+            inserted, _ = slots.extend_horizon()
+            if db.engine.dialect.name == "sqlite":
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql("ANALYZE")
+            return inserted
+        step("counters_slots_analyze", finish)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", required=True, help="SQLite file to create")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the default sizes")
+    parser.add_argument("--doctors", type=int, help="default 2000 x scale")
+    parser.add_argument("--patients", type=int, help="default 1,000,000 x scale")
+    parser.add_argument("--appointments", type=int, help="default 10,000,000 x scale")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="overwrite an existing file")
+    parser.add_argument("--json", help="write timings to this file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} exists; pass --force to overwrite it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    doctors = args.doctors or max(1, int(2000 * args.scale))
+    patients = args.patients or max(1, int(1_000_000 * args.scale))
+    appointments = args.appointments or int(10_000_000 * args.scale)
+
+    app = create_bench_app({"SQLALCHEMY_DATABASE_URI": sqlite_uri(args.db)})
+    started = time.perf_counter()
+    timings = generate(app, doctors, patients, appointments,
+                       chunk_size=args.chunk_size, seed=args.seed)
+    write_results({
+        "db": os.path.abspath(args.db),
+        "seconds": round(time.perf_counter() - started, 2),
+        "tables": timings,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Login throughput benchmark.
+
+Saturates /login from several threads and, at the same time, probes a
+page that has nothing to do with login (the patient dashboard, as a user
+who logged in once) from another thread. Reports logins/sec and the
+probe's p50/p95/p99 latency and status codes, next to a baseline taken
+with no login load.
+
+    python bench/login_bench.py --login-threads 8 --seconds 10
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from common import create_bench_app, percentile, temp_database_uri, write_results  # puts the repo root on sys.path
+
+from app.database import db
+from app.models import Patient
+from app.utils import hash_password
+
+
+PROBE_USER = "probe@bench"
+
+
+def probe(app, stop, latencies, statuses, url):
+    client = app.test_client()
+    client.post("/login", data={"username": PROBE_USER, "password": "secret"})
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+
+
+def login_loop(app, stop, counter, lock, users):
+    client = app.test_client()
+    i = 0
+    while not stop.is_set():
+        email = users[i % len(users)]
+        client.post("/login", data={"username": email, "password": "secret"})
+        client.get("/logout")
+        i += 1
+        with lock:
+            counter[0] += 1
+
+
+def run_phase(app, seconds, login_threads, users, url):
+    stop = threading.Event()
+    latencies, statuses, counter, lock = [], Counter(), [0], threading.Lock()
+    threads = [threading.Thread(target=probe, args=(app, stop, latencies, statuses, url))]
+    threads += [
+        threading.Thread(target=login_loop, args=(app, stop, counter, lock, users))
+        for _ in range(login_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "login_threads": login_threads,
+        "logins_per_sec": round(counter[0] / seconds, 1),
+        "probe_requests": len(latencies),
+        "probe_p50_ms": percentile(latencies, 50),
+        "probe_p95_ms": percentile(latencies, 95),
+        "probe_p99_ms": percentile(latencies, 99),
+        # anything but 200 means the probe was not measuring the page
+        "probe_statuses": dict(statuses),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--login-threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--pool", choices=("thread", "process"), help="PASSWORD_HASH_POOL")
+    parser.add_argument("--method", help="PASSWORD_METHOD, e.g. scrypt:16384:8:1")
+    parser.add_argument("--probe-url", default="/patient/dashboard", help="page probed as a logged-in patient")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    config = {"SQLALCHEMY_DATABASE_URI": temp_database_uri()}
+    if args.workers:
+        config["PASSWORD_HASH_WORKERS"] = args.workers
+    if args.pool:
+        config["PASSWORD_HASH_POOL"] = args.pool
+    if args.method:
+        config["PASSWORD_METHOD"] = args.method
+    app = create_bench_app(config)
+
+    with app.app_context():
+        password_hash = hash_password("secret")
+        users = [f"user{i}@bench" for i in range(args.users)]
+        db.session.add_all(
+            Patient(name=email, email=email, password_hash=password_hash) for email in [*users, PROBE_USER]
+        )
+        db.session.commit()
+
+    results = {
+        "config": {key: app.config[key] for key in ("PASSWORD_METHOD", "PASSWORD_HASH_POOL", "PASSWORD_HASH_WORKERS")},
+        "baseline": run_phase(app, args.seconds / 2, 0, users, args.probe_url),
+        "under_login_load": run_phase(app, args.seconds, args.login_threads, users, args.probe_url),
+    }
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Overhead of the request instrumentation (app.metrics).
+
+Runs the same endpoints against one generated database with metrics off,
+on, and on with Server-Timing headers, interleaving the configurations
+round by round so machine noise hits all of them equally. Reports
+latency percentiles per configuration and the overhead relative to "off".
+
+    python bench/metrics_overhead.py --rounds 5 --requests 100
+"""
+import argparse
+import os
+import tempfile
+
+from common import create_bench_app, session_cookie, sqlite_uri, write_results  # puts the repo root on sys.path
+
+from generate_data import generate
+from route_bench import TestClientDriver, bench_target, samples, targets
+
+
+CONFIGS = {
+    "off": {"METRICS_ENABLED": False},
+    "on": {"METRICS_ENABLED": True},
+    "on+server_timing": {"METRICS_ENABLED": True, "METRICS_SERVER_TIMING": True},
+}
+DEFAULT_ENDPOINTS = ("admin.dashboard", "doctor.dashboard", "patient.dashboard", "patient.treatments", "home.home")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint per round")
+    parser.add_argument("--endpoints", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    uri = sqlite_uri(os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "bench.db"))
+    apps = {name: create_bench_app({"SQLALCHEMY_DATABASE_URI": uri, **config}) for name, config in CONFIGS.items()}
+    first = apps["off"]
+    generate(first, doctors=20, patients=2000, appointments=20000)
+
+    with first.app_context():
+        ids = samples()
+    chosen = [t for t in targets(first, ids) if t[0] in args.endpoints]
+
+    latencies = {name: {endpoint: [] for endpoint, _, _ in chosen} for name in apps}
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            cookies = {
+                "admin": session_cookie(app, 1, "admin"),
+                "doctor": session_cookie(app, ids["doctor_id"], "doctor"),
+                "patient": session_cookie(app, ids["patient_id"], "patient"),
+            }
+            driver = TestClientDriver(app, cookies)
+            for endpoint, role, path in chosen:
+                result = bench_target(driver, role, path, args.requests, 1, warmup=3)
+                latencies[name][endpoint].append(result["p50_ms"])
+
+    results = {"rounds": args.rounds, "requests": args.requests, "p50_ms": {}, "overhead_pct": {}}
+    for name in apps:
+        results["p50_ms"][name] = {
+            endpoint: round(sorted(values)[len(values) // 2], 3) for endpoint, values in latencies[name].items()
+        }
+    for name in apps:
+        if name == "off":
+            continue
+        results["overhead_pct"][name] = {
+            endpoint: round((value / results["p50_ms"]["off"][endpoint] - 1) * 100, 1)
+            for endpoint, value in results["p50_ms"][name].items()
+        }
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Route-level benchmark.
+
+Drives every GET endpoint of the admin, doctor, patient, auth and API
+blueprints (plus a few search variants) with logged-in sessions, either
+through the Flask test client or over HTTP against a local threaded WSGI
+server. The API is driven with a session from POST /api/v1/session as
+the sample patient. Reports requests/sec, p50/p95/p99 latency and SQL
+statements per request for each endpoint.
+
+Endpoints that answered anything but 2xx/3xx are listed under ``failed``
+and make the run exit non-zero; their timings are not meaningful.
+
+    python bench/generate_data.py --db /tmp/hms.db --scale 0.01
+    python bench/route_bench.py --db /tmp/hms.db --requests 200 --json route-bench.json
+    python bench/route_bench.py --requests 50 --server --threads 4   # small generated dataset
+"""
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from flask import g, has_request_context
+from sqlalchemy import event
+
+from common import create_bench_app, latency_summary, session_cookie, sqlite_uri, write_results  # puts the repo root on sys.path
+
+from app import counters
+from app.database import db
+from app.models import Appointment, Department, Doctor, Patient, StatusEnum
+from generate_data import generate
+
+
+ROLES = {"admin": "admin", "doctor": "doctor", "patient": "patient", "api": "api"}
+SKIP = {"static", "auth.logout"}
+# Extra parameterised requests worth timing on their own
+VARIANTS = [
+    ("admin.search_doctors", {"query": "dr"}),
+    ("admin.search_patients", {"query": "smith"}),
+    ("admin.search_departments", {"query": "ology"}),
+    ("patient.list_doctors", {"q": "card"}),
+]
+# Query strings some endpoints cannot answer without
+REQUIRED_ARGS = {
+    "api.doctor_slots": lambda: {"date": (date.today() + timedelta(days=1)).isoformat()},
+}
+SQL_HEADER = "X-Bench-SQL-Statements"
+
+
+# ---------- Instrumentation ----------
+
+def count_statements(app):
+    """Report the SQL statement count of each request in a response header."""
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.bench_sql = g.get("bench_sql", 0) + 1
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_execute)
+
+    @app.after_request
+    def _report(response):
+        response.headers[SQL_HEADER] = str(g.get("bench_sql", 0))
+        return response
+
+
+# ---------- Targets ----------
+
+def samples():
+    """Ids with data behind them, so detail pages are not empty."""
+    doctor_id = (
+        db.session.query(Appointment.doctor_id)
+        .filter(Appointment.status == StatusEnum.booked)
+        .order_by(Appointment.appointment_start.desc())
+        .limit(1)
+        .scalar()
+    ) or db.session.query(Doctor.id).limit(1).scalar()
+    patient_id = (
+        db.session.query(Appointment.patient_id)
+        .filter(Appointment.doctor_id == doctor_id, Appointment.status == StatusEnum.booked)
+        .limit(1)
+        .scalar()
+    ) or db.session.query(Patient.id).limit(1).scalar()
+    # one the sample patient and doctor can both see
+    appointment_id = (
+        db.session.query(Appointment.id)
+        .filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.patient_id == patient_id,
+            Appointment.status == StatusEnum.booked,
+        )
+        .limit(1)
+        .scalar()
+    )
+    return {
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "appointment_id": appointment_id,
+        "department_id": db.session.query(Department.id).limit(1).scalar(),
+    }
+
+
+def targets(app, ids, only=None):
+    """``[(name, role, path)]`` for every GET endpoint we can fill in."""
+    found = []
+    for rule in app.url_map.iter_rules():
+        if "GET" not in rule.methods or rule.endpoint in SKIP:
+            continue
+        if any(ids.get(arg) is None for arg in rule.arguments):
+            continue
+        role = ROLES.get(rule.endpoint.split(".")[0])
+        path = rule.build({arg: ids[arg] for arg in rule.arguments}, append_unknown=False)[1]
+        if rule.endpoint in REQUIRED_ARGS:
+            path = f"{path}?{urlencode(REQUIRED_ARGS[rule.endpoint]())}"
+        found.append((rule.endpoint, role, path))
+
+    paths = {endpoint: (role, path) for endpoint, role, path in found}
+    for endpoint, params in VARIANTS:
+        if endpoint in paths:
+            role, path = paths[endpoint]
+            found.append((f"{endpoint}?{urlencode(params)}", role, f"{path}?{urlencode(params)}"))
+
+    found.sort()
+    if only:
+        found = [target for target in found if only in target[0]]
+    return found
+
+
+# ---------- Clients ----------
+
+def api_session_cookie(app, email, password):
+    """Log in through POST /api/v1/session and return the session cookie it set."""
+    client = app.test_client()
+    response = client.post("/api/v1/session", json={"email": email, "password": password})
+    if response.status_code != 200:
+        sys.exit(f"API login as {email} failed with {response.status_code}; check --password")
+    return client.get_cookie("session").value
+
+
+class TestClientDriver:
+    def __init__(self, app, cookies):
+        self.app = app
+        self.cookies = cookies
+
+    def session(self, role):
+        client = self.app.test_client()
+        if role:
+            client.set_cookie("session", self.cookies[role])
+        return lambda path: self._get(client, path)
+
+    @staticmethod
+    def _get(client, path):
+        response = client.get(path)
+        return response.status_code, int(response.headers.get(SQL_HEADER, 0))
+
+
+class ServerDriver:
+    def __init__(self, app, cookies):
+        from werkzeug.serving import make_server
+
+        self.cookies = cookies
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self, role):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port)
+        headers = {"Cookie": f"session={self.cookies[role]}"} if role else {}
+
+        def get(path):
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status, int(response.getheader(SQL_HEADER, 0))
+
+        return get
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ---------- Runner ----------
+
+def bench_target(driver, role, path, requests, threads, warmup):
+    latencies, statements, statuses = [], [], {}
+    lock = threading.Lock()
+
+    def work(count):
+        get = driver.session(role)
+        for _ in range(warmup):
+            get(path)
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            status, sql = get(path)
+            local.append((time.perf_counter() - started, sql, status))
+        with lock:
+            for seconds, sql, status in local:
+                latencies.append(seconds)
+                statements.append(sql)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    per_thread = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=work, args=(count,)) for count in per_thread]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "path": path,
+        "role": role,
+        "requests": requests,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "status": {str(code): n for code, n in sorted(statuses.items())},
+        "sql_mean": round(sum(statements) / len(statements), 2) if statements else 0,
+        "sql_max": max(statements, default=0),
+        "ok": all(200 <= code < 400 for code in statuses),
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="database made by generate_data.py (default: a small generated one)")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed requests per thread first")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--server", action="store_true", help="go over HTTP to a local WSGI server")
+    parser.add_argument("--only", help="only endpoints whose name contains this")
+    parser.add_argument("--password", default="secret", help="the sample patient's password, for the API login")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.db:
+        app = create_bench_app({"SQLALCHEMY_DATABASE_URI": sqlite_uri(args.db)})
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "bench.db")
+        app = create_bench_app({"SQLALCHEMY_DATABASE_URI": sqlite_uri(path)})
+        generate(app, doctors=20, patients=2000, appointments=20000)
+    count_statements(app)
+
+    with app.app_context():
+        ids = samples()
+        dataset = counters.get("doctor", "patient", "appointment")
+        patient_email = db.session.get(Patient, ids["patient_id"]).email
+    cookies = {
+        "admin": session_cookie(app, 1, "admin"),
+        "doctor": session_cookie(app, ids["doctor_id"], "doctor"),
+        "patient": session_cookie(app, ids["patient_id"], "patient"),
+        "api": api_session_cookie(app, patient_email, args.password),
+    }
+
+    driver = ServerDriver(app, cookies) if args.server else TestClientDriver(app, cookies)
+    results = {
+        "config": {
+            "mode": "server" if args.server else "test_client",
+            "threads": args.threads,
+            "requests": args.requests,
+            "database": app.config["SQLALCHEMY_DATABASE_URI"],
+        },
+        "dataset": dataset,
+        "samples": ids,
+        "endpoints": {},
+    }
+    try:
+        for name, role, path in targets(app, ids, args.only):
+            results["endpoints"][name] = bench_target(
+                driver, role, path, args.requests, args.threads, args.warmup
+            )
+    finally:
+        if args.server:
+            driver.close()
+
+    results["failed"] = {
+        name: result["status"] for name, result in results["endpoints"].items() if not result["ok"]
+    }
+    write_results(results, args.json)
+    if results["failed"]:
+        sys.exit(f"{len(results['failed'])} endpoint(s) did not answer 2xx/3xx: {', '.join(results['failed'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Worker startup benchmark with a regression budget.
+
+Starts fresh Python processes, as a preforking server or an autoscaler
+would, and times each phase: ``import app``, ``create_app()``, the
+first anonymous request (/login) and the first logged-in page
+(/admin/dashboard). It also counts the database connections and
+statements made while the app is built, which must stay at zero.
+
+Each metric is the median over --runs processes, after one untimed
+process that warms the Jinja bytecode cache. The script exits with
+status 1 when a median goes over its budget (BUDGET, or a JSON file
+passed with --budget).
+
+    python bench/startup_bench.py --runs 7 --json startup-bench.json
+    python bench/startup_bench.py --budget my-budget.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, create_bench_app, session_cookie, sqlite_uri, write_results
+
+
+BUDGET = {
+    "import_seconds": 1.5,
+    "create_app_seconds": 0.15,
+    "first_request_seconds": 0.5,
+    "first_page_seconds": 0.5,
+    "boot_db_connections": 0,
+    "boot_db_statements": 0,
+}
+
+
+# ---------- Child process ----------
+
+def child(uri):
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.pool import Pool
+
+    boot = {"boot_db_connections": 0, "boot_db_statements": 0}
+    event.listen(Pool, "connect", lambda *args: boot.__setitem__("boot_db_connections", boot["boot_db_connections"] + 1))
+    event.listen(Engine, "before_cursor_execute", lambda *args: boot.__setitem__("boot_db_statements", boot["boot_db_statements"] + 1))
+
+    before = time.perf_counter()
+    flask_app = app.create_app({"SQLALCHEMY_DATABASE_URI": uri})
+    built = time.perf_counter()
+    counted = dict(boot)
+
+    client = flask_app.test_client()
+    login_status = client.get("/login").status_code
+    first_request = time.perf_counter()
+
+    client.set_cookie("session", session_cookie(flask_app, 1, "admin"))
+    page_status = client.get("/admin/dashboard").status_code
+    first_page = time.perf_counter()
+
+    print(json.dumps({
+        "import_seconds": imported - started,
+        "create_app_seconds": built - before,
+        "first_request_seconds": first_request - built,
+        "first_page_seconds": first_page - first_request,
+        **counted,
+        "status": [login_status, page_status],
+    }))
+
+
+# ---------- Parent ----------
+
+def run_child(uri):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", uri],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="database to start against (default: a fresh one after `flask init`)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", help="JSON file overriding BUDGET entries")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    if args.db:
+        uri = sqlite_uri(args.db)
+    else:
+        uri = sqlite_uri(os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "bench.db"))
+        create_bench_app({"SQLALCHEMY_DATABASE_URI": uri})
+
+    budget = dict(BUDGET)
+    if args.budget:
+        with open(args.budget) as fh:
+            budget.update(json.load(fh))
+
+    run_child(uri)  # warm the bytecode cache, as the first worker would
+    runs = [run_child(uri) for _ in range(args.runs)]
+    if any(status != 200 for run in runs for status in run["status"]):
+        raise SystemExit(f"unexpected status codes: {[run['status'] for run in runs]}")
+
+    medians = {
+        key: round(statistics.median(run[key] for run in runs), 4)
+        for key in BUDGET
+    }
+    over = {key: {"median": medians[key], "budget": budget[key]} for key in budget if medians[key] > budget[key]}
+    write_results({
+        "runs": args.runs,
+        "database": uri,
+        "median": medians,
+        "budget": budget,
+        "over_budget": over,
+    }, args.json)
+    if over:
+        raise SystemExit(f"startup budget exceeded: {', '.join(sorted(over))}")
+
+
+if __name__ == "__main__":
+    main()
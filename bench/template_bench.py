@@ -0,0 +1,122 @@
+"""
+Template rendering benchmark.
+
+Renders the pages with cached fragments (patient dashboard, both booking
+forms, the add-doctor form) against a large dataset with the fragment
+cache off and on, and reports Jinja render time per page from the
+Server-Timing header. It also times a fresh worker compiling every
+template with and without the on-disk bytecode cache.
+
+    python bench/generate_data.py --db /tmp/hms.db --scale 0.01
+    python bench/template_bench.py --db /tmp/hms.db --renders 200 --json template-bench.json
+    python bench/template_bench.py   # generated dataset with 2000 doctors
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from common import create_bench_app, latency_summary, session_cookie, sqlite_uri, write_results  # puts the repo root on sys.path
+
+from app import counters
+from generate_data import generate
+from route_bench import samples
+
+
+PAGES = [
+    ("patient.dashboard", "patient", "/patient/dashboard"),
+    ("patient.book_appointment", "patient", "/patient/book-appointment"),
+    ("admin.add_appointment", "admin", "/admin/appointment/add"),
+    ("admin.add_doctor", "admin", "/admin/doctor/add"),
+]
+TEMPLATE_TIMING = re.compile(r"tpl;dur=([\d.]+)")
+
+
+def _app(uri, **config):
+    return create_bench_app(dict(
+        SQLALCHEMY_DATABASE_URI=uri,
+        METRICS_SERVER_TIMING=True,
+        SLOW_QUERY_MS=None,
+        **config,
+    ))
+
+
+def bench_page(client, cookie, path, renders, warmup):
+    client.set_cookie("session", cookie)
+    template, total = [], []
+    for i in range(warmup + renders):
+        started = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, (path, response.status_code)
+        if i >= warmup:
+            total.append(elapsed)
+            template.append(float(TEMPLATE_TIMING.search(response.headers["Server-Timing"]).group(1)) / 1000)
+    return {
+        "template": latency_summary(template),
+        "request": latency_summary(total),
+        "bytes": len(response.data),
+    }
+
+
+def bench_compile(uri, bytecode_dir):
+    """Seconds for a new worker to load every template once."""
+    app = _app(uri, JINJA_BYTECODE_CACHE=bytecode_dir is not None, JINJA_BYTECODE_CACHE_DIR=bytecode_dir)
+    names = app.jinja_env.list_templates()
+    started = time.perf_counter()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return {"templates": len(names), "seconds": round(time.perf_counter() - started, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="database made by generate_data.py (default: a generated one)")
+    parser.add_argument("--renders", type=int, default=100, help="timed renders per page and mode")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.db:
+        uri = sqlite_uri(args.db)
+        app = _app(uri)
+    else:
+        uri = sqlite_uri(os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "bench.db"))
+        app = _app(uri)
+        generate(app, doctors=2000, patients=2000, appointments=20000)
+
+    with app.app_context():
+        ids = samples()
+        dataset = counters.get("doctor", "patient", "appointment")
+    cookies = {
+        "admin": session_cookie(app, 1, "admin"),
+        "patient": session_cookie(app, ids["patient_id"], "patient"),
+    }
+
+    results = {"dataset": dataset, "renders": args.renders, "pages": {}}
+    for enabled in (False, True):
+        app.config["FRAGMENT_CACHE_ENABLED"] = enabled
+        mode = "fragment_cache" if enabled else "no_fragment_cache"
+        client = app.test_client()
+        for name, role, path in PAGES:
+            results["pages"].setdefault(name, {})[mode] = bench_page(
+                client, cookies[role], path, args.renders, args.warmup
+            )
+
+    bytecode_dir = tempfile.mkdtemp(prefix="hms-jinja-")
+    try:
+        bench_compile(uri, bytecode_dir)  # fill the cache, as the first worker would
+        results["worker_template_load"] = {
+            "no_bytecode_cache": bench_compile(uri, None),
+            "bytecode_cache": bench_compile(uri, bytecode_dir),
+        }
+    finally:
+        shutil.rmtree(bytecode_dir, ignore_errors=True)
+
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import auth, create_app
+from app.cli import init_database
+from app.database import db
+from app.models import Appointment, Department, Doctor, Patient, StatusEnum, Treatment
+from app.utils import hash_password
+
+
+def make_app(tmp_path, uri=None):
+    """A fresh app on an initialised database (a file under ``tmp_path`` by default)."""
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": uri or "sqlite:///" + str(tmp_path / "hospital.db"),
+        "PASSWORD_METHOD": "pbkdf2:sha256:1000",
+        "SLOW_QUERY_MS": None,
+        "JINJA_BYTECODE_CACHE": False,
+        "EXPORT_DIR": str(tmp_path / "exports"),
+        "REMINDER_OUTBOX_DIR": str(tmp_path / "reminders"),
+    })
+    auth._cache.clear()
+    with app.app_context():
+        init_database()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id, role):
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["user_role"] = role
+        sess["last_seen"] = int(time.time())
+
+
+def _appointments(patient, doctor, start, diagnosis):
+    """One upcoming booked appointment and one completed, treated one ``start`` away from now."""
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    upcoming, past = now + start, now - start
+    db.session.add(Appointment(
+        patient_id=patient.id, doctor_id=doctor.id,
+        appointment_start=upcoming, appointment_end=upcoming + timedelta(minutes=50),
+    ))
+    done = Appointment(
+        patient_id=patient.id, doctor_id=doctor.id, status=StatusEnum.completed,
+        appointment_start=past, appointment_end=past + timedelta(minutes=50),
+    )
+    db.session.add(done)
+    db.session.flush()
+    db.session.add(Treatment(appointment_id=done.id, diagnosis=diagnosis))
+
+
+def seed(count, doctor=None, patient=None):
+    """
+    A doctor and a patient, each with ``count`` upcoming and ``count``
+    treated past appointments. Every appointment is with a different
+    counterpart in its own department, so a lazy load per row shows up
+    as extra statements.
+    """
+    if doctor is None:
+        department = Department(name="Cardiology", description="Heart")
+        db.session.add(department)
+        db.session.flush()
+        doctor = Doctor(name="Dr Heart", email="heart@example.com",
+                        password_hash=hash_password("pw"), department_id=department.id)
+        patient = Patient(name="Pat", email="pat@example.com", password_hash=hash_password("pw"))
+        db.session.add_all([doctor, patient])
+        db.session.flush()
+
+    offset = Patient.query.count()
+    for i in range(offset, offset + count):
+        department = Department(name=f"Department {i}")
+        db.session.add(department)
+        db.session.flush()
+        other_doctor = Doctor(name=f"Dr {i}", email=f"doctor{i}@example.com",
+                              password_hash="x", department_id=department.id)
+        other_patient = Patient(name=f"Patient {i}", email=f"patient{i}@example.com", password_hash="x")
+        db.session.add_all([other_doctor, other_patient])
+        db.session.flush()
+        _appointments(patient, other_doctor, timedelta(days=1, hours=i), f"diagnosis {i}")
+        _appointments(other_patient, doctor, timedelta(days=1, hours=i, minutes=5), f"diagnosis {i}")
+    db.session.commit()
+    return doctor, patient
+
+
+class StatementCounter:
+    """Counts the SQL statements sent while it is active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+    def __len__(self):
+        return len(self.statements)
@@ -0,0 +1,53 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Admin, Appointment, Patient
+
+from conftest import login, seed
+
+
+@pytest.fixture
+def admin_client(app, client):
+    with app.app_context():
+        seed(12)
+        login(client, Admin.query.first().id, "admin")
+    return client
+
+
+def _patient_options(response):
+    select = re.search(r'<select[^>]*id="patient_id".*?</select>', response.get_data(as_text=True), re.S).group(0)
+    return re.findall(r'<option value="(\d+)"[^>]*>([^<]*)</option>', select)
+
+
+def test_patient_picker_shows_one_page(app, admin_client):
+    app.config["PAGE_SIZE"] = 5
+    first = admin_client.get("/admin/appointment/add")
+    assert len(_patient_options(first)) == 5
+    assert "after=" in first.get_data(as_text=True)
+
+
+def test_patient_picker_searches(admin_client):
+    response = admin_client.get("/admin/appointment/add?patient_query=patient7")
+    assert [name for _, name in _patient_options(response)] == ["Patient 7 - patient7@example.com"]
+
+    response = admin_client.get("/admin/appointment/add?patient_query=nobody")
+    assert _patient_options(response) == []
+    assert b"No active patients match" in response.data
+
+
+def test_booking_for_a_picked_patient(app, admin_client):
+    with app.app_context():
+        patient_id = Patient.query.order_by(Patient.id.desc()).first().id
+        doctor_id = Appointment.query.first().doctor_id
+    start = (datetime.utcnow() + timedelta(days=40)).replace(second=0, microsecond=0)
+    form = {"patient_id": patient_id, "doctor_id": doctor_id, "appointment_date": start.isoformat(), "reason": "x"}
+
+    assert admin_client.post("/admin/appointment/add", data=form).status_code == 302
+
+    # a conflict re-renders the form with the patient still picked
+    response = admin_client.post("/admin/appointment/add", data=form)
+    assert response.status_code == 200
+    picked = re.search(r'<option value="(\d+)" selected>', response.get_data(as_text=True))
+    assert picked and int(picked.group(1)) == patient_id
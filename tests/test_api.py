@@ -0,0 +1,113 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app import archive
+from app.database import db
+from app.models import Appointment, ArchivedAppointment, StatusEnum
+
+from conftest import seed
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        doctor, patient = seed(6)
+        # the finished appointments move to the archive tables, so
+        # listings page across both
+        assert archive.run(older_than_days=0, batch_size=100, pause=0)["appointments"]
+        return doctor.id, patient.id
+
+
+@pytest.fixture
+def patient_client(client, people):
+    response = client.post("/api/v1/session", json={"email": "pat@example.com", "password": "pw"})
+    assert response.status_code == 200
+    return client
+
+
+def _book(client, doctor_id, days):
+    start = datetime.combine(date.today() + timedelta(days=days), time(9))
+    response = client.post("/api/v1/appointments", json={
+        "doctor_id": doctor_id, "start": start.isoformat(), "reason": "checkup",
+    })
+    assert response.status_code == 201, response.get_json()
+    return response
+
+
+def test_anonymous_calls_get_json_401(client):
+    for method, url in (("get", "/api/v1/appointments"), ("post", "/api/v1/appointments/1/cancel")):
+        response = getattr(client, method)(url)
+        assert response.status_code == 401
+        assert response.is_json
+        assert response.get_json() == {"error": "Authentication required."}
+
+
+def test_wrong_password_is_json_401(client, people):
+    response = client.post("/api/v1/session", json={"email": "pat@example.com", "password": "nope"})
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Invalid credentials."}
+
+
+def test_cursor_pages_cover_hot_and_archived_rows_once(app, patient_client, people):
+    with app.app_context():
+        hot = Appointment.query.filter_by(patient_id=people[1]).count()
+        archived = ArchivedAppointment.query.filter_by(patient_id=people[1]).count()
+    assert hot and archived
+
+    pages, url = [], "/api/v1/appointments?per_page=4"
+    while url:
+        body = patient_client.get(url).get_json()
+        pages.append(body)
+        url = body["next"] and f"/api/v1/appointments?per_page=4&after={body['next']}"
+
+    items = [item for page in pages for item in page["items"]]
+    assert len(items) == hot + archived
+    assert len({item["id"] for item in items}) == len(items)
+    assert [(item["start"], item["id"]) for item in items] == sorted((item["start"], item["id"]) for item in items)
+    assert all(len(page["items"]) == 4 for page in pages[:-1])
+    assert pages[0]["prev"] is None and pages[-1]["next"] is None
+
+    # and back again from the second page
+    back = patient_client.get(f"/api/v1/appointments?per_page=4&before={pages[1]['prev']}").get_json()
+    assert back["items"] == pages[0]["items"]
+
+
+def test_bad_cursor_is_ignored_not_an_error(patient_client):
+    response = patient_client.get("/api/v1/appointments?after=not-a-cursor")
+    assert response.status_code == 200
+
+
+def test_listing_revalidates_until_the_watermark_moves(patient_client, people):
+    url = "/api/v1/appointments?status=booked"
+    first = patient_client.get(url)
+    etag = first.headers["ETag"]
+
+    repeat = patient_client.get(url, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b""
+
+    _book(patient_client, people[0], days=30)
+    changed = patient_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.get_json()["items"]) == len(first.get_json()["items"]) + 1
+
+
+def test_cancel_with_stale_if_match_is_412(app, patient_client, people):
+    booked = _book(patient_client, people[0], days=30)
+    appointment_id, etag = booked.get_json()["id"], booked.headers["ETag"]
+    url = f"/api/v1/appointments/{appointment_id}/cancel"
+
+    stale = patient_client.post(url, headers={"If-Match": '"not-the-etag"'})
+    assert stale.status_code == 412
+    with app.app_context():
+        assert db.session.get(Appointment, appointment_id).status == StatusEnum.booked
+
+    cancelled = patient_client.post(url, headers={"If-Match": etag})
+    assert cancelled.status_code == 200
+    assert cancelled.get_json()["status"] == "cancelled"
+    assert cancelled.headers["ETag"] != etag
+
+    # the ETag the client held before the cancel no longer matches
+    assert patient_client.post(url, headers={"If-Match": etag}).status_code == 412
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from app import archive
+from app.database import db
+from app.models import Appointment, ArchivedAppointment, StatusEnum, Treatment
+
+from conftest import seed
+
+
+def _appointment(patient, doctor, start, status):
+    appointment = Appointment(
+        patient_id=patient.id, doctor_id=doctor.id, status=status,
+        appointment_start=start, appointment_end=start + timedelta(minutes=50),
+    )
+    db.session.add(appointment)
+    db.session.flush()
+    return appointment
+
+
+def test_newest_treatment_does_not_stop_the_run(app):
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    with app.app_context():
+        doctor, patient = seed(0)
+        oldest = _appointment(patient, doctor, now - timedelta(days=30), StatusEnum.completed)
+        old = _appointment(patient, doctor, now - timedelta(days=20), StatusEnum.completed)
+        _appointment(patient, doctor, now + timedelta(days=1), StatusEnum.booked)
+        # the newest treatment belongs to the oldest finished appointment,
+        # which the (status, start) index returns first
+        db.session.add(Treatment(appointment_id=oldest.id, diagnosis="late notes"))
+        db.session.commit()
+        oldest_id, old_id = oldest.id, old.id
+
+        report = archive.run(older_than_days=1, batch_size=1, pause=0, now=now)
+
+        assert report["appointments"] == 1
+        assert db.session.get(ArchivedAppointment, old_id) is not None
+        assert db.session.get(Appointment, oldest_id) is not None
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from app import auth
+from app.database import db
+from app.models import Doctor, Patient, StatusEnum
+
+from conftest import login, seed
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        doctor, patient = seed(0)
+        return doctor.id, patient.id
+
+
+def _cached(role, user_id):
+    return auth._cache.get((role, user_id))
+
+
+def _set_status(app, model, user_id, status):
+    with app.app_context():
+        db.session.get(model, user_id).status = status
+        db.session.commit()
+
+
+def test_principal_is_cached_across_requests(app, client, people):
+    login(client, people[1], "patient")
+    assert client.get("/patient/dashboard").status_code == 200
+    hits = auth.stats()["hits"]
+    assert client.get("/patient/dashboard").status_code == 200
+    assert auth.stats()["hits"] > hits
+    assert _cached("patient", people[1]).status == StatusEnum.active
+
+
+@pytest.mark.parametrize("status", [StatusEnum.inactive, StatusEnum.blacklisted])
+def test_blocking_a_user_evicts_them_at_commit(app, client, people, status):
+    login(client, people[1], "patient")
+    assert client.get("/patient/dashboard").status_code == 200
+
+    _set_status(app, Patient, people[1], status)
+    assert _cached("patient", people[1]) is None
+
+    response = client.get("/patient/dashboard")
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+    with client.session_transaction() as sess:
+        assert "user_id" not in sess
+
+
+def test_rolled_back_change_keeps_the_cached_principal(app, client, people):
+    login(client, people[1], "patient")
+    client.get("/patient/dashboard")
+    with app.app_context():
+        db.session.get(Patient, people[1]).status = StatusEnum.inactive
+        db.session.flush()
+        db.session.rollback()
+    assert _cached("patient", people[1]).status == StatusEnum.active
+    assert client.get("/patient/dashboard").status_code == 200
+
+
+def test_deleted_user_is_evicted(app, client, people):
+    login(client, people[0], "doctor")
+    assert client.get("/doctor/dashboard").status_code == 200
+    with app.app_context():
+        db.session.delete(db.session.get(Doctor, people[0]))
+        db.session.commit()
+    assert client.get("/doctor/dashboard").status_code == 302
+
+
+def test_cache_is_keyed_by_role(app, client, people):
+    doctor_id, patient_id = people
+    assert doctor_id == patient_id  # one id, two accounts
+    login(client, patient_id, "patient")
+    client.get("/patient/dashboard")
+
+    # the same id in a doctor session is the doctor, not the cached patient
+    login(client, doctor_id, "doctor")
+    assert client.get("/doctor/dashboard").status_code == 200
+    assert _cached("doctor", doctor_id).name == "Dr Heart"
+    assert _cached("patient", patient_id).name == "Pat"
+    # and a session never passes another role's guard
+    login(client, patient_id, "patient")
+    assert client.get("/doctor/dashboard").status_code == 302
+
+
+def test_name_change_reaches_the_session(app, client, people):
+    login(client, people[1], "patient")
+    client.get("/patient/dashboard")
+    with app.app_context():
+        db.session.get(Patient, people[1]).name = "Patricia"
+        db.session.commit()
+    client.get("/patient/dashboard")
+    with client.session_transaction() as sess:
+        assert sess["patient_name"] == "Patricia"
+
+
+def _last_seen(client):
+    with client.session_transaction() as sess:
+        return sess["last_seen"]
+
+
+def _age_session(client, seconds):
+    with client.session_transaction() as sess:
+        sess["last_seen"] = int(time.time()) - seconds
+
+
+def test_last_seen_is_only_rewritten_once_a_minute(app, client, people):
+    login(client, people[1], "patient")
+    client.get("/patient/dashboard")
+
+    _age_session(client, 10)
+    stamp = _last_seen(client)
+    response = client.get("/patient/dashboard")
+    assert response.status_code == 200
+    assert "Set-Cookie" not in response.headers
+    assert _last_seen(client) == stamp
+
+    _age_session(client, app.config["LAST_SEEN_REFRESH_SECONDS"] + 1)
+    response = client.get("/patient/dashboard")
+    assert "Set-Cookie" in response.headers
+    assert _last_seen(client) >= int(time.time()) - 1
+
+
+def test_idle_session_times_out(app, client, people):
+    login(client, people[1], "patient")
+    _age_session(client, app.config["SESSION_TIMEOUT_MINUTES"] * 60 + 1)
+    assert client.get("/patient/dashboard").status_code == 302
+    with client.session_transaction() as sess:
+        assert "user_id" not in sess
@@ -0,0 +1,159 @@
+import threading
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import booking, slots
+from app.database import db
+from app.models import Appointment, DoctorSchedule, StatusEnum
+
+from conftest import seed
+
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+def _schedule(doctor):
+    db.session.add(DoctorSchedule(
+        doctor_id=doctor.id, weekday=TOMORROW.weekday(), start_time=time(9), end_time=time(12),
+    ))
+    db.session.commit()
+
+
+def _api_login(client, email):
+    response = client.post("/api/v1/session", json={"email": email, "password": "pw"})
+    assert response.status_code == 200
+
+
+def _free_starts(client, doctor_id):
+    response = client.get(f"/api/v1/doctors/{doctor_id}/slots?date={TOMORROW.isoformat()}")
+    assert response.status_code == 200
+    return [item["start"] for item in response.get_json()["items"]]
+
+
+def test_cancel_then_rebook_same_slot(app, client):
+    with app.app_context():
+        doctor, patient = seed(0)
+        _schedule(doctor)
+        doctor_id = doctor.id
+    _api_login(client, "pat@example.com")
+
+    start = _free_starts(client, doctor_id)[0]
+    booked = client.post("/api/v1/appointments", json={"doctor_id": doctor_id, "start": start, "reason": "checkup"})
+    assert booked.status_code == 201
+    assert start not in _free_starts(client, doctor_id)
+
+    cancelled = client.post(f"/api/v1/appointments/{booked.get_json()['id']}/cancel")
+    assert cancelled.status_code == 200
+    assert start in _free_starts(client, doctor_id)
+
+    rebooked = client.post("/api/v1/appointments", json={"doctor_id": doctor_id, "start": start, "reason": "again"})
+    assert rebooked.status_code == 201, rebooked.get_json()
+    assert start not in _free_starts(client, doctor_id)
+
+
+def test_cancelled_appointment_does_not_hold_its_start(app):
+    with app.app_context():
+        doctor, patient = seed(0)
+        start = datetime.combine(TOMORROW, time(15))
+        first = booking.book_appointment(patient.id, doctor.id, start, "checkup")
+        first.status = StatusEnum.cancelled
+        db.session.commit()
+
+        second = booking.book_appointment(patient.id, doctor.id, start, "again")
+        assert second.id != first.id
+        assert Appointment.query.filter_by(doctor_id=doctor.id, appointment_start=start).count() == 2
+
+
+def test_booked_overlap_is_a_conflict(app):
+    with app.app_context():
+        doctor, patient = seed(0)
+        start = datetime.combine(TOMORROW, time(15))
+        booking.book_appointment(patient.id, doctor.id, start, "checkup")
+
+        for clash in (start, start + timedelta(minutes=30)):
+            with pytest.raises(booking.BookingConflict):
+                booking.book_appointment(patient.id, doctor.id, clash, "again")
+        booking.book_appointment(patient.id, doctor.id, start + timedelta(minutes=50), "next")
+
+
+def test_appointment_lasts_one_slot(app):
+    app.config["SLOT_MINUTES"] = 30
+    with app.app_context():
+        doctor, patient = seed(0)
+        _schedule(doctor)
+        slot = slots.free_slots(doctor.id, TOMORROW)[1]
+        assert slot.end - slot.start == timedelta(minutes=30)
+
+        appointment = booking.book_appointment(patient.id, doctor.id, slot.start, "checkup")
+        assert appointment.appointment_end == slot.end
+        # the next slot starts where this one ends, and is still free
+        booking.book_appointment(patient.id, doctor.id, slot.end, "next")
+
+
+def test_unscheduled_doctor_books_slot_minutes(app):
+    app.config["SLOT_MINUTES"] = 30
+    with app.app_context():
+        doctor, patient = seed(0)
+        start = datetime.combine(TOMORROW, time(15))
+        appointment = booking.book_appointment(patient.id, doctor.id, start, "checkup")
+        assert appointment.appointment_end == start + timedelta(minutes=30)
+
+
+THREADS = 8
+
+
+@pytest.mark.parametrize("step", [0, 5], ids=["same start", "overlapping starts"])
+def test_concurrent_bookings_of_one_time_let_one_win(app, step):
+    with app.app_context():
+        doctor, patient = seed(0)
+        doctor_id, patient_id = doctor.id, patient.id
+    start = datetime.combine(TOMORROW, time(15))
+    barrier = threading.Barrier(THREADS)
+    outcomes = []
+
+    def attempt(i):
+        with app.app_context():
+            barrier.wait()
+            try:
+                booking.book_appointment(patient_id, doctor_id, start + timedelta(minutes=step * i), f"try {i}")
+                outcomes.append("booked")
+            except booking.BookingConflict:
+                outcomes.append("conflict")
+            except Exception as exc:  # lock errors, IntegrityError: the test must see them
+                outcomes.append(repr(exc))
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=attempt, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["booked"] + ["conflict"] * (THREADS - 1)
+    with app.app_context():
+        assert booking.overlapping(doctor_id, start, start + timedelta(hours=2)).count() == 1
+
+
+def test_booked_start_index_holds_without_the_check(app):
+    with app.app_context():
+        doctor, patient = seed(0)
+        start = datetime.combine(TOMORROW, time(15))
+        booking.book_appointment(patient.id, doctor.id, start, "checkup")
+
+        db.session.add(Appointment(
+            patient_id=patient.id, doctor_id=doctor.id, status=StatusEnum.booked,
+            appointment_start=start, appointment_end=start + timedelta(minutes=50),
+        ))
+        with pytest.raises(IntegrityError, match="appointment.doctor_id, appointment.appointment_start"):
+            db.session.commit()
+        db.session.rollback()
+
+        # a cancelled appointment at the same time is not held by the index
+        db.session.add(Appointment(
+            patient_id=patient.id, doctor_id=doctor.id, status=StatusEnum.cancelled,
+            appointment_start=start, appointment_end=start + timedelta(minutes=50),
+        ))
+        db.session.commit()
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import db
+from app.models import Appointment, StatusEnum
+
+from conftest import login, seed
+
+
+PAGES = ["/patient/dashboard", "/patient/treatments"]
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        doctor, patient = seed(2)
+        return doctor.id, patient.id
+
+
+@pytest.fixture
+def patient_client(app, people):
+    client = app.test_client()
+    login(client, people[1], "patient")
+    return client
+
+
+@pytest.fixture
+def appointment(app, people):
+    """One of the patient's booked appointments, as ``(id, doctor_id)``."""
+    with app.app_context():
+        row = Appointment.query.filter_by(patient_id=people[1], status=StatusEnum.booked).first()
+        return row.id, row.doctor_id
+
+
+@pytest.fixture
+def doctor_client(app, appointment):
+    client = app.test_client()
+    login(client, appointment[1], "doctor")
+    return client
+
+
+def _etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "private" in response.headers["Cache-Control"]
+    return response.headers["ETag"]
+
+
+def _revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+@pytest.mark.parametrize("url", PAGES)
+def test_repeat_get_is_not_modified(patient_client, url):
+    etag = _etag(patient_client, url)
+    response = _revalidate(patient_client, url, etag)
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("url", PAGES)
+def test_booking_changes_etag(patient_client, people, url):
+    etag = _etag(patient_client, url)
+    start = (datetime.utcnow() + timedelta(days=20)).replace(second=0, microsecond=0)
+    response = patient_client.post("/patient/book-appointment", data={
+        "doctor_id": people[0], "appointment_date": start.isoformat(), "reason": "checkup",
+    })
+    assert response.status_code == 302
+    patient_client.get("/patient/dashboard")  # consume the flash
+
+    assert _revalidate(patient_client, url, etag).status_code == 200
+
+
+@pytest.mark.parametrize("url", PAGES)
+def test_cancelling_changes_etag(app, patient_client, doctor_client, appointment, url):
+    etag = _etag(patient_client, url)
+    doctor_client.post(f"/doctor/appointment/{appointment[0]}/status", data={"status": "cancelled"})
+    with app.app_context():
+        assert db.session.get(Appointment, appointment[0]).status == StatusEnum.cancelled
+
+    assert _revalidate(patient_client, url, etag).status_code == 200
+
+
+@pytest.mark.parametrize("url", PAGES)
+def test_treatment_changes_etag(patient_client, doctor_client, appointment, url):
+    appointment_id = appointment[0]
+    etag = _etag(patient_client, url)
+    doctor_client.post(f"/doctor/appointment/{appointment_id}/treatment", data={"diagnosis": "flu"})
+    assert _revalidate(patient_client, url, etag).status_code == 200
+
+    # editing the same treatment again
+    etag = _etag(patient_client, url)
+    doctor_client.post(f"/doctor/appointment/{appointment_id}/treatment", data={"diagnosis": "a cold"})
+    response = _revalidate(patient_client, url, etag)
+    assert response.status_code == 200
+    assert b"a cold" in response.data
+
+
+def test_pending_flash_is_never_answered_with_304(patient_client):
+    url = "/patient/dashboard"
+    etag = _etag(patient_client, url)
+    with patient_client.session_transaction() as sess:
+        sess["_flashes"] = [("info", "Profile saved.")]
+
+    response = _revalidate(patient_client, url, etag)
+    assert response.status_code == 200
+    assert b"Profile saved." in response.data
+    assert "ETag" not in response.headers
+
+    # the message has been shown; the unchanged page revalidates again
+    assert _revalidate(patient_client, url, etag).status_code == 304
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app import archive, booking, counters
+from app.database import db
+from app.models import Appointment, ArchivedAppointment, Department, Doctor, Patient, StatusEnum
+
+from conftest import seed
+
+
+def test_failed_flush_leaves_no_deltas_behind(app):
+    with app.app_context():
+        doctor, patient = seed(1)
+        now = datetime.utcnow()
+        # Patients are flushed (and counted) before appointments, so the
+        # bad appointment makes the flush fail part-way.
+        db.session.get(Patient, patient.id).status = StatusEnum.inactive
+        db.session.add(Appointment(patient_id=patient.id, appointment_start=now, appointment_end=now))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+        db.session.add(Appointment(
+            patient_id=patient.id, doctor_id=doctor.id, appointment_start=now, appointment_end=now,
+        ))
+        db.session.commit()
+
+        assert counters.reconcile() == {}
+
+
+def test_book_cancel_and_archive_keep_counters_exact(app):
+    with app.app_context():
+        doctor, patient = seed(3)
+        assert counters.reconcile() == {}
+        before = counters.get("appointment", "appointment.booked", "appointment.cancelled")
+
+        start = datetime.utcnow().replace(second=0, microsecond=0) + timedelta(days=30)
+        appointment = booking.book_appointment(patient.id, doctor.id, start, "checkup")
+        assert counters.get("appointment", "appointment.booked") == {
+            "appointment": before["appointment"] + 1,
+            "appointment.booked": before["appointment.booked"] + 1,
+        }
+        assert counters.reconcile() == {}
+
+        db.session.get(Appointment, appointment.id).status = StatusEnum.cancelled
+        db.session.commit()
+        assert counters.get("appointment.booked", "appointment.cancelled") == {
+            "appointment.booked": before["appointment.booked"],
+            "appointment.cancelled": before["appointment.cancelled"] + 1,
+        }
+        assert counters.reconcile() == {}
+
+        report = archive.run(older_than_days=0, pause=0)
+        assert report["appointments"] > 0
+        assert ArchivedAppointment.query.count() == report["appointments"]
+        assert counters.reconcile() == {}
+
+
+def test_reconcile_reports_and_repairs_drift(app):
+    with app.app_context():
+        seed(2)
+        counters.reconcile()
+        db.session.commit()
+        actual = counters.get("doctor", "appointment.completed")
+        department = Department.query.filter_by(name="Cardiology").one()
+
+        db.session.execute(text("UPDATE counter SET value = value + 5 WHERE name = 'doctor'"))
+        db.session.execute(text("DELETE FROM counter WHERE name = 'appointment.completed'"))
+        db.session.execute(
+            text("UPDATE department SET doctors_count = 7 WHERE id = :id"), {"id": department.id}
+        )
+        db.session.commit()
+
+        assert counters.reconcile() == {
+            "doctor": (actual["doctor"] + 5, actual["doctor"]),
+            "appointment.completed": (0, actual["appointment.completed"]),
+        }
+        db.session.commit()
+
+        assert counters.reconcile() == {}
+        assert counters.get("doctor", "appointment.completed") == actual
+        db.session.expire_all()
+        assert db.session.get(Department, department.id).doctors_count == (
+            Doctor.query.filter_by(department_id=department.id).count()
+        )
@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+
+from app import archive, exports
+from app.database import db
+from app.models import Appointment, ArchivedAppointment
+
+from conftest import seed
+
+
+def test_export_merges_hot_and_archived_rows_in_order(app):
+    with app.app_context():
+        doctor, patient = seed(4)
+        moved, _ = archive.archive_batch(datetime.utcnow(), 100)
+        assert moved
+        hot = Appointment.query.filter_by(patient_id=patient.id).count()
+        archived = ArchivedAppointment.query.filter_by(patient_id=patient.id).count()
+        assert hot and archived
+
+        body = b"".join(exports.stream(exports.patient_history(patient.id), fmt="jsonl", batch_size=3))
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        db.session.rollback()
+
+    assert len(rows) == hot + archived
+    keys = [(row["appointment_start"], row["appointment_id"]) for row in rows]
+    assert keys == sorted(keys)
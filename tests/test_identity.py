@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import identity
+from app.database import db
+from app.models import Admin, Doctor, Patient, StatusEnum, UserRole
+
+from conftest import login, seed
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        yield seed(0)
+
+
+def _patient(email, **extra):
+    patient = Patient(name="New", email=email, password_hash="x", **extra)
+    db.session.add(patient)
+    db.session.commit()
+    return patient
+
+
+def test_insert_update_delete_stay_in_sync(people):
+    patient = _patient("  New@Example.com ")
+    found = identity.lookup("new@EXAMPLE.com")
+    assert (found.role, found.user_id, found.status) == (UserRole.patient, patient.id, StatusEnum.active)
+
+    patient.email = "renamed@example.com"
+    patient.status = StatusEnum.inactive
+    patient.password_hash = "y"
+    db.session.commit()
+    assert identity.lookup("new@example.com") is None
+    found = identity.lookup("renamed@example.com")
+    assert (found.user_id, found.status, found.password_hash) == (patient.id, StatusEnum.inactive, "y")
+
+    db.session.delete(patient)
+    db.session.commit()
+    assert identity.lookup("renamed@example.com") is None
+
+
+def test_rollback_leaves_the_directory_alone(people):
+    patient = _patient("new@example.com")
+    patient.email = "other@example.com"
+    db.session.flush()
+    db.session.rollback()
+    assert identity.lookup("new@example.com").user_id == patient.id
+    assert identity.lookup("other@example.com") is None
+
+
+@pytest.mark.parametrize("email", ["heart@example.com", "pat@example.com", "admin@example.com", "PAT@example.com"])
+def test_an_email_belongs_to_one_account_across_roles(people, email):
+    assert identity.email_taken(email)
+    # the database refuses it even if a caller forgets to check
+    with pytest.raises(IntegrityError):
+        _patient(email)
+    db.session.rollback()
+    with pytest.raises(IntegrityError):
+        db.session.add(Doctor(name="Dup", email=email, password_hash="x"))
+        db.session.commit()
+
+
+def test_an_account_may_keep_its_own_email(people):
+    doctor, patient = people
+    admin = Admin.query.filter_by(email="admin@example.com").one()
+    assert not identity.email_taken("pat@example.com", exclude=patient)
+    assert not identity.email_taken(" Pat@Example.com", exclude=patient)
+    assert not identity.email_taken("heart@example.com", exclude=doctor)
+    assert not identity.email_taken("admin@example.com", exclude=admin)
+    # someone else's email, even when they have the same id in another role
+    assert doctor.id == patient.id
+    assert identity.email_taken("heart@example.com", exclude=patient)
+    assert identity.email_taken("pat@example.com", exclude=doctor)
+
+
+def test_register_rejects_an_email_used_by_a_doctor(client, people):
+    response = client.post("/register", data={
+        "name": "Copy", "email": "Heart@example.com", "gender": "F", "age": "30",
+        "phone": "123", "password": "pw", "confirm_password": "pw",
+    })
+    assert response.status_code == 200
+    assert b"Email already registered." in response.data
+    assert Patient.query.filter_by(name="Copy").count() == 0
+
+
+def test_profile_keeps_own_email_and_refuses_a_taken_one(client, people):
+    doctor, patient = people
+    login(client, patient.id, "patient")
+    form = {"name": "Pat", "phone": "123", "gender": "F", "age": "40"}
+
+    response = client.post("/patient/profile", data=dict(form, email="pat@example.com"))
+    assert response.status_code == 302
+
+    response = client.post("/patient/profile", data=dict(form, email="admin@example.com"))
+    assert b"Another account with that email already exists." in response.data
+    db.session.expire_all()
+    assert db.session.get(Patient, patient.id).email == "pat@example.com"
+
+    response = client.post("/patient/profile", data=dict(form, email="pat.new@example.com"))
+    assert response.status_code == 302
+    assert identity.lookup("pat.new@example.com").user_id == patient.id
+    assert identity.lookup("pat@example.com") is None
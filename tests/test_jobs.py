@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import jobs
+from app.database import db
+from app.models import Job, JobStatus
+
+from conftest import make_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path, "sqlite://")
+    app.config.update(JOB_BACKOFF_SECONDS=10, JOB_BACKOFF_MAX=3600, JOB_VISIBILITY_TIMEOUT=60)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def tasks():
+    calls = []
+
+    def record(**payload):
+        calls.append(payload)
+        return {"seen": payload}
+
+    def boom():
+        raise RuntimeError("boom")
+
+    jobs.task("test.record")(record)
+    jobs.task("test.boom", max_attempts=2)(boom)
+    yield calls
+    jobs.registered().pop("test.record")
+    jobs.registered().pop("test.boom")
+
+
+def _claim(worker_id, limit=1):
+    claimed = jobs.claim(worker_id, limit)
+    for job in claimed:
+        job["worker_id"] = worker_id
+    return claimed
+
+
+def _make_due(job_id):
+    db.session.execute(update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_same_key_is_one_job(app, tasks):
+    first = jobs.enqueue("test.record", {"n": 1}, key="report:today")
+    second = jobs.enqueue("test.record", {"n": 2}, key="report:today")
+    db.session.commit()
+
+    assert first == second
+    assert Job.query.count() == 1
+    assert db.session.get(Job, first).payload == '{"n": 1}'
+
+
+def test_claim_hands_each_job_to_one_worker(app, tasks):
+    ids = {jobs.enqueue("test.record", {"n": n}) for n in range(3)}
+    jobs.enqueue("test.record", {"n": "later"}, delay=3600)
+    db.session.commit()
+
+    first, second = _claim("a", 2), _claim("b", 5)
+
+    assert len(first) == 2 and len(second) == 1
+    assert {job["id"] for job in first + second} == ids
+    assert _claim("c", 5) == []
+    job = db.session.get(Job, first[0]["id"])
+    assert (job.status, job.locked_by, job.attempts) == (JobStatus.running, "a", 1)
+
+
+def test_success_records_the_result(app, tasks):
+    job_id = jobs.enqueue("test.record", {"n": 1})
+    db.session.commit()
+
+    assert jobs.execute(_claim("a")[0])
+    job = db.session.get(Job, job_id)
+    assert job.status == JobStatus.succeeded
+    assert job.result == '{"seen": {"n": 1}}'
+    assert tasks == [{"n": 1}]
+
+
+def test_failure_backs_off_then_gives_up(app, tasks):
+    job_id = jobs.enqueue("test.boom")
+    db.session.commit()
+
+    before = datetime.utcnow()
+    assert not jobs.execute(_claim("a")[0])
+    job = db.session.get(Job, job_id)
+    assert job.status == JobStatus.queued
+    assert "RuntimeError: boom" in job.last_error
+    # first retry: JOB_BACKOFF_SECONDS with up to 50% jitter taken off
+    assert before + timedelta(seconds=5) <= job.run_at <= datetime.utcnow() + timedelta(seconds=10)
+    assert _claim("a") == []
+
+    _make_due(job_id)
+    assert not jobs.execute(_claim("a")[0])
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == (JobStatus.failed, 2)
+    assert job.finished_at is not None
+
+    _make_due(job_id)
+    assert _claim("a") == []
+
+
+def test_backoff_grows_and_is_capped(app):
+    app.config["JOB_BACKOFF_MAX"] = 60
+    for attempt, ceiling in ((1, 10), (2, 20), (3, 40), (4, 60), (10, 60)):
+        assert ceiling / 2 <= jobs.backoff(attempt) <= ceiling
+
+
+def test_expired_lock_is_claimed_again_and_fences_the_old_owner(app, tasks):
+    job_id = jobs.enqueue("test.record", {"n": 1})
+    db.session.commit()
+    stale = _claim("a")[0]
+
+    assert _claim("b") == []  # still locked
+    db.session.execute(
+        update(Job).where(Job.id == job_id).values(locked_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+    fresh = _claim("b")[0]
+    assert fresh["attempts"] == 2
+
+    jobs.complete(stale, {"from": "a"})
+    jobs.fail(stale, "late failure")
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.locked_by, job.result) == (JobStatus.running, "b", None)
+
+    jobs.complete(fresh, {"from": "b"})
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.result) == (JobStatus.succeeded, '{"from": "b"}')
+
+
+def test_expired_lock_without_attempts_left_is_reaped(app, tasks):
+    job_id = jobs.enqueue("test.boom")
+    db.session.commit()
+    _claim("a")
+    db.session.execute(
+        update(Job).where(Job.id == job_id).values(attempts=2, locked_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+    assert _claim("b") == []
+    assert jobs.reap() == 1
+    assert db.session.get(Job, job_id).status == JobStatus.failed
+
+
+def test_periodic_task_is_queued_once_per_period(app, tasks, monkeypatch):
+    jobs.task("test.tick", every=3600)(lambda: None)
+    try:
+        monkeypatch.setattr(jobs.time, "time", lambda: 7200.0 + 10)
+        for worker in (jobs.Worker(app), jobs.Worker(app)):
+            worker._enqueue_periodic()
+            worker._enqueue_periodic()
+        assert [job.idempotency_key for job in Job.query.filter_by(name="test.tick")] == ["test.tick@2"]
+
+        monkeypatch.setattr(jobs.time, "time", lambda: 3 * 3600.0 + 10)
+        jobs.Worker(app)._enqueue_periodic()
+        keys = {job.idempotency_key for job in Job.query.filter_by(name="test.tick")}
+        assert keys == {"test.tick@2", "test.tick@3"}
+    finally:
+        jobs.registered().pop("test.tick")
@@ -0,0 +1,45 @@
+"""List pages issue a fixed number of statements however many rows they show."""
+import pytest
+
+from app.database import db
+from app.models import Admin
+
+from conftest import StatementCounter, login, seed
+
+
+ROUTES = [
+    ("admin", "/admin/dashboard"),
+    ("admin", "/admin/doctors"),
+    ("admin", "/admin/appointment/add"),
+    ("doctor", "/doctor/dashboard"),
+    ("doctor", "/doctor/patients"),
+    ("doctor", "/doctor/patient/{patient}/history"),
+    ("patient", "/patient/dashboard"),
+    ("patient", "/patient/treatments"),
+]
+
+
+def _statements(app, client, url):
+    client.get(url)  # warm the principal, reference-data and fragment caches
+    with app.app_context():
+        engine = db.engine
+    with StatementCounter(engine) as counter:
+        response = client.get(url)
+    assert response.status_code == 200, url
+    return len(counter)
+
+
+@pytest.mark.parametrize("role, url", ROUTES)
+def test_statement_count_does_not_grow_with_rows(app, client, role, url):
+    with app.app_context():
+        doctor, patient = seed(2)
+        ids = {"admin": Admin.query.first().id, "doctor": doctor.id, "patient": patient.id}
+    login(client, ids[role], role)
+    url = url.format(patient=ids["patient"])
+    few = _statements(app, client, url)
+
+    with app.app_context():
+        seed(30, db.session.merge(doctor), db.session.merge(patient))
+    many = _statements(app, client, url)
+
+    assert many == few, f"{url}: {few} statements for 2 rows, {many} for 30"
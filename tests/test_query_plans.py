@@ -0,0 +1,65 @@
+"""Every dashboard and history query reaches appointments and treatments through an index."""
+import inspect
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app import queries
+from app.database import db
+
+from conftest import seed
+
+
+HISTORY_TABLES = {"appointment", "treatment", "appointment_archive", "treatment_archive"}
+
+BUILDERS = {
+    "admin_upcoming_appointments": lambda d, p, now: queries.admin_upcoming_appointments(now),
+    "doctors_with_department": lambda d, p, now: queries.doctors_with_department(),
+    "active_doctors": lambda d, p, now: queries.active_doctors(),
+    "doctor_upcoming_appointments": lambda d, p, now: queries.doctor_upcoming_appointments(d, now),
+    "doctor_patient_treatments": lambda d, p, now: queries.doctor_patient_treatments(d, p),
+    "doctor_patients": lambda d, p, now: queries.doctor_patients(d),
+    "patient_upcoming_appointments": lambda d, p, now: queries.patient_upcoming_appointments(p, now),
+    "patient_past_appointments": lambda d, p, now: queries.patient_past_appointments(p),
+    "patient_treatments": lambda d, p, now: queries.patient_treatments(p),
+    "archived_doctor_patient_treatments": lambda d, p, now: queries.archived_doctor_patient_treatments(d, p),
+    "archived_patient_appointments": lambda d, p, now: queries.archived_patient_appointments(p),
+    "archived_patient_treatments": lambda d, p, now: queries.archived_patient_treatments(p),
+}
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        doctor, patient = seed(20)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        return doctor.id, patient.id
+
+
+@pytest.mark.parametrize("name", BUILDERS)
+def test_query_uses_an_index(app, people, name):
+    with app.app_context():
+        plan = queries.query_plan(BUILDERS[name](*people, datetime.utcnow()))
+        assert queries.full_scans(plan, HISTORY_TABLES) == [], plan
+
+
+def test_every_builder_is_checked():
+    # the history helpers merge builders listed above; the rest are plan tools
+    others = {"patient_history", "patient_treatment_history", "doctor_patient_treatment_history",
+              "query_plan", "full_scans"}
+    public = {
+        name for name, value in vars(queries).items()
+        if inspect.isfunction(value) and value.__module__ == queries.__name__ and not name.startswith("_")
+    }
+    assert public - others == set(BUILDERS)
+
+
+def test_booked_start_index_is_gone(app):
+    with app.app_context():
+        names = {row[0] for row in db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'appointment'")
+        )}
+    assert "ix_appointment_status_start" in names
+    assert "ix_appointment_booked_start" not in names
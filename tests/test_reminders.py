@@ -0,0 +1,114 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import reminders
+from app.database import db
+from app.models import Appointment, Reminder, ReminderScan, ReminderStatus, StatusEnum
+
+from conftest import seed
+
+
+@pytest.fixture
+def people(app):
+    with app.app_context():
+        yield seed(0)
+
+
+def _book(people, start):
+    doctor, patient = people
+    appointment = Appointment(
+        patient_id=patient.id, doctor_id=doctor.id, status=StatusEnum.booked,
+        appointment_start=start, appointment_end=start + timedelta(minutes=50),
+    )
+    db.session.add(appointment)
+    db.session.commit()
+    return appointment
+
+
+def _rows(appointment):
+    return {
+        (row.kind, row.appointment_start, row.status)
+        for row in Reminder.query.filter_by(appointment_id=appointment.id)
+    }
+
+
+def _soon(hours):
+    return (datetime.utcnow() + timedelta(hours=hours)).replace(microsecond=0)
+
+
+def test_scan_schedules_what_came_into_range(people):
+    later = _book(people, _soon(72))
+    assert _rows(later) == set()
+
+    assert reminders.scan() == {"24h": 0, "1h": 0}
+    assert reminders.scan(now=datetime.utcnow() + timedelta(hours=49)) == {"24h": 1, "1h": 0}
+    assert _rows(later) == {("24h", later.appointment_start, ReminderStatus.pending)}
+
+
+def test_booking_inside_a_scanned_window_gets_rows_at_once(people):
+    reminders.scan()
+    appointment = _book(people, _soon(3))
+    assert _rows(appointment) == {("24h", appointment.appointment_start, ReminderStatus.pending)}
+
+    # the 1h reminder is the scanner's job once it comes into range
+    assert reminders.scan(now=datetime.utcnow() + timedelta(hours=2)) == {"24h": 0, "1h": 1}
+
+
+def test_last_minute_booking_gets_one_message(people):
+    reminders.scan()
+    appointment = _book(people, _soon(0.5))
+    assert _rows(appointment) == {("1h", appointment.appointment_start, ReminderStatus.pending)}
+
+
+def test_rescan_inserts_nothing(people):
+    appointments = [_book(people, _soon(hours)) for hours in (3, 20, 30)]
+    first = reminders.scan(now=datetime.utcnow() + timedelta(hours=10))
+    count = Reminder.query.count()
+    assert count == sum(len(_rows(appointment)) for appointment in appointments) > 0
+    assert first["24h"] > 0
+
+    # a scanner that crashed before recording how far it got starts over
+    ReminderScan.query.delete()
+    db.session.commit()
+    assert reminders.scan(now=datetime.utcnow() + timedelta(hours=10)) == {"24h": 0, "1h": 0}
+    assert Reminder.query.count() == count
+
+
+def test_cancel_retracts_pending_rows(people):
+    appointment = _book(people, _soon(3))
+    assert _rows(appointment)
+
+    appointment.status = StatusEnum.cancelled
+    db.session.commit()
+    assert {status for _, _, status in _rows(appointment)} == {ReminderStatus.retracted}
+
+
+def test_reschedule_retracts_and_schedules_again(people):
+    appointment = _book(people, _soon(3))
+    old_start, new_start = appointment.appointment_start, _soon(5)
+
+    appointment.appointment_start = new_start
+    appointment.appointment_end = new_start + timedelta(minutes=50)
+    db.session.commit()
+    assert _rows(appointment) == {
+        ("24h", old_start, ReminderStatus.retracted),
+        ("24h", new_start, ReminderStatus.pending),
+    }
+
+
+def test_expired_sending_lock_is_claimed_again(app, people):
+    appointment = _book(people, _soon(3))
+    now = datetime.utcnow()
+    # a drainer claims the due 24h reminder and dies before sending it
+    (claimed,) = reminders._claim(now, 10)
+    assert claimed.appointment_id == appointment.id
+
+    assert reminders.drain(now=now) == {"sent": 0, "failed": 0, "expired": 0}
+    report = reminders.drain(now=now + timedelta(seconds=app.config["REMINDER_SEND_TIMEOUT"] + 1))
+    assert report["sent"] == 1
+
+    row = db.session.get(Reminder, claimed.id)
+    assert (row.status, row.attempts) == (ReminderStatus.sent, 2)
+    assert os.listdir(app.config["REMINDER_OUTBOX_DIR"]) == [f"reminder-{row.id}.json"]
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import text
+
+from app import search
+from app.database import db
+from app.migrations import m0002_search_index
+from app.models import Patient
+
+from conftest import seed
+
+
+@pytest.mark.parametrize("term, expected", [
+    ("jo smi", '"jo"* "smi"*'),
+    ("  Jo   SMI ", '"jo"* "smi"*'),
+    ('O"Brien', '"o"* "brien"*'),
+    ("ann@example.com", '"ann"* "example"* "com"*'),
+    ("NOT near OR", '"not"* "near"* "or"*'),
+    ("name:x* (y)", '"name"* "x"* "y"*'),
+    ('" * ( ) :', ""),
+    ("", ""),
+])
+def test_match_expression_quotes_every_word_as_a_prefix(term, expected):
+    assert search.match_expression(term) == expected
+
+
+@pytest.fixture
+def patients(app):
+    with app.app_context():
+        seed(0)
+        for name, email in (
+            ("John Smith", "js@example.com"),
+            ("John Doe", "jd@example.com"),
+            ("Joanna Smithers", "jo@example.com"),
+            ("Anna Maria Louise Bergstrom", "amlb@example.com"),
+            ("Zoe Anna", "za@example.com"),
+        ):
+            db.session.add(Patient(name=name, email=email, password_hash="x"))
+        db.session.commit()
+        yield
+
+
+def _names(term):
+    query, keys = search.search_patients(term)
+    return [patient.name for patient in query.order_by(*keys)]
+
+
+def test_every_word_must_match_as_a_prefix(patients):
+    assert search.fts_available()
+    assert sorted(_names("jo smi")) == ["Joanna Smithers", "John Smith"]
+    assert _names("john d") == ["John Doe"]
+    assert _names("smithers") == ["Joanna Smithers"]
+    assert _names("NOT") == []
+    assert _names('" *') == []  # no words: the LIKE fallback, not an FTS syntax error
+
+
+def test_results_are_ranked_by_bm25(patients):
+    # the shorter name is the better match, though it sorts and was added last
+    assert _names("anna") == ["Zoe Anna", "Anna Maria Louise Bergstrom"]
+
+
+def test_tables_created_after_startup_are_picked_up(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for name, kind in conn.execute(text(
+                "SELECT name, type FROM sqlite_master WHERE name LIKE '%fts%' AND type IN ('table', 'trigger')"
+            )).all():
+                if kind == "trigger" or name in ("patient_fts", "doctor_fts"):
+                    conn.execute(text(f"DROP {kind.upper()} IF EXISTS {name}"))
+        search._fts_ready.clear()
+        seed(0)
+
+        assert not search.fts_available()
+        assert search.search_patients("pat")[1] == (Patient.name, Patient.id)  # LIKE fallback
+
+        # `flask upgrade-db` on a running deployment
+        with db.engine.begin() as conn:
+            m0002_search_index.upgrade(conn)
+        assert search.fts_available()
+        query, keys = search.search_patients("pat")
+        assert keys[0] is search.patient_fts.c.rank
+        assert [patient.email for patient in query] == ["pat@example.com"]
@@ -0,0 +1,25 @@
+import json
+import subprocess
+import sys
+
+
+def _loaded_after(code):
+    script = code + "\nimport json, sys\nprint(json.dumps(sorted(m for m in sys.modules if m.startswith('app'))))"
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+
+def test_import_app_loads_no_commands_or_migrations():
+    loaded = _loaded_after("import app")
+    assert not loaded & {"app.cli", "app.migrations", "app.bulk_import", "app.exports", "app.routes"}
+
+
+def test_create_app_registers_commands_without_their_subsystems():
+    loaded = _loaded_after(
+        "from app import create_app\n"
+        "app = create_app({'TESTING': True})\n"
+        "assert {'init', 'upgrade-db', 'worker', 'export'} <= set(app.cli.commands)"
+    )
+    assert "app.migrations" not in loaded
+    # the ORM hooks are always on
+    assert {"app.counters", "app.identity", "app.reminders", "app.slots"} <= loaded